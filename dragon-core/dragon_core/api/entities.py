@@ -2,25 +2,38 @@ import os
 import re
 import json
 import copy
+import time
+import uuid
+import gzip
 import random
 import string
+import threading
 from pathlib import Path
 from enum import Enum, auto
-from typing import Optional, Union, Tuple
+from functools import partial, wraps
+from collections import OrderedDict
+from typing import Optional, Union, Tuple, List, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-import nbformat
 import markdown
 from PIL import Image
-from nbconvert import HTMLExporter
 from werkzeug.utils import secure_filename
-from flask import abort, make_response, send_file, current_app
+from flask import abort, make_response, send_file, current_app, request
 from markdown.extensions.tables import TableExtension
 
 
 from dragon_core.modules import Entity, Library, Notebook, Project, Task, Step, Bucket, Instance, DragonLair
 
-from dragon_core.generators.meta import read_from_TOML
-from dragon_core.components.content_blocks import SupportedContentBlockType, ContentBlock
+from dragon_core.generators.meta import read_from_TOML, try_read_from_TOML, SKELETON_EXCLUDED_FIELDS
+from dragon_core.components import content_blocks
+from dragon_core.components.content_blocks import SupportedContentBlockType, ContentBlock, ContentHistory
+from .snapshot import read_snapshot, write_snapshot
+from .watcher import BucketWatcher, DATA_FILENAME, ANALYSIS_SUFFIXES
+from .persistence import WriteBehindFlusher
+from .notebook_cache import NotebookCache
+from .structure import StructureCache
+from .secondary_index import SecondaryIndex
+from . import journal
 from .converters import (MyMarkdownConverter,
                          CustomLinkExtension,
                          CustomHeadlessTableExtension,
@@ -70,6 +83,129 @@ UUID_TO_PATH_INDEX = {}
 
 INSTANCEIMAGE = {}
 
+# Holds as keys the first 8 characters of UUIDs and as values the set of paths of the TOML files starting with them.
+# Filenames start with ID[:8], so this is used to find the file of an entity that is not in INDEX without reloading.
+ID_PREFIX_INDEX = {}
+# Holds as keys the IDs that were requested but could not be found on disk and as values when the lookup happened.
+MISSING_IDS = {}
+# Seconds during which an ID that could not be found is not looked up on disk again.
+MISSING_ID_TTL = 30.0
+# Holds as keys the directories listed to look for the file of an entity that could not be found and as values when
+# they were listed. A directory is listed again after MISSING_ID_TTL seconds, no matter how many IDs are missed.
+LISTED_DIRECTORIES = {}
+
+# Number of workers used to parse TOML files when loading the lair. 0 means files are parsed one at a time.
+LOADING_WORKERS = 0
+# Either "thread" or "process", the kind of pool the loading workers run in.
+LOADING_EXECUTOR = "thread"
+# Path to the snapshot of the indices used to speed up restarts. None disables snapshots.
+SNAPSHOT_PATH: Optional[Path] = None
+
+# If True, images found while loading are decoded in a background thread to find broken ones.
+VERIFY_IMAGES = False
+# Suffixes of the files registered as images.
+IMAGE_SUFFIXES = ('.jpg', '.png')
+# Paths of the images found while loading that have not been verified yet.
+IMAGES_TO_VERIFY = set()
+# Holds as keys the paths of images that are missing or cannot be decoded and as values the reason.
+BROKEN_IMAGES = {}
+
+# If True, only the skeleton of every entity is loaded at start, the rest is read from disk when needed.
+LAZY_LOADING = False
+# Estimated size in bytes (the size of their TOML files) that hydrated entities can take before being evicted.
+HYDRATION_BUDGET = 256 * 1024 ** 2
+# Seconds after being used during which a hydrated entity is never evicted, since a request might still be using it.
+HYDRATION_GRACE_PERIOD = 5
+# Holds the IDs of hydrated entities in least recently used order, values are their size and time of last use.
+HYDRATED = OrderedDict()
+HYDRATED_SIZE = 0
+HYDRATION_LOCK = threading.Lock()
+
+# If True, the folders of the buckets are watched and new measurements and analysis files are added automatically.
+WATCH_BUCKETS = False
+# Seconds a watched file needs to go without changes before being added.
+WATCH_DEBOUNCE = 2.0
+BUCKET_WATCHER: Optional[BucketWatcher] = None
+# If set, entities are not written when they change, they are marked as dirty and written by its background thread.
+WRITE_BEHIND: Optional[WriteBehindFlusher] = None
+
+# If set, changes to content blocks, comments and bookmarks are appended to the journal instead of rewriting the whole
+# entity, its background thread compacts the journal into the TOML files.
+JOURNAL: Optional[journal.Journal] = None
+
+# Holds as keys the IDs of entities and as values a number increased every time the entity changes.
+ENTITY_VERSIONS = {}
+# Increased every time a path is added to PATH_TO_UUID_INDEX, since links in text blocks are replaced using it.
+PATHS_VERSION = 0
+# Identifies the current run in the ETags of responses, versions start from 0 again on every start.
+RUN_ID = uuid.uuid4().hex[:8]
+# Holds as keys the IDs of entities and as values the key, ETag and body of the last response of read_one for them, in
+# least recently used order.
+READ_CACHE = OrderedDict()
+READ_CACHE_SIZE = 0
+# Size in bytes of the responses kept in READ_CACHE before the least recently used ones are dropped.
+READ_CACHE_BUDGET = 64 * 1024 ** 2
+READ_CACHE_LOCK = threading.Lock()
+
+# Rendered html of the analysis notebooks of instances.
+NOTEBOOK_CACHE: Optional[NotebookCache] = None
+
+# Serialized structure of the libraries returned by generate_structure, maintained by the functions that add, delete or
+# rename entities.
+STRUCTURE: Optional[StructureCache] = None
+
+# Holds as keys the IDs of entities and as values the aggregates of their subtree returned by read_entity_info. Built
+# after loading and updated along the ancestors of any entity that is added or deleted.
+SUBTREE_AGGREGATES = {}
+AGGREGATES_LOCK = threading.Lock()
+
+# Secondary indices of INDEX by type, bookmarked flag, user, deleted flag and library, used to find entities without
+# going through all of them. Rebuilt after loading and updated by the functions that add entities or change those
+# values.
+SECONDARY_INDEX: Optional[SecondaryIndex] = None
+
+# If True, the squashing rule of content blocks (content_blocks.SQUASH_WINDOW) is applied to the existing histories of
+# every entity in a background thread after loading.
+SQUASH_HISTORIES = False
+
+# Held while writing an entity to disk, so background writes and request writes of the same file never interleave.
+SAVE_LOCK = threading.Lock()
+# Held while modifying the indices or the entities, by background threads and by the API functions that modify them
+# (see _holding_index_lock), and while serializing an entity, so an entity is never written in the middle of a change.
+INDEX_LOCK = threading.RLock()
+
+
+def _holding_index_lock(function: Callable) -> Callable:
+    """
+    Decorator for the API functions that modify entities, runs them holding INDEX_LOCK.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with INDEX_LOCK:
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def _config_option(key: str, default):
+    """
+    Returns the value of an optional setting. When loading from the environment, the environment variable is the key
+    in upper case and its value is cast to the type of the default.
+
+    :param key: The name of the setting in the config file.
+    :param default: The value used if the setting is not present.
+    """
+    if not LOADING_FROM_ENV:
+        return CONFIG.get(key, default)
+
+    value = os.getenv(key.upper())
+    if value is None or value == "":
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes")
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return value
+
 
 def set_initial_indices():
     global LOADING_FROM_ENV
@@ -85,6 +221,44 @@ def set_initial_indices():
     global PATH_TO_UUID_INDEX
     global UUID_TO_PATH_INDEX
     global INSTANCEIMAGE
+    global ID_PREFIX_INDEX
+    global MISSING_IDS
+    global MISSING_ID_TTL
+    global LISTED_DIRECTORIES
+    global LOADING_WORKERS
+    global LOADING_EXECUTOR
+    global SNAPSHOT_PATH
+    global VERIFY_IMAGES
+    global IMAGES_TO_VERIFY
+    global BROKEN_IMAGES
+    global LAZY_LOADING
+    global HYDRATION_BUDGET
+    global HYDRATED
+    global HYDRATED_SIZE
+    global WATCH_BUCKETS
+    global WATCH_DEBOUNCE
+    global BUCKET_WATCHER
+    global WRITE_BEHIND
+    global JOURNAL
+    global SQUASH_HISTORIES
+    global ENTITY_VERSIONS
+    global PATHS_VERSION
+    global RUN_ID
+    global READ_CACHE
+    global READ_CACHE_SIZE
+    global READ_CACHE_BUDGET
+    global NOTEBOOK_CACHE
+    global STRUCTURE
+    global SUBTREE_AGGREGATES
+    global SECONDARY_INDEX
+
+    # Pending writes need to reach the disk before it is read again.
+    if WRITE_BEHIND is not None:
+        WRITE_BEHIND.stop()
+        WRITE_BEHIND = None
+    if JOURNAL is not None:
+        JOURNAL.stop()
+        JOURNAL = None
 
     if not LOADING_FROM_ENV:
 
@@ -117,7 +291,10 @@ def set_initial_indices():
 
     set_api_url_prefix_and_host(api_url_prefix, url_host)
 
-    DRAGONLAIR = DragonLair(LAIRSPATH)
+    # Changes to the lair that are still waiting to be written need to reach the disk before it is read again.
+    if DRAGONLAIR is not None:
+        DRAGONLAIR.flush()
+    DRAGONLAIR = DragonLair(LAIRSPATH, write_debounce=float(_config_option('lair_write_debounce', 1.0)))
 
     # Handles users that are in the config.
     for user_email, user_name in config_users.items():
@@ -151,6 +328,66 @@ def set_initial_indices():
 
     INSTANCEIMAGE = {}
 
+    ID_PREFIX_INDEX = {}
+    MISSING_IDS = {}
+    MISSING_ID_TTL = float(_config_option('missing_id_ttl', 30.0))
+    LISTED_DIRECTORIES = {}
+
+    LOADING_WORKERS = _config_option('loading_workers', 0)
+    LOADING_EXECUTOR = _config_option('loading_executor', "thread")
+    snapshot_path = _config_option('snapshot_path', "")
+    SNAPSHOT_PATH = Path(snapshot_path) if snapshot_path != "" else None
+
+    VERIFY_IMAGES = _config_option('verify_images', False)
+    IMAGES_TO_VERIFY = set()
+    BROKEN_IMAGES = {}
+
+    LAZY_LOADING = _config_option('lazy_loading', False)
+    HYDRATION_BUDGET = _config_option('hydration_budget_mb', 256) * 1024 ** 2
+    HYDRATED = OrderedDict()
+    HYDRATED_SIZE = 0
+
+    if BUCKET_WATCHER is not None:
+        BUCKET_WATCHER.stop()
+        BUCKET_WATCHER = None
+    WATCH_BUCKETS = _config_option('watch_buckets', False)
+    WATCH_DEBOUNCE = float(_config_option('watch_debounce', 2.0))
+
+    ENTITY_VERSIONS = {}
+    PATHS_VERSION = 0
+    RUN_ID = uuid.uuid4().hex[:8]
+    READ_CACHE = OrderedDict()
+    READ_CACHE_SIZE = 0
+    READ_CACHE_BUDGET = _config_option('read_cache_mb', 64) * 1024 ** 2
+
+    notebook_cache_path = _config_option('notebook_cache_path', "")
+    if notebook_cache_path == "":
+        notebook_cache_path = RESOURCEPATH.joinpath('_notebook_cache')
+    NOTEBOOK_CACHE = NotebookCache(notebook_cache_path, _config_option('notebook_cache_mb', 512) * 1024 ** 2)
+
+    SUBTREE_AGGREGATES = {}
+    STRUCTURE = StructureCache(lambda ID: INDEX[ID], lambda: [lib.ID for lib in DRAGONLAIR.libraries])
+
+    SECONDARY_INDEX = SecondaryIndex()
+    SECONDARY_INDEX.register('type', lambda ent: (ent.__class__.__name__,))
+    SECONDARY_INDEX.register('bookmarked', lambda ent: (ent.bookmarked,))
+    SECONDARY_INDEX.register('user', lambda ent: ent.user if isinstance(ent.user, list) else (ent.user,))
+    SECONDARY_INDEX.register('deleted', lambda ent: (ent.deleted,))
+    SECONDARY_INDEX.register('library', lambda ent: (_library_of(ent),))
+
+    content_blocks.SQUASH_WINDOW = float(_config_option('squash_window', 0.0))
+    SQUASH_HISTORIES = _config_option('squash_histories', False)
+
+    # The journal already makes writes independent of the size of the entity, it takes precedence over write-behind.
+    if _config_option('journal', False):
+        JOURNAL = journal.Journal(LAIRSPATH.joinpath(journal.JOURNAL_FILENAME),
+                                  _write_entity_by_id,
+                                  float(_config_option('journal_compaction_interval', 30.0)))
+        JOURNAL.start()
+    elif _config_option('write_behind', False):
+        WRITE_BEHIND = WriteBehindFlusher(_write_entity_by_id, float(_config_option('write_behind_interval', 1.0)))
+        WRITE_BEHIND.start()
+
     if not RESOURCEPATH.exists():
         RESOURCEPATH.mkdir(parents=True)
 
@@ -164,43 +401,198 @@ def get_indices():
 
     index = json.dumps(str(INDEX))
 
-    ret = {'index': index, 'PATH_TO_UUID_INDEX': PATH_TO_UUID_INDEX}
+    ret = {'index': index, 'PATH_TO_UUID_INDEX': PATH_TO_UUID_INDEX, 'BROKEN_IMAGES': BROKEN_IMAGES}
     return ret
 
 
-def create_path_entity_copy(ent: Entity) -> Entity:
+def _uuid_to_path(ref: str) -> str:
+    """
+    Returns the path of the TOML file of the entity with the passed UUID, or the reference unchanged if it is not the
+    UUID of an indexed entity. Passed to to_TOML so entities are written referencing each other by path.
     """
-    Returns a copy of the passed entity with any mention to a UUID replaced with the paths of the TOML files for that
-    entity. This is used to convert from working with paths to working with UUID
+    return UUID_TO_PATH_INDEX.get(ref, ref)
 
-    :param ent: The entity you want a copy with the UUIDs replaced with paths :param index: A reverse of the
-     PATH_TO_UUID_INDEX dictionary. This is used to convert from UUID to paths If not passed, it will be created on demand. The
-     intention of having it optional is to avoid having to compute it every time this function is called if this
-     function gets called multiple times for a single operation. :return:
+
+def _references_by_uuid() -> bool:
+    """
+    Returns True if the entity files of the lair reference each other by UUID (format 2 and later) instead of by the
+    path of their TOML files.
     """
-    copy_ent = copy.deepcopy(ent)
-    if ent.parent in UUID_TO_PATH_INDEX:
-        copy_ent.parent = UUID_TO_PATH_INDEX[ent.parent]
+    return DRAGONLAIR is not None and DRAGONLAIR.format_version >= 2
 
-    children_paths = []
-    for child in copy_ent.children:
-        children_paths.append(UUID_TO_PATH_INDEX[child])
-    copy_ent.children = children_paths
 
-    # TODO: This should probably get removed
-    order = []
-    for item, item_type, deleted in copy_ent.order:
-        if item_type == "entity":
-            order.append((UUID_TO_PATH_INDEX[item], item_type, deleted))
-        else:
-            order.append((item, item_type, deleted))
+def _read_entity(path: Union[str, Path]) -> Entity:
+    """
+    Reads an entity from its TOML file, only its skeleton if LAZY_LOADING is on.
+    """
+    return read_from_TOML(path, skeleton=LAZY_LOADING)
+
+
+def _hydrate(ent: Entity) -> Entity:
+    """
+    When loading lazily, makes sure the fields left out of the skeleton of the entity (SKELETON_EXCLUDED_FIELDS) are
+    in memory, reading them from its TOML file if they are not. Anything that reads or modifies those fields must
+    hydrate the entity first.
+
+    Hydrated entities are kept in least recently used order and turned back into skeletons once their estimated size
+    goes over HYDRATION_BUDGET.
+
+    :param ent: The entity to hydrate.
+    :return: The same entity.
+    """
+    global HYDRATED_SIZE
+
+    if not LAZY_LOADING:
+        return ent
+
+    with HYDRATION_LOCK:
+        if ent.ID in HYDRATED:
+            HYDRATED.move_to_end(ent.ID)
+            HYDRATED[ent.ID] = (HYDRATED[ent.ID][0], time.monotonic())
+            return ent
+
+        # Entities that have not been saved yet are always complete.
+        size = 0
+        path = UUID_TO_PATH_INDEX.get(ent.ID)
+        if path is not None and Path(path).is_file():
+            full_ent = read_from_TOML(path)
+            for field in SKELETON_EXCLUDED_FIELDS:
+                if hasattr(full_ent, field):
+                    setattr(ent, field, getattr(full_ent, field))
+            size = os.path.getsize(path)
+
+        HYDRATED[ent.ID] = (size, time.monotonic())
+        HYDRATED_SIZE += size
+        _evict_hydrated()
+
+    return ent
+
 
-    data_buckets = []
-    for bucket in copy_ent.data_buckets:
-        data_buckets.append(UUID_TO_PATH_INDEX[bucket])
-    copy_ent.data_buckets = data_buckets
+def _evict_hydrated() -> None:
+    """
+    Turns the least recently used hydrated entities back into skeletons until the hydrated entities fit in
+    HYDRATION_BUDGET. Must be called holding HYDRATION_LOCK.
+    """
+    global HYDRATED_SIZE
+
+    now = time.monotonic()
+    for ID, (size, last_used) in list(HYDRATED.items()):
+        if HYDRATED_SIZE <= HYDRATION_BUDGET or now - last_used < HYDRATION_GRACE_PERIOD:
+            break
+        # Changes of dirty entities only exist in memory.
+        if _is_dirty(ID):
+            continue
+
+        ent = INDEX.get(ID)
+        if ent is not None:
+            for field, empty in SKELETON_EXCLUDED_FIELDS.items():
+                if hasattr(ent, field):
+                    setattr(ent, field, empty())
+        del HYDRATED[ID]
+        HYDRATED_SIZE -= size
+
+
+def _save_entity(ent: Entity, path: Optional[Union[str, Path]] = None, immediate: bool = False) -> None:
+    """
+    Writes the entity to its TOML file. In lairs of format 1, any UUID is replaced by the path of the TOML file of that
+    entity.
+    If write-behind is enabled, entities that are already indexed are only marked as dirty and written later.
+
+    :param ent: The entity to save.
+    :param path: Where to save the entity. Defaults to the path of the entity in UUID_TO_PATH_INDEX.
+    :param immediate: Write the entity now even if write-behind is enabled.
+    """
+    _bump_version(ent.ID)
 
-    return copy_ent
+    indexed_path = UUID_TO_PATH_INDEX.get(ent.ID)
+    if path is None:
+        path = indexed_path
+
+    if WRITE_BEHIND is not None:
+        if not immediate and indexed_path is not None and str(path) == indexed_path:
+            WRITE_BEHIND.mark_dirty(ent.ID)
+            return
+        WRITE_BEHIND.discard(ent.ID)
+
+    translate = None if _references_by_uuid() else _uuid_to_path
+    # Background writes hold INDEX_LOCK as well, so they never serialize an entity a request is modifying.
+    with INDEX_LOCK:
+        # Writing a skeleton would erase everything that was left out of it.
+        ent = _hydrate(ent)
+        with SAVE_LOCK:
+            ent.to_TOML(Path(path), translate=translate)
+
+
+def _bump_version(ID: str) -> None:
+    """
+    Records that an entity changed, invalidating the cached responses of read_one for it. Every function modifying an
+    entity saves it or records the change, which call this.
+    """
+    ENTITY_VERSIONS[ID] = ENTITY_VERSIONS.get(ID, 0) + 1
+
+
+def _is_dirty(ID: str) -> bool:
+    """
+    Returns True if the entity has changes that are not in its TOML file yet.
+    """
+    return ((WRITE_BEHIND is not None and WRITE_BEHIND.is_dirty(ID)) or
+            (JOURNAL is not None and JOURNAL.is_dirty(ID)))
+
+
+def _record_change(ent: Entity, record: dict) -> None:
+    """
+    Persists a change to an entity. If the journal is enabled only the record of the change is written, otherwise the
+    whole entity is saved.
+
+    :param ent: The entity that changed.
+    :param record: The journal record describing the change.
+    """
+    if JOURNAL is not None and ent.ID in UUID_TO_PATH_INDEX:
+        _bump_version(ent.ID)
+        JOURNAL.append(ent.ID, record)
+    else:
+        _save_entity(ent)
+
+
+def _replay_journal() -> None:
+    """
+    Applies the records of a journal left behind by a previous run to the loaded entities. If the journal is enabled
+    the entities are compacted with the rest, otherwise they are written right away and the journal is deleted.
+    """
+    journal_path = LAIRSPATH.joinpath(journal.JOURNAL_FILENAME)
+
+    replayed = set()
+    for record in journal.read_journal(journal_path):
+        ent = INDEX.get(record["entity"])
+        if ent is None:
+            print(f"Skipping journal record of unknown entity {record['entity']}")
+            continue
+        try:
+            journal.apply_record(_hydrate(ent), record)
+            replayed.add(ent.ID)
+        except Exception as e:
+            print(f"Could not apply journal record {record} exception: \n{e}")
+
+    if len(replayed) > 0:
+        print(f"Replayed the journal of {len(replayed)} entities")
+
+    if JOURNAL is not None:
+        for ID in replayed:
+            JOURNAL.mark_dirty(ID)
+    else:
+        for ID in replayed:
+            _save_entity(INDEX[ID], immediate=True)
+        journal.delete_journal(journal_path)
+
+
+def _write_entity_by_id(ID: str) -> None:
+    """
+    Writes a dirty entity to its current path. Used by the write-behind flusher.
+    """
+    ent = INDEX.get(ID)
+    if ent is None or ID not in UUID_TO_PATH_INDEX:
+        return
+    _save_entity(ent, immediate=True)
 
 
 def content_block_path_to_uuid(content: str):
@@ -265,40 +657,253 @@ def add_ent_to_index(entity: Entity, entity_path: Union[Path, str]) -> None:
     if entity.ID not in INDEX:
         INDEX[entity.ID] = entity
 
-    if entity_path not in PATH_TO_UUID_INDEX:
-        PATH_TO_UUID_INDEX[str(entity_path)] = entity.ID
+    global PATHS_VERSION
+
+    key = str(entity_path)
+    # The cached responses of read_one replace paths with IDs, they only need to change if a path is new.
+    if PATH_TO_UUID_INDEX.get(key) != entity.ID:
+        PATH_TO_UUID_INDEX[key] = entity.ID
+        PATHS_VERSION += 1
 
     if entity.ID not in UUID_TO_PATH_INDEX:
-        UUID_TO_PATH_INDEX[entity.ID] = str(entity_path)
+        UUID_TO_PATH_INDEX[entity.ID] = key
+
+    _add_path_to_prefix_index(key)
+    MISSING_IDS.pop(entity.ID, None)
+    SECONDARY_INDEX.add(INDEX[entity.ID])
+
+
+def _library_of(ent: Entity) -> Optional[str]:
+    """
+    Returns the ID of the library the entity is in, None if it is not in one or one of its ancestors is not loaded.
+    """
+    seen = set()
+    while not isinstance(ent, Library):
+        if ent.parent not in INDEX or ent.ID in seen:
+            return None
+        seen.add(ent.ID)
+        ent = INDEX[ent.parent]
+    return ent.ID
+
+
+def _add_path_to_prefix_index(entity_path: Union[Path, str]) -> None:
+    """
+    Adds the path of a TOML file to ID_PREFIX_INDEX under the first 8 characters of its filename.
+    """
+    entity_path = str(entity_path)
+    ID_PREFIX_INDEX.setdefault(Path(entity_path).name[:8], set()).add(entity_path)
 
 
-def initialize_bucket(bucket_path):
+def _lair_directories() -> List[Path]:
+    """
+    Returns the directories holding the entity files of the lair: the lair's directory and the ones of its libraries
+    and buckets. Instances are kept in the folders of their measurements and are not included.
+    """
+    directories = {}
+    for directory in ([LAIRSPATH] + [Path(lib.path).parent for lib in DRAGONLAIR.libraries] +
+                      [Path(bucket_path).parent for bucket_path in DRAGONLAIR.buckets.values()]):
+        directories.setdefault(os.path.realpath(directory), Path(directory))
+    return list(directories.values())
+
+
+def _list_directory(directory: Union[Path, str]) -> None:
+    """
+    Adds every TOML file in the directory to ID_PREFIX_INDEX. Files are only listed, not parsed.
+    """
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.endswith('.toml') and entry.name[8:9] == '_' and entry.is_file():
+                    _add_path_to_prefix_index(entry.path)
+    except OSError:
+        pass
+
+
+def _scan_lair_directories() -> None:
+    """
+    Lists the directories holding the entity files of the lair and adds every TOML file in them to ID_PREFIX_INDEX.
+    """
+    for directory in _lair_directories():
+        _list_directory(directory)
+
+
+def _scan_for_prefix(prefix: str, directories: Iterable[Union[Path, str]]) -> set:
+    """
+    Lists again the passed directories, looking for files created since they were added to ID_PREFIX_INDEX. Directories
+    that were listed in the last MISSING_ID_TTL seconds are not listed again.
+
+    :param prefix: The first 8 characters of the UUID being looked for.
+    :param directories: Where the file of the entity would be.
+    :return: The paths in ID_PREFIX_INDEX starting with prefix.
+    """
+    now = time.time()
+    for directory in directories:
+        key = os.path.realpath(directory)
+        if key in LISTED_DIRECTORIES and now - LISTED_DIRECTORIES[key] < MISSING_ID_TTL:
+            continue
+        _list_directory(directory)
+        LISTED_DIRECTORIES[key] = now
+    return set(ID_PREFIX_INDEX.get(prefix, set()))
+
+
+def _reference_path(ref: Union[str, Path], directory: Union[Path, str]) -> Optional[str]:
+    """
+    Returns the path of the TOML file of an entity referenced from an entity file. In format 1 the reference is the
+    path itself, in format 2 it is the UUID of the entity and its file is found through ID_PREFIX_INDEX. If several
+    files that are not indexed yet share the prefix of the UUID, they are parsed to find the right one.
+
+    :param ref: The reference as stored in the entity file.
+    :param directory: The directory of the entity file holding the reference, listed if the file is not indexed.
+    :return: The path of the TOML file, None if it could not be found.
+    """
+    ref = str(ref)
+    if ref.endswith('.toml'):
+        return ref
+    if ref in UUID_TO_PATH_INDEX:
+        return UUID_TO_PATH_INDEX[ref]
+
+    prefix = ref[:8]
+    candidates = ID_PREFIX_INDEX.get(prefix, set()) - PATH_TO_UUID_INDEX.keys()
+    if len(candidates) == 0:
+        candidates = _scan_for_prefix(prefix, [directory]) - PATH_TO_UUID_INDEX.keys()
+    if len(candidates) == 1:
+        return next(iter(candidates))
+
+    for path in sorted(candidates):
+        try:
+            if read_from_TOML(path, skeleton=True).ID == ref:
+                return path
+        except Exception as e:
+            print(f"Could not read {path} while looking for entity {ref} exception: \n{e}")
+    return None
+
+
+def _load_entity_by_id(ID: str) -> Optional[Entity]:
+    """
+    Finds the TOML file of an entity that is not in INDEX through ID_PREFIX_INDEX and loads only that file, together
+    with any children or instances it references that are not loaded yet. IDs that cannot be found are remembered for
+    MISSING_ID_TTL seconds so repeated requests for them do not touch the disk.
+
+    :param ID: The ID of the entity.
+    :return: The entity if it was found, None otherwise.
+    """
+    # Another request might have loaded it while this one was waiting for INDEX_LOCK.
+    if ID in INDEX:
+        return INDEX[ID]
+    if ID in MISSING_IDS and time.time() - MISSING_IDS[ID] < MISSING_ID_TTL:
+        return None
+
+    prefix = ID[:8]
+    # Files already in the index hold other entities.
+    candidates = ID_PREFIX_INDEX.get(prefix, set()) - PATH_TO_UUID_INDEX.keys()
+    if len(candidates) == 0:
+        # Only files created after the lair was loaded are missing from the index, so only the directories new entities
+        # are created in are listed.
+        candidates = _scan_for_prefix(prefix, _lair_directories()) - PATH_TO_UUID_INDEX.keys()
+
+    for path in candidates:
+        try:
+            ent = _read_entity(path)
+            if ent.ID != ID:
+                continue
+
+            loaded_ids = set(INDEX.keys())
+            add_ent_to_index(ent, path)
+            process_content_blocks(ent)
+            _load_unindexed_references(ent, path)
+            new_entities = [INDEX[new_id] for new_id in INDEX.keys() if new_id not in loaded_ids]
+            _resolve_references(new_entities)
+            _update_aggregates(ent.ID)
+            _update_library_index(new_entities)
+            # The parents may already list the new entities in a cached subtree built while they were not loaded.
+            for new_ent in new_entities:
+                STRUCTURE.invalidate(new_ent.parent)
+            return ent
+        except Exception as e:
+            print(f"Could not load entity {ID} from {path} exception: \n{e}")
+
+    MISSING_IDS[ID] = time.time()
+    return None
+
+
+def _update_library_index(entities) -> None:
+    """
+    Indexes again the library of the passed entities, once their parents are resolved, and of the descendants that
+    were loaded before them and could not find their library.
+    """
+    pending = list(entities)
+    while len(pending) > 0:
+        ent = pending.pop()
+        SECONDARY_INDEX.update(ent, 'library')
+        for child in ent.children:
+            if child in INDEX and len(SECONDARY_INDEX.values_of('library', child)) == 0:
+                pending.append(INDEX[child])
+
+
+def _load_unindexed_references(ent: Entity, entity_path: Union[Path, str]) -> None:
+    """
+    Registers the images of an instance and loads the instances of a bucket and the children of an entity that are not
+    in the indices yet.
+
+    :param ent: The entity whose references are loaded.
+    :param entity_path: The path on disk to the TOML file of the entity.
+    """
+    if isinstance(ent, Instance):
+        _register_instance(ent, entity_path)
+    if isinstance(ent, Bucket):
+        for ins_path in ent.path_to_uuid.keys():
+            if str(ins_path) not in PATH_TO_UUID_INDEX:
+                _register_instance(_read_entity(ins_path), ins_path)
+    for child in ent.children:
+        if child in INDEX or str(child) in PATH_TO_UUID_INDEX:
+            continue
+        child_path = _reference_path(child, Path(entity_path).parent)
+        if child_path is None:
+            print(f"Could not find the file of child {child} of {ent.ID}")
+            continue
+        recursively_load_entity(child_path)
+
+
+def initialize_bucket(bucket_path, reader: Callable = _read_entity):
     """
     Function that initializes a bucket by adding it to the index and initializing the instances it contains.
 
-    :param bucket: The bucket that is being initialized.
+    :param bucket_path: The path to the TOML file of the bucket that is being initialized.
+    :param reader: Function used to get the entity of a TOML file. Defaults to reading the file from disk.
     """
-    bucket = read_from_TOML(bucket_path)
+    bucket = reader(bucket_path)
 
     add_ent_to_index(bucket, bucket_path)
 
     for ins_path in bucket.path_to_uuid.keys():
-        instance = read_from_TOML(ins_path)
-        add_ent_to_index(instance, ins_path)
-
-        # add images to the image index
-        for img_path in instance.images:
-            path = Path(img_path).resolve()
-            # Only need to add image if it is an actual image, not html plot
-            if path.suffix == '.jpg' or path.suffix == '.png':
-                img = Image.open(path)
-                INSTANCEIMAGE[img_path] = instance.ID
-            elif path.suffix == '.html':
-                pass
+        instance = reader(ins_path)
+        _register_instance(instance, ins_path)
 
     return bucket
 
 
+def _register_instance(instance: Instance, instance_path: Union[Path, str]) -> None:
+    """
+    Adds an instance to the indices and its images to the image index.
+
+    :param instance: The instance being registered.
+    :param instance_path: The path on disk to the TOML file of the instance.
+    """
+    add_ent_to_index(instance, instance_path)
+
+    # add images to the image index
+    for img_path in instance.images:
+        path = Path(img_path)
+        # Only need to add image if it is an actual image, not html plot. Images are not decoded here, only checked
+        # for existence, the background verification decodes them if it is enabled.
+        if path.suffix in IMAGE_SUFFIXES:
+            if path.is_file():
+                INSTANCEIMAGE[img_path] = instance.ID
+                IMAGES_TO_VERIFY.add(str(img_path))
+            else:
+                BROKEN_IMAGES[str(img_path)] = "File not found"
+
+
 def process_content_blocks(entity):
     """
     Function that processes the content blocks of an entity and checks for markdown links.
@@ -309,38 +914,48 @@ def process_content_blocks(entity):
     pattern = r'\[(.*?)\]\((.*?)\)'
 
     for block in entity.content_blocks:
-        for content in block.content:
+        # Only the latest version is displayed, earlier versions are kept compressed and are not decompressed here.
+        if len(block.content) > 0:
+            content = block.content[-1]
             if isinstance(content, str):
                 matches = re.findall(pattern, content)
                 for match in matches:
                     # Tries converting it to path and see if the path exists.
                     # Catches all failures because we don't want to crash if the path doesn't or isn't a path format.
                     try:
-                        path = Path(match[1]).resolve()
+                        path = Path(match[1])
                     except Exception as e:
                         continue
-                    if path.exists() and path.suffix == '.jpg' or path.suffix == '.png':
-                        img = Image.open(path)
+                    # Images are only decoded by the background verification, if it is enabled.
+                    if path.suffix in IMAGE_SUFFIXES:
+                        IMAGES_TO_VERIFY.add(str(path))
 
 
-def recursively_load_entity(entity_path: Path):
+def recursively_load_entity(entity_path: Path, reader: Callable = _read_entity):
     """
     Loads an entity from a TOML file and recursively loads all of its children as well.
+
+    :param entity_path: The path to the TOML file of the entity.
+    :param reader: Function used to get the entity of a TOML file. Defaults to reading the file from disk.
     """
 
-    ent = read_from_TOML(entity_path)
+    ent = reader(entity_path)
 
     add_ent_to_index(ent, entity_path)
 
     child_list = []
     if len(ent.children) > 0:
         for child in ent.children:
+            child_path = _reference_path(child, Path(entity_path).parent)
+            if child_path is None:
+                print(f"Could not find the file of child {child} of {ent.name}")
+                continue
             try:
-                ent_dict, child = recursively_load_entity(child)
+                ent_dict, child = recursively_load_entity(child_path, reader)
                 child_list.append(ent_dict)
             except Exception as e:
+                # The child is skipped, the rest of the lair is still loaded.
                 print(f"Error reading child {ent.name} with path {UUID_TO_PATH_INDEX[ent.ID]} exception: \n{e}")
-                raise e
 
     # TODO: Change this to check if the bucket has been initialized.
     # data_buckets = []
@@ -367,76 +982,452 @@ def health_check():
     return make_response("Server is running", 201)
 
 
+def _parse_all_entity_files() -> dict:
+    """
+    Finds and parses every TOML file of the lair using a pool of LOADING_WORKERS workers.
+    Files are discovered one level of the tree at a time: the files of a level are parsed in parallel and the
+    children (or instances in the case of buckets) they reference form the next level. In format 2 the files listed
+    by the prefix scan are all parsed in the first level.
+
+    :return: Dictionary with the path to every TOML file as keys and the parsed entity as values.
+    """
+    if LOADING_EXECUTOR == "process":
+        executor, chunksize = ProcessPoolExecutor(max_workers=LOADING_WORKERS), 16
+    else:
+        executor, chunksize = ThreadPoolExecutor(max_workers=LOADING_WORKERS), 1
+
+    parsed = {}
+    level = [str(path) for path in DRAGONLAIR.buckets.values()] + [str(lib.path) for lib in DRAGONLAIR.libraries]
+    # In format 2 every file found by the prefix scan is parsed in the first level, instead of waiting for the level
+    # of its parent to be parsed to know its path.
+    if _references_by_uuid():
+        level += [path for paths in ID_PREFIX_INDEX.values() for path in sorted(paths)]
+    with executor:
+        while len(level) > 0:
+            # dict.fromkeys removes duplicates while keeping the order.
+            level = [path for path in dict.fromkeys(level) if path not in parsed]
+            # A file that cannot be parsed, or a file listed by the prefix scan that is not an entity, does not stop the
+            # load, it is skipped together with its children.
+            entities = executor.map(partial(try_read_from_TOML, skeleton=LAZY_LOADING), level, chunksize=chunksize)
+            for path, ent in zip(level, entities):
+                parsed[path] = ent
+
+            # Files that could not be parsed are read again, and fail, when they are loaded.
+            level = [path for path in level if parsed[path] is not None]
+            next_level = []
+            for path in level:
+                directory = Path(path).parent
+                next_level += [child_path for child_path in (_reference_path(child, directory)
+                                                             for child in parsed[path].children)
+                               if child_path is not None]
+                if isinstance(parsed[path], Bucket):
+                    next_level += [str(ins_path) for ins_path in parsed[path].path_to_uuid.keys()]
+            level = next_level
+
+    return parsed
+
+
 def load_all_entities():
     """
-    Function that reads all the entities and return a dictionary with nested entities
+    Function that reads all the entities and return a dictionary with nested entities.
+    If LOADING_WORKERS is larger than 0, all the TOML files are parsed in parallel first and then added to the indices
+    in a single pass, in the same order as when loading them one at a time.
     :return:
     """
 
+    if SNAPSHOT_PATH is None or not _load_from_snapshot():
+        _load_all_entity_files()
+
+        if SNAPSHOT_PATH is not None:
+            _save_snapshot()
+
+    _replay_journal()
+
+    # Entities loaded from a snapshot never go through add_ent_to_index and in format 1 the parents are only known once
+    # the references are resolved, so the secondary indices are built once everything is loaded.
+    SECONDARY_INDEX.rebuild(INDEX.values())
+
+    with AGGREGATES_LOCK:
+        for ID in INDEX:
+            if ID not in SUBTREE_AGGREGATES:
+                _compute_aggregates(ID)
+
+    if VERIFY_IMAGES:
+        images = IMAGES_TO_VERIFY | set(INSTANCEIMAGE.keys())
+        IMAGES_TO_VERIFY.clear()
+        threading.Thread(target=_verify_images, args=(images,), daemon=True).start()
+
+    if WATCH_BUCKETS:
+        _start_bucket_watcher()
+
+    if SQUASH_HISTORIES and content_blocks.SQUASH_WINDOW > 0:
+        threading.Thread(target=_squash_histories, args=(list(INDEX.keys()),), daemon=True).start()
+
+
+def _squash_histories(IDs) -> None:
+    """
+    Squashes the history of the content blocks of the passed entities and saves the ones that changed.
+    Meant to run in a background thread. Entities with journal records not compacted yet are skipped, since the records
+    refer to versions that squashing would remove. When loading lazily, only hydrated entities are squashed.
+
+    :param IDs: The IDs of the entities to squash.
+    """
+    squashed = 0
+    for ID in IDs:
+        with INDEX_LOCK:
+            ent = INDEX.get(ID)
+            if ent is None or (JOURNAL is not None and JOURNAL.is_dirty(ID)):
+                continue
+            if LAZY_LOADING and ID not in HYDRATED:
+                continue
+
+            changed = [block.squash() for block in ent.content_blocks]
+            if any(changed):
+                try:
+                    _save_entity(ent)
+                    squashed += 1
+                except Exception as e:
+                    print(f"Could not save squashed entity {ID} exception: \n{e}")
+
+    if squashed > 0:
+        print(f"Squashed the history of {squashed} entities")
+
+
+def _verify_images(image_paths) -> None:
+    """
+    Decodes every image passed and records the ones that are missing or broken in BROKEN_IMAGES.
+    Meant to run in a background thread so that the server does not wait for it to start.
+
+    :param image_paths: Iterable with the paths of the images to verify.
+    """
+    broken = {}
+    for image_path in image_paths:
+        try:
+            with Image.open(image_path) as img:
+                img.verify()
+        except Exception as e:
+            broken[str(image_path)] = str(e)
+
+    BROKEN_IMAGES.update(broken)
+    if len(broken) > 0:
+        print(f"Found {len(broken)} broken images: \n" + "\n".join(f"{k}: {v}" for k, v in broken.items()))
+
+
+def _load_all_entity_files():
+    """
+    Reads every TOML file of the lair and adds the entities to the indices.
+    """
+    if _references_by_uuid():
+        _scan_lair_directories()
+
+    reader = _read_entity
+    if LOADING_WORKERS > 0:
+        parsed = _parse_all_entity_files()
+        reader = lambda path: parsed[str(path)] if parsed.get(str(path)) is not None else _read_entity(path)
+
     for bucket_path in DRAGONLAIR.buckets.values():
-        bucket = initialize_bucket(bucket_path)
+        bucket = initialize_bucket(bucket_path, reader)
 
     for dragon_library in DRAGONLAIR.libraries:
-        ret_dict, library = recursively_load_entity(dragon_library.path)
+        ret_dict, library = recursively_load_entity(dragon_library.path, reader)
         DRAGONLAIR.insert_library_instance(library)
 
     # We replace the parent and children after we are done going through all identities to make sure that
     # the parent is already in the index, there might be edge cases where a lower entity in the tree has a parent
     # somewhere else (probably more important once we start allowing branching)
+    _resolve_references(INDEX.values())
 
-    # Update the parent of the children
-    for key, val in INDEX.items():
-        path = Path(val.parent)
-        if path.is_file():
-            val.parent = PATH_TO_UUID_INDEX[str(path)]
 
-        # Update the children of the parent
-        for child in val.children:
-            path = Path(child)
-            if path.is_file():
-                val.children[val.children.index(child)] = PATH_TO_UUID_INDEX[str(path)]
+def _resolve_references(entities) -> None:
+    """
+    Replaces the paths to TOML files in the parent, children, order and data buckets of the passed entities with the
+    UUIDs of the entities those files hold. Paths are only looked up in PATH_TO_UUID_INDEX, the filesystem is never
+    touched. References that are neither an indexed path nor an indexed UUID are left as they are and reported
+    together at the end.
+
+    In lairs of format 2 the references on disk already are UUIDs, so there is nothing to resolve.
+
+    :param entities: Iterable with the entities to update.
+    """
+    if _references_by_uuid():
+        return
+
+    unresolved = []
+
+    def resolve(ent, ref):
+        if ref in INDEX:
+            return ref
+        ID = PATH_TO_UUID_INDEX.get(ref)
+        if ID is None:
+            ID = PATH_TO_UUID_INDEX.get(str(Path(ref)))
+        if ID is None:
+            unresolved.append((ent.ID, ref))
+            return ref
+        return ID
 
-        # Update the order:
-        order_copy = val.order.copy()
-        for i, (item, item_type, show) in enumerate(order_copy):
+    for val in entities:
+        if val.parent is not None and val.parent != "":
+            val.parent = resolve(val, val.parent)
+
+        val.children = [resolve(val, child) for child in val.children]
+
+        for i, (item, item_type, show) in enumerate(val.order):
             if item_type == "entity":
-                path = Path(item)
-                if path.is_file():
-                    val.order[i] = (PATH_TO_UUID_INDEX[str(path)], item_type, show)
+                ID = resolve(val, item)
+                if ID != item:
+                    val.order[i] = (ID, item_type, show)
 
-        for buck in val.data_buckets:
-            path = Path(buck)
-            if path.is_file():
-                val.data_buckets[val.data_buckets.index(buck)] = PATH_TO_UUID_INDEX[str(path)]
+        val.data_buckets = [resolve(val, buck) for buck in val.data_buckets]
 
+    if len(unresolved) > 0:
+        examples = "\n".join(f"{ID}: {ref}" for ID, ref in unresolved[:20])
+        print(f"Could not resolve {len(unresolved)} references, showing the first {min(len(unresolved), 20)}:"
+              f"\n{examples}")
 
-def _generate_structure_helper(ent):
 
-    children = [_generate_structure_helper(INDEX[child]) for child in ent.children if INDEX[child].deleted is False]
-    name = ent.name
-    ID = ent.ID
-    type_ = ent.__class__.__name__
-    return {"name": name, "id": ID, "children": children, "type": type_}
+def _lair_layout() -> dict:
+    """
+    Returns the libraries and buckets of the lair. Used to check that a snapshot belongs to the current lair.
+    """
+    return {"ID": str(DRAGONLAIR.ID),
+            "format_version": DRAGONLAIR.format_version,
+            "libraries": [(str(lib.ID), str(lib.path)) for lib in DRAGONLAIR.libraries],
+            "buckets": {str(name): str(path) for name, path in DRAGONLAIR.buckets.items()}}
 
 
-def generate_structure(ID=None):
+def _save_snapshot() -> None:
+    """
+    Writes the current indices to SNAPSHOT_PATH. Failing to write the snapshot only makes the next start slower, so
+    errors are reported but never raised.
+    """
+    state = {"index": INDEX,
+             "path_to_uuid": PATH_TO_UUID_INDEX,
+             "uuid_to_path": UUID_TO_PATH_INDEX,
+             "instance_image": INSTANCEIMAGE,
+             "id_prefix": ID_PREFIX_INDEX,
+             "lair": _lair_layout(),
+             "skeleton": LAZY_LOADING}
+    try:
+        write_snapshot(SNAPSHOT_PATH, state, list(PATH_TO_UUID_INDEX.keys()))
+    except Exception as e:
+        print(f"Could not write snapshot to {SNAPSHOT_PATH} exception: \n{e}")
+
+
+def _load_from_snapshot() -> bool:
+    """
+    Fills the indices from the snapshot in SNAPSHOT_PATH and re-parses only the TOML files whose modification time or
+    size changed since the snapshot was written. Entities referenced for the first time by the changed files are
+    loaded as well.
+
+    :return: True if the indices were loaded from the snapshot, False if the snapshot is missing, stale or corrupt and
+        the lair needs to be loaded from scratch.
+    """
+    snapshot = read_snapshot(SNAPSHOT_PATH)
+    if snapshot is None:
+        return False
+
+    state, changed = snapshot
+    # A snapshot of skeletons cannot be used as complete entities and the other way around.
+    if state["lair"] != _lair_layout() or state["skeleton"] != LAZY_LOADING:
+        return False
+
+    INDEX.update(state["index"])
+    PATH_TO_UUID_INDEX.update(state["path_to_uuid"])
+    UUID_TO_PATH_INDEX.update(state["uuid_to_path"])
+    INSTANCEIMAGE.update(state["instance_image"])
+    ID_PREFIX_INDEX.update(state["id_prefix"])
+
+    try:
+        loaded_ids = set(INDEX.keys())
+        updated = []
+        for path in changed:
+            ent = _read_entity(path)
+            if PATH_TO_UUID_INDEX[path] != ent.ID:
+                raise ValueError(f"File {path} holds a different entity than when the snapshot was taken")
+            INDEX[ent.ID] = ent
+            updated.append(ent)
+            process_content_blocks(ent)
+            _load_unindexed_references(ent, path)
+
+        updated += [INDEX[ID] for ID in INDEX.keys() if ID not in loaded_ids]
+        _resolve_references(updated)
+    except Exception as e:
+        print(f"Could not update the snapshot at {SNAPSHOT_PATH}, loading the whole lair. exception: \n{e}")
+        for index in (INDEX, PATH_TO_UUID_INDEX, UUID_TO_PATH_INDEX, INSTANCEIMAGE, ID_PREFIX_INDEX):
+            index.clear()
+        return False
+
+    for dragon_library in DRAGONLAIR.libraries:
+        DRAGONLAIR.insert_library_instance(INDEX[dragon_library.ID])
+
+    if len(changed) > 0:
+        _save_snapshot()
+
+    return True
 
-    ret = []
+
+def generate_structure(ID=None):
+    """
+    API function that returns the names, IDs and types of the entities of every library, or of the entity with ID, with
+    their children nested. Deleted entities are left out. Only the subtrees that changed since the last request are
+    serialized again.
+    """
     if ID is None:
-        for lib in DRAGONLAIR.libraries:
-            ret.append(_generate_structure_helper(INDEX[lib.ID]))
-    else:
-        if ID not in INDEX:
-            abort(404, f"Entity with ID {ID} not found")
-        ret = _generate_structure_helper(INDEX[ID])
+        return make_response(STRUCTURE.tree(), 200)
+
+    if ID not in INDEX:
+        abort(404, f"Entity with ID {ID} not found")
+    return make_response(STRUCTURE.subtree(ID), 200)
+
+
+def _partial_structure_helper(ent: Entity, depth: int, limit: int, cursor: Optional[str] = None) -> dict:
+    """
+    Returns the structure of an entity down to depth levels of children, at most limit children per entity.
+
+    :param ent: The entity the structure is of.
+    :param depth: How many levels of children are included, 0 for none.
+    :param limit: The maximum number of children included per entity.
+    :param cursor: If passed, only the children after the child with this ID are included.
+    """
+    children = ent.children
+    num_children = sum(1 for child in children if INDEX[child].deleted is False)
+    if cursor is not None:
+        if cursor not in children:
+            abort(400, f"Cursor {cursor} is not a child of entity with ID {ent.ID}")
+        children = children[children.index(cursor) + 1:]
+    live_children = [child for child in children if INDEX[child].deleted is False]
+
+    node = {"name": ent.name, "id": ent.ID, "children": [], "type": ent.__class__.__name__,
+            "num_children": num_children, "has_more": False, "cursor": None}
+    if depth <= 0:
+        node["has_more"] = len(live_children) > 0
+        return node
+
+    page = live_children[:limit]
+    node["children"] = [_partial_structure_helper(INDEX[child], depth - 1, limit) for child in page]
+    if len(live_children) > limit:
+        node["has_more"] = True
+        node["cursor"] = page[-1]
+    return node
+
+
+def generate_partial_structure(ID, depth=1, limit=100, cursor=None):
+    """
+    API function that returns the structure of an entity only down to depth levels of children. Every entity carries
+    its number of children that are not deleted, and has_more is True if some of them are not in the response.
+    Requesting the same entity with its cursor returns the children after the ones included; entities that were cut off
+    by the depth have no cursor, requesting them returns their children from the start.
+
+    :param ID: The ID of the entity.
+    :param depth: How many levels of children are included, 0 for only the entity itself.
+    :param limit: The maximum number of children included per entity.
+    :param cursor: The cursor of the entity returned by a previous request, continues from where that one ended.
+    """
+    if ID not in INDEX:
+        abort(404, f"Entity with ID {ID} not found")
+    if depth < 0:
+        abort(400, "Depth cannot be negative")
+    if limit < 1:
+        abort(400, "Limit needs to be at least 1")
+
+    return make_response(json.dumps(_partial_structure_helper(INDEX[ID], depth, limit, cursor)), 200)
 
-    return make_response(json.dumps(ret), 200)
+
+def get_ancestors(ID):
+    """
+    API function that returns the ancestors of an entity, from the root of its tree (its library or bucket) down to its
+    parent. Only their ID, name and type are included, so the position of an entity in the tree is found without
+    reading every entity above it.
+
+    :param ID: The ID of the entity.
+    """
+    if ID not in INDEX:
+        with INDEX_LOCK:
+            _load_entity_by_id(ID)
+    if ID not in INDEX:
+        abort(404, f"Entity with ID {ID} not found")
+
+    ancestors = []
+    seen = {ID}
+    ent = INDEX[ID]
+    while ent.parent in INDEX and ent.parent not in seen:
+        seen.add(ent.parent)
+        ent = INDEX[ent.parent]
+        ancestors.append({"name": ent.name, "id": ent.ID, "type": ent.__class__.__name__})
+    ancestors.reverse()
+    return make_response(json.dumps(ancestors), 200)
+
+
+def _drop_cached_response(ID: str) -> None:
+    """
+    Removes the cached response of an entity. Must be called holding READ_CACHE_LOCK.
+    """
+    global READ_CACHE_SIZE
+
+    cached = READ_CACHE.pop(ID, None)
+    if cached is not None:
+        READ_CACHE_SIZE -= len(cached[2])
+
+
+def _cache_response(ID: str, key: tuple, etag: str, body: str) -> None:
+    """
+    Stores the response of read_one for an entity, dropping the least recently used responses once READ_CACHE_BUDGET
+    is exceeded.
+    """
+    global READ_CACHE_SIZE
+
+    with READ_CACHE_LOCK:
+        _drop_cached_response(ID)
+        READ_CACHE[ID] = (key, etag, body)
+        READ_CACHE_SIZE += len(body)
+        while READ_CACHE_SIZE > READ_CACHE_BUDGET and len(READ_CACHE) > 1:
+            _drop_cached_response(next(iter(READ_CACHE)))
+
+
+def _etag_matches(etag: str) -> bool:
+    """
+    Returns True if the request has an If-None-Match header matching the ETag.
+    """
+    header = request.headers.get('If-None-Match')
+    if header is None:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag in tags or '*' in tags
+
+
+def _serialize_entity(ent: Entity) -> str:
+    """
+    Returns the JSON representation of an entity returned by read_one.
+    """
+    # The entity is serialized as it is, only the blocks with a history are serialized again without it, so the live
+    # entity is neither copied nor modified.
+    serialized = dict(ent.to_TOML()[ent.name])
+    content_blocks = []
+    for block, block_str in zip(ent.content_blocks, serialized['content_blocks']):
+        if isinstance(block.content, ContentHistory):
+            block_dict = block.to_dict()
+            # Responses only carry the latest version, the full history is available through read_content_block.
+            block_dict.pop('history', None)
+            if block.block_type == SupportedContentBlockType.text and len(block_dict['content']) > 0:
+                block_dict['content'] = [content_block_path_to_uuid(block_dict['content'][-1])]
+            block_str = json.dumps(block_dict)
+        content_blocks.append(block_str)
+    serialized['content_blocks'] = content_blocks
+
+    # The rendered notebooks of instances are requested separately through read_analysis_notebook, only when viewed.
+    if isinstance(ent, Instance):
+        serialized['analysis'] = [{"name": Path(analysis_nb).stem, "url": f"/api/entities/{ent.ID}/analysis/{i}"}
+                                  for i, analysis_nb in enumerate(ent.analysis)]
+
+    return json.dumps(serialized)
 
 
 # FIXME: This is a bad name, it should probably be read entity or something like that instead.
 def read_one(ID, name_only=False):
     """
-    API function that returns an entity based on its ID
+    API function that returns an entity based on its ID.
+    Responses are cached until the entity changes and carry an ETag, requests with a matching If-None-Match header get
+    a 304 response without the entity being serialized.
     """
 
     if ID == DRAGONLAIR.ID:
@@ -446,7 +1437,8 @@ def read_one(ID, name_only=False):
         abort(404, "ID is null")
 
     if ID not in INDEX:
-        load_all_entities()
+        with INDEX_LOCK:
+            _load_entity_by_id(ID)
 
     if ID in INDEX:
         ent = INDEX[ID]
@@ -454,38 +1446,78 @@ def read_one(ID, name_only=False):
         if name_only:
             return ent.name, 200
 
-        ent_copy = copy.deepcopy(ent)
-        for block in ent_copy.content_blocks:
-            if block.block_type == SupportedContentBlockType.text.value:
-                replaced_path = content_block_path_to_uuid(block.content[-1])
-                block.content[-1] = replaced_path
+        # The key is taken before serializing, a change happening meanwhile makes the cached response stale right away.
+        key = (ENTITY_VERSIONS.get(ID, 0), PATHS_VERSION)
+        with READ_CACHE_LOCK:
+            cached = READ_CACHE.get(ID)
+            if cached is not None and cached[0] == key:
+                READ_CACHE.move_to_end(ID)
 
-        # If it is an instance, convert the notebooks into html
-        if isinstance(ent, Instance):
-            converted_analysis = []
-            for analysis_nb in ent_copy.analysis:
-                    # Read the notebook
-                    nb = nbformat.read(analysis_nb, as_version=4)
+        if cached is not None and cached[0] == key:
+            etag, body = cached[1], cached[2]
+        else:
+            etag = f'"{RUN_ID}-{key[0]}-{key[1]}"'
+            with INDEX_LOCK:
+                body = _serialize_entity(_hydrate(ent))
+            _cache_response(ID, key, etag, body)
 
-                    # Create HTML exporter
-                    html_exporter = HTMLExporter()
-                    html_exporter.theme = "dark"  # Change the theme of the notebook
-                    html_exporter.template_name = 'classic'  # use classic template (you can change this)
+        if _etag_matches(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(body, 201)
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    else:
+        abort(404, f"Entity with ID {ID} not found")
 
-                    # Export the notebook to HTML format
-                    (body, resources) = html_exporter.from_notebook_node(nb)
-                    converted_analysis.append((Path(analysis_nb).stem, str(body)))
 
-            # TOML table does not like having a string that is as long as an html file so the conversion needs to happen
-            # after the TOML conversion.
-            serialized = dict(ent_copy.to_TOML()[ent_copy.name])
-            serialized['analysis'] = converted_analysis
+def read_analysis_notebook(ID, index):
+    """
+    API function that returns the rendered html of one of the analysis notebooks of an instance. The ETag identifies
+    the version of the notebook file, requests with a matching If-None-Match header get a 304 response without the
+    notebook being read. The html is gzipped if the client accepts it.
 
-            return json.dumps(serialized), 201
+    :param ID: The ID of the instance.
+    :param index: The position of the notebook in the analysis of the instance.
+    """
+    if ID not in INDEX:
+        with INDEX_LOCK:
+            _load_entity_by_id(ID)
+    if ID not in INDEX:
+        abort(404, f"Entity with ID {ID} not found")
 
-        return json.dumps(ent_copy.to_TOML()[ent_copy.name]), 201
+    ent = INDEX[ID]
+    if not isinstance(ent, Instance):
+        abort(404, f"Entity with ID {ID} is not an instance")
+    with INDEX_LOCK:
+        ent = _hydrate(ent)
+    if index < 0 or index >= len(ent.analysis):
+        abort(404, f"Instance with ID {ID} does not have an analysis notebook at position {index}")
+
+    analysis_nb = ent.analysis[index]
+    version = NOTEBOOK_CACHE.version(analysis_nb)
+    if version is None:
+        abort(404, f"Analysis notebook {analysis_nb} not found")
+
+    etag = f'"{version}"'
+    if _etag_matches(etag):
+        response = make_response("", 304)
     else:
-        abort(404, f"Entity with ID {ID} not found")
+        try:
+            html = NOTEBOOK_CACHE.get(analysis_nb)
+        except FileNotFoundError:
+            abort(404, f"Analysis notebook {analysis_nb} not found")
+        if request.accept_encodings['gzip'] > 0:
+            response = make_response(gzip.compress(html.encode('utf-8'), compresslevel=6), 200)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = make_response(html, 200)
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 
 def read_content_block(ID, blockID, whole_content_block=False):
@@ -501,32 +1533,30 @@ def read_content_block(ID, blockID, whole_content_block=False):
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
 
-    ent = INDEX[ID]
-    ids = [c.ID for c in ent.content_blocks]
-    if blockID not in ids:
-        abort(404, f"Content block with ID {blockID} not found")
-    ind = ids.index(blockID)
-    if ind == -1:
+    ent = _hydrate(INDEX[ID])
+    try:
+        block = ent.get_content_block(blockID)
+    except ValueError:
         abort(404, f"Content block with ID {blockID} not found")
-    block = ent.content_blocks[ind]
     content, author, date = block.latest_version()
 
     if block.block_type == SupportedContentBlockType.image:
         return send_file(content[0])
 
     if whole_content_block:
-        return json.dumps(str(block)), 201
+        return json.dumps(json.dumps(block.to_dict(full_history=True))), 201
     else:
         return json.dumps(content), 201
 
 
-def generate_tree(ID: str, deepness: int = 7):
+def _render_tree(ent: Entity, depth: int, breadth: int) -> List[str]:
     """
-    Deepness is the number of levels of children that are included in the tree.
-    as well as how many children per level are returning.
+    Returns the lines of the text tree of an entity in a single depth-first pass. Every pending line carries the prefix
+    of its own line and the one of the lines of its children.
 
-    :param ent: The entity to generate the tree from
-    :param deepness: How many items and levels (rank) to include in the tree.
+    :param ent: The root of the tree.
+    :param depth: How many levels, the root included, are in the tree.
+    :param breadth: How many children per entity are in the tree.
     """
     new_node = "├── "
     last_node = "└── "
@@ -534,89 +1564,133 @@ def generate_tree(ID: str, deepness: int = 7):
     vertical_node = "│   "
     incomplete_node = "└ ⋯ "
 
-    def populate_tree(ent, deepness, parent_tree, level=0):
-        if level == deepness:
-            return parent_tree
+    lines = []
+    # Holds either lines that are already complete or tuples of the entity, its level, the prefix of its line and the
+    # prefix of the lines of its children. Children are pushed in reverse so the first one is popped first. The children
+    # of the root are indented as well.
+    stack = [(ent, 0, "", empty_node)]
+    while len(stack) > 0:
+        item = stack.pop()
+        if isinstance(item, str):
+            lines.append(item)
+            continue
+
+        node, level, line_prefix, children_prefix = item
+        lines.append(line_prefix + node.name)
+
+        if level + 1 == depth:
+            if len(node.children) > 0:
+                lines.append(children_prefix + incomplete_node)
+            continue
+
+        shown = node.children[:breadth]
+        complete = len(shown) == len(node.children)
+        pending = []
+        for i, child in enumerate(shown):
+            if complete and i == len(shown) - 1:
+                pending.append((INDEX[child], level + 1, children_prefix + last_node, children_prefix + empty_node))
+            else:
+                pending.append((INDEX[child], level + 1, children_prefix + new_node, children_prefix + vertical_node))
+        if not complete:
+            pending.append(children_prefix + incomplete_node)
+        stack.extend(reversed(pending))
+
+    return lines
+
+
+def _tree_dict(ent: Entity, depth: int, breadth: int, level: int = 0) -> dict:
+    """
+    Returns the same tree as _render_tree as nested dictionaries. complete is False if some of the children of the
+    entity are left out of the tree.
+    """
+    if level + 1 == depth:
+        shown = []
+    else:
+        shown = ent.children[:breadth]
+    return {"name": ent.name,
+            "id": ent.ID,
+            "type": ent.__class__.__name__,
+            "children": [_tree_dict(INDEX[child], depth, breadth, level + 1) for child in shown],
+            "complete": len(shown) == len(ent.children)}
 
-        parent_tree[ent.name] = {}
-        for i, child in enumerate(ent.children):
-            if i == deepness:
-                break
-            populate_tree(INDEX[child], deepness, parent_tree[ent.name], level+1)
 
-        if len(parent_tree[ent.name]) == len(ent.children):
-            parent_tree[ent.name]["__complete__"] = True
-        else:
-            parent_tree[ent.name]["__complete__"] = False
-        return parent_tree
-
-    def make_tree(data, ret_="", fill_indent=0, empty_indent=0):
-        n_keys = len(list(data.keys()))
-        lines = ret_.split("\n")
-
-        # you need to change from fill indent to empty indent in the last row
-        # so that lines that head to nowhere don't appear
-        if len(lines) >= 2 and last_node in lines[-2]:
-            empty_indent += 1
-            fill_indent -= 1
-
-        if fill_indent + empty_indent == 0:
-            keys = list(data.keys())
-            ret_ += keys[0] + "\n"
-            ret_ = make_tree(data[keys[0]], ret_, fill_indent, empty_indent + 1)
-        else:
-            for i, (key, value) in enumerate(data.items()):
-                if key == "__complete__":
-                    if value:
-                        continue
-                    else:
-                        new_addition = empty_node * empty_indent + fill_indent * vertical_node + incomplete_node + "\n"
-                        ret_ += new_addition
-                    continue
+def generate_tree(ID: str, deepness: int = 7, depth: Optional[int] = None, breadth: Optional[int] = None,
+                  as_json: bool = False):
+    """
+    Deepness is the number of levels of children that are included in the tree.
+    as well as how many children per level are returning.
 
-                # Deciding what node to use, if last or new one
-                # You need -2 because the complete key is metadata
-                selected_node = new_node
-                if i == n_keys - 2 and data["__complete__"] is True:
-                    selected_node = last_node
+    :param ent: The entity to generate the tree from
+    :param deepness: How many items and levels (rank) to include in the tree.
+    :param depth: If passed, how many levels to include in the tree instead of deepness.
+    :param breadth: If passed, how many children per entity to include in the tree instead of deepness.
+    :param as_json: If True, the tree is returned as nested dictionaries instead of text.
+    """
+    if ID not in INDEX:
+        abort(404, f"Entity with ID {ID} not found")
 
-                new_addition = empty_node * empty_indent + fill_indent * vertical_node + selected_node + key + "\n"
-                ret_ += new_addition
-                ret_ = make_tree(value, ret_, fill_indent + 1, empty_indent)
-        return ret_
+    depth = deepness if depth is None else depth
+    breadth = deepness if breadth is None else breadth
+    if depth < 1 or breadth < 0:
+        abort(400, "The tree needs a depth of at least 1 and a breadth that is not negative")
 
     ent = INDEX[ID]
+    if as_json:
+        return make_response(json.dumps(_tree_dict(ent, depth, breadth)), 201)
 
-    tree = {}
-    tree = populate_tree(ent, deepness, tree)
-    ret = make_tree(tree)
+    ret = "".join(line + "\n" for line in _render_tree(ent, depth, breadth))
     return make_response(json.dumps(ret), 201)
 
 
-def _get_rank_and_num_children(ent: Entity) -> Tuple[int, int]:
+def _compute_aggregates(ID: str) -> dict:
     """
-    Recursive helper function. Returns the rank of the entity and the total number of children it has.
+    Computes the aggregates of the subtree of an entity from the ones of its children, computing first the ones of the
+    children that do not have them yet. Must be called holding AGGREGATES_LOCK.
 
-    :param ent: The current entity that we are going over.
-    :return: The number of entities that are child of ent as well as the rank of this entity.
+    The aggregates are:
+        * rank: How many levels deep the children go, multiple siblings do not add to this number.
+        * num_children: The total number of descendants, deleted ones included.
+        * deleted_children: How many of the descendants are flagged as deleted.
+        * live_children: How many of the descendants are not flagged as deleted.
     """
     rank = 0
     num_children = 0
-    for child_id in ent.children:
+    deleted_children = 0
+    for child_id in INDEX[ID].children:
         if child_id in INDEX:
-            num_children += 1
-            child = INDEX[child_id]
-            child_rank, child_num_children = _get_rank_and_num_children(child)
-            rank = max(rank, child_rank + 1)
-            num_children += child_num_children
+            child = SUBTREE_AGGREGATES.get(child_id)
+            if child is None:
+                child = _compute_aggregates(child_id)
+            rank = max(rank, child["rank"] + 1)
+            num_children += 1 + child["num_children"]
+            deleted_children += int(INDEX[child_id].deleted is True) + child["deleted_children"]
 
-    return rank, num_children
+    aggregates = {"rank": rank,
+                  "num_children": num_children,
+                  "deleted_children": deleted_children,
+                  "live_children": num_children - deleted_children}
+    SUBTREE_AGGREGATES[ID] = aggregates
+    return aggregates
+
+
+def _update_aggregates(ID: str) -> None:
+    """
+    Computes again the aggregates of an entity and of all of its ancestors. Needs to be called after the children or
+    the deleted flag of the entity change.
+    """
+    with AGGREGATES_LOCK:
+        seen = set()
+        while ID in INDEX and ID not in seen:
+            seen.add(ID)
+            _compute_aggregates(ID)
+            ID = INDEX[ID].parent
 
 
 def read_entity_info(ID):
     """
-    For now, this function only figures out the "rank" and the total number of children it has.
-    By "rank" we mean how many levels deep the children go, multiple siblings do not add to this number.
+    Returns the aggregates of the subtree of the entity: its "rank", the total number of children it has and how many
+    of them are deleted or not. By "rank" we mean how many levels deep the children go, multiple siblings do not add to
+    this number.
 
     :param ID:
     :return:
@@ -625,11 +1699,14 @@ def read_entity_info(ID):
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
 
-    ent = INDEX[ID]
-    rank, num_children = _get_rank_and_num_children(ent)
-    return make_response(json.dumps({"rank": rank, "num_children": num_children}), 201)
+    aggregates = SUBTREE_AGGREGATES.get(ID)
+    if aggregates is None:
+        with AGGREGATES_LOCK:
+            aggregates = _compute_aggregates(ID)
+    return make_response(json.dumps(aggregates), 201)
 
 
+@_holding_index_lock
 def add_text_block(ID, body, user: str, under_child: str = None):
     """
     Adds a text block to the indicated entity. It does not handle images or tables yet.
@@ -647,18 +1724,16 @@ def add_text_block(ID, body, user: str, under_child: str = None):
 
     user = _parse_and_validate_user(user)
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
 
-    ent.add_text_block(body, user, under_child)
+    block = ent.add_text_block(body, user, under_child)
 
-    # After adding the content blocks update the file location
-    ent_path = Path(UUID_TO_PATH_INDEX[ID])
-    copy_ent = create_path_entity_copy(ent)
-    copy_ent.to_TOML(ent_path)
+    _record_change(ent, journal.block_added(block, under_child))
 
     return make_response("Content block added", 201)
 
 
+@_holding_index_lock
 def edit_text_block(ID, blockID, body, user):
 
     if ID not in INDEX:
@@ -666,14 +1741,13 @@ def edit_text_block(ID, blockID, body, user):
 
     user = _parse_and_validate_user(user)
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
 
     try:
         ret = ent.modify_text_block(blockID, body, user)
         if ret:
-            # Convert uuids in the entity to paths
-            path_copy = create_path_entity_copy(ent)
-            path_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+            block = ent.get_content_block(blockID)
+            _record_change(ent, journal.block_modified(block))
             return make_response("Content block edited successfully", 201)
     except ValueError as e:
         abort(400, str(e))
@@ -698,6 +1772,7 @@ def _add_image(image, filename=None):
     return file_path, filename
 
 
+@_holding_index_lock
 def add_image_block(ID, user, body, image, under_child=None):
 
     if ID not in INDEX:
@@ -705,29 +1780,27 @@ def add_image_block(ID, user, body, image, under_child=None):
 
     user = _parse_and_validate_user(user)
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
 
     under_child = under_child if (under_child is not None and under_child != "undefined") else None
 
     file_path, filename = _add_image(image)
 
-    ent.add_image_block(file_path, filename, user, under_child)
+    block = ent.add_image_block(file_path, filename, user, under_child)
 
-    # After adding the content blocks update the file location
-    ent_path = Path(UUID_TO_PATH_INDEX[ID])
-    copy_ent = create_path_entity_copy(ent)
-    copy_ent.to_TOML(ent_path)
+    _record_change(ent, journal.block_added(block, under_child))
 
     return make_response("Content block added", 201)
 
 
+@_holding_index_lock
 def edit_image_block(ID, blockID, user, body, image=None, title=None):
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
 
     user = _parse_and_validate_user(user)
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
 
     # for some reason connexion only passes image as an argument if there is an actual image there, if its None/null
     # e.i. changing the title only, it is in body.
@@ -746,9 +1819,8 @@ def edit_image_block(ID, blockID, user, body, image=None, title=None):
     try:
         ret = ent.modify_image_block(blockID, user, image_path=file_path, title=title)
         if ret:
-            # Convert uuids in the entity to paths
-            path_copy = create_path_entity_copy(ent)
-            path_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+            block = ent.get_content_block(blockID)
+            _record_change(ent, journal.block_modified(block))
             return make_response("Content block edited successfully", 201)
     except ValueError as e:
         abort(400, str(e))
@@ -756,6 +1828,7 @@ def edit_image_block(ID, blockID, user, body, image=None, title=None):
     return abort(400, "Something went wrong, try again")
 
 
+@_holding_index_lock
 def add_image_link_block(ID, user, instance_id, image_path, under_child=None):
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
@@ -766,32 +1839,29 @@ def add_image_link_block(ID, user, instance_id, image_path, under_child=None):
     user = _parse_and_validate_user(user)
     under_child = under_child if (under_child is not None and under_child != "undefined" and ID != under_child) else None
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
 
     image_path = image_path.replace("#", "/")
 
-    ent.add_image_link_block(instance_id, image_path, user, under_child)
+    block = ent.add_image_link_block(instance_id, image_path, user, under_child)
 
-    # After adding the content blocks update the file location
-    ent_path = Path(UUID_TO_PATH_INDEX[ID])
-    copy_ent = create_path_entity_copy(ent)
-    copy_ent.to_TOML(ent_path)
+    _record_change(ent, journal.block_added(block, under_child))
 
     return make_response("Content block added", 201)
 
 
+@_holding_index_lock
 def delete_content_block(ID, blockID):
 
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
 
     try:
         ret = ent.delete_block(blockID)
         if ret:
-            path_copy = create_path_entity_copy(ent)
-            path_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+            _record_change(ent, journal.block_deleted(blockID))
             return make_response("Content block deleted successfully", 200)
     except ValueError as e:
         abort(400, str(e))
@@ -799,6 +1869,7 @@ def delete_content_block(ID, blockID):
     return abort(400, "Something went wrong, try again")
 
 
+@_holding_index_lock
 def add_comment(ID, user, body, content_block_id = None):
     if "comment" not in body:
         abort(400, "Comment is required")
@@ -809,12 +1880,11 @@ def add_comment(ID, user, body, content_block_id = None):
 
     user = _parse_and_validate_user(user)
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
     try:
-        ret = ent.add_comment(body=comment_text, user=user, content_block_id=content_block_id)
-        if ret:
-            path_copy = create_path_entity_copy(ent)
-            path_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+        comment = ent.add_comment(body=comment_text, user=user, content_block_id=content_block_id)
+        if comment:
+            _record_change(ent, journal.comment_added(comment))
             return make_response("Comment added", 201)
 
     except ValueError as e:
@@ -823,6 +1893,7 @@ def add_comment(ID, user, body, content_block_id = None):
     return abort(400, "Something went wrong, try again")
 
 
+@_holding_index_lock
 def add_comment_reply(ID, user, comment_id, body):
     if "reply_body" not in body:
         abort(400, "reply_body is required")
@@ -833,12 +1904,11 @@ def add_comment_reply(ID, user, comment_id, body):
 
     user = _parse_and_validate_user(user)
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
     try:
-        ret = ent.add_comment_reply(body=reply_body, user=user, comment_id=comment_id)
-        if ret:
-            path_copy = create_path_entity_copy(ent)
-            path_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+        reply = ent.add_comment_reply(body=reply_body, user=user, comment_id=comment_id)
+        if reply:
+            _record_change(ent, journal.reply_added(comment_id, reply))
             return make_response("Comment added", 201)
 
     except ValueError as e:
@@ -847,16 +1917,16 @@ def add_comment_reply(ID, user, comment_id, body):
     return abort(400, "Something went wrong, try again")
 
 
+@_holding_index_lock
 def resolve_comment(ID, comment_id):
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
     try:
         ret = ent.resolve_comment(comment_id)
         if ret:
-            path_copy = create_path_entity_copy(ent)
-            path_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+            _record_change(ent, journal.comment_resolved(comment_id))
             return make_response("Comment resolved", 201)
 
     except ValueError as e:
@@ -866,6 +1936,7 @@ def resolve_comment(ID, comment_id):
 
 
 
+@_holding_index_lock
 def add_library(body):
     """
     Creates a new library and adds it to the system.
@@ -884,16 +1955,18 @@ def add_library(body):
     library = Library(name=body['name'], user=user)
     lib_path = LAIRSPATH.joinpath(library.ID[:8] + '_' + library.name + '.toml')
 
-    path_copy = create_path_entity_copy(library)
-    path_copy.to_TOML(lib_path)
+    _save_entity(library, lib_path)
 
     DRAGONLAIR.add_library(library, lib_path)
     add_ent_to_index(library, lib_path)
+    STRUCTURE.invalidate(library.ID)
+    _update_aggregates(library.ID)
 
     return make_response(f"Library named {body['name']} added", 201)
 
 
 # TODO: Check for buckets as well, these should be added from here
+@_holding_index_lock
 def add_entity(body):
     """
     Creates an entity through the API call. It will add the entity to the parent and create the new TOML file
@@ -940,18 +2013,17 @@ def add_entity(body):
 
     add_ent_to_index(ent, ent_path)
 
-    # Create copy of the entity with paths to create the TOML file.
-    ent_copy = create_path_entity_copy(ent)
-
     parent.add_child(ent.ID, under_child=under_child)
-    parent_copy = create_path_entity_copy(parent)
+    STRUCTURE.invalidate(parent.ID)
+    _update_aggregates(ent.ID)
 
-    parent_copy.to_TOML(parent_path)
-    ent_copy.to_TOML(ent_path)
+    _save_entity(parent)
+    _save_entity(ent)
 
     return make_response("Entity added", 201)
 
 
+@_holding_index_lock
 def delete_entity(ID):
 
     if ID not in INDEX:
@@ -963,18 +2035,20 @@ def delete_entity(ID):
 
     parent = INDEX[ent.parent]
     parent.delete_child(ID)
-    parent_copy = create_path_entity_copy(parent)
-    parent_copy.to_TOML(Path(UUID_TO_PATH_INDEX[parent.ID]))
+    _save_entity(parent)
 
     # Flag the entity as deleted
     ent.deleted = True
-    ent_copy = create_path_entity_copy(ent)
-    ent_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+    STRUCTURE.invalidate(ID)
+    SECONDARY_INDEX.update(ent, 'deleted')
+    _update_aggregates(parent.ID)
+    _save_entity(ent)
 
     return make_response("Entity deleted", 201)
 
 
 # TODO: Better record keeping of when the name is change and who changed it is needed.
+@_holding_index_lock
 def change_entity_name(ID, body):
     """
     Changes the name of an entity and updates the TOML file.
@@ -982,6 +2056,7 @@ def change_entity_name(ID, body):
     :param ID: id of the entity
     :param body[new_name]: new name of the entity
     """
+    global PATHS_VERSION
 
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
@@ -990,33 +2065,41 @@ def change_entity_name(ID, body):
 
     new_name = body['new_name']
 
-    ent = INDEX[ID]
+    # Needs to be hydrated before its path changes, there is nothing to hydrate it from at the new path.
+    ent = _hydrate(INDEX[ID])
     ent.change_name(new_name)
+    STRUCTURE.invalidate(ID)
     old_ent_path = Path(UUID_TO_PATH_INDEX[ID])
     new_ent_path = old_ent_path.parent.joinpath(f"{ID[:8]}_" + new_name + '.toml')
 
     # Update the UUID indexes
     del PATH_TO_UUID_INDEX[str(old_ent_path)]
     PATH_TO_UUID_INDEX[str(new_ent_path)] = ID
+    PATHS_VERSION += 1
+    with READ_CACHE_LOCK:
+        _drop_cached_response(ID)
     UUID_TO_PATH_INDEX[ID] = str(new_ent_path)
+    _add_path_to_prefix_index(new_ent_path)
+    ID_PREFIX_INDEX[ID[:8]].discard(str(old_ent_path))
+    # Libraries and buckets are referenced by path from the lair.
+    DRAGONLAIR.update_path(old_ent_path, new_ent_path)
 
-    # Update the TOML file
-    ent_copy = create_path_entity_copy(ent)
-    ent_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+    # Update the TOML file. It moves to the new path, so it is written immediately even with write-behind.
+    _save_entity(ent, immediate=True)
 
-    # Update parents
-    parent = INDEX[ent.parent]
-    parent_copy = create_path_entity_copy(parent)
-    parent_copy.to_TOML(Path(UUID_TO_PATH_INDEX[parent.ID]))
+    # In format 1, files on disk reference each other by path, so the parent and children are rewritten as well.
+    if not _references_by_uuid():
+        parent = INDEX.get(ent.parent)
+        if parent is not None:
+            _save_entity(parent, immediate=True)
 
-    # Update the children
-    for child in ent.children:
-        child_ent = INDEX[child]
-        child_ent_copy = create_path_entity_copy(child_ent)
-        child_ent_copy.to_TOML(Path(UUID_TO_PATH_INDEX[child]))
+        for child in ent.children:
+            child_ent = INDEX[child]
+            _save_entity(child_ent, immediate=True)
 
     if new_ent_path.is_file():
-        old_ent_path.unlink()
+        # With write-behind, entities that were added but not flushed yet have no file at the old path.
+        old_ent_path.unlink(missing_ok=True)
     else:
         abort(400, f"Could not find the file {old_ent_path}")
 
@@ -1094,6 +2177,26 @@ def get_types():
     return json.dumps(list(ENTITY_TYPES)), 201
 
 
+def query_entities(type=None, bookmarked=None, user=None, deleted=None, library=None):
+    """
+    API function that returns the entities matching every one of the passed filters, through the secondary indices.
+
+    :param type: The class name of the entities.
+    :param bookmarked: Whether the entities are bookmarked.
+    :param user: One of the users of the entities.
+    :param deleted: Whether the entities are flagged as deleted.
+    :param library: The ID of the library the entities are in.
+    :return: json with keys being the ID of the entities and the value their name, in the order they were loaded.
+    """
+    filters = {name: value for name, value in (("type", type), ("bookmarked", bookmarked), ("user", user),
+                                               ("deleted", deleted), ("library", library)) if value is not None}
+    if len(filters) == 0:
+        abort(400, "At least one filter is required")
+
+    ret = {ID: INDEX[ID].name for ID in SECONDARY_INDEX.query(**filters)}
+    return make_response(json.dumps(ret), 201)
+
+
 def get_possible_parents():
     """
     API function that returns a dictionary of all the entities
@@ -1101,10 +2204,7 @@ def get_possible_parents():
     This is used for the select item to display all the possible parents for new entities.
     :return: json representation of a list of all the possible parents for a given entity
     """
-    ret = {}
-    for k, v in INDEX.items():
-        if v.__class__.__name__ in PARENT_TYPES:
-            ret[k] = v.name
+    ret = {ID: INDEX[ID].name for ID in SECONDARY_INDEX.query(type=PARENT_TYPES)}
     return json.dumps(ret), 201
 
 
@@ -1125,6 +2225,7 @@ def _search_parents_with_buckets(ent):
     return ret_ent
 
 
+@_holding_index_lock
 def add_bucket(user, name, location=None):
     """
     API function that adds a bucket to the system
@@ -1153,12 +2254,14 @@ def add_bucket(user, name, location=None):
         bucket_path = Path(location).joinpath(bucket.ID[:8] + '_' + bucket.name + '.toml')
 
 
-    path_copy = create_path_entity_copy(bucket)
-    path_copy.to_TOML(bucket_path)
+    _save_entity(bucket, bucket_path)
     DRAGONLAIR.add_bucket(name, bucket, bucket_path)
 
     add_ent_to_index(bucket, bucket_path)
 
+    if BUCKET_WATCHER is not None:
+        BUCKET_WATCHER.add_root(Path(bucket_path).parent)
+
     return make_response(f"Bucket named {name} added", 201)
 
 
@@ -1167,6 +2270,7 @@ def delete_bucket(bucketID):...
 
 
 
+@_holding_index_lock
 def set_target_bucket(ID, bucket_ID):
 
     if bucket_ID not in INDEX:
@@ -1185,12 +2289,12 @@ def set_target_bucket(ID, bucket_ID):
     entity.set_bucket_target(bucket.ID)
 
     # Update the TOML file
-    entity = create_path_entity_copy(entity)
-    entity.to_TOML(Path(UUID_TO_PATH_INDEX[entity.ID]))
+    _save_entity(entity)
 
     return make_response("Target set", 201)
 
 
+@_holding_index_lock
 def unset_target_bucket(ID, bucket_ID):
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
@@ -1202,8 +2306,7 @@ def unset_target_bucket(ID, bucket_ID):
     entity.unset_bucket_target(bucket_ID)
 
     # Update the TOML file
-    entity = create_path_entity_copy(entity)
-    entity.to_TOML(Path(UUID_TO_PATH_INDEX[entity.ID]))
+    _save_entity(entity)
 
     return make_response("Target unset", 201)
 
@@ -1318,29 +2421,64 @@ def add_instance(body):
     if not Path(data_path).is_dir():
         abort(403, f"Data with path {data_path} not found")
 
-    data_file = data_path.joinpath('data.ddh5')
+    data_file = data_path.joinpath(DATA_FILENAME)
     if not data_file.is_file():
         abort(403, f"Data with path {data_file} not found")
 
+    with INDEX_LOCK:
+        # The bucket watcher might have created the instance of the folder already.
+        if _has_instance(data_path, _instance_folders(bucket)):
+            return make_response("Instance already exists", 201)
+
+        instance, instance_path = _create_instance(bucket, data_path, user, start_time, end_time)
+
+        _save_entity(bucket)
+
+        _save_entity(instance, instance_path)
+
+        add_ent_to_index(instance, instance_path)
+
+    return make_response("Instance added", 201)
+
+
+def _instance_folders(bucket: Bucket) -> dict:
+    """
+    Returns the measurement folders of the instances of the bucket as keys and the IDs of the instances as values.
+    """
+    return {Path(ins_path).parent: ins_ID for ins_path, ins_ID in bucket.path_to_uuid.items()}
+
+
+def _has_instance(folder: Path, instance_folders: dict) -> bool:
+    """
+    Returns True if the measurement folder already has an instance, in the bucket or written in the folder. Checked by
+    add_instance and the bucket watcher before creating one, so a folder reported by both gets a single instance.
+
+    :param folder: The folder containing the data file.
+    :param instance_folders: The folders of the instances of the bucket, as returned by _instance_folders.
+    """
+    return folder in instance_folders or any(folder.glob('*.toml'))
+
+
+def _create_instance(bucket: Bucket, data_path: Path, user, start_time=None, end_time=None) -> Tuple[Instance, Path]:
+    """
+    Creates the instance of a measurement folder and adds it to the bucket. Neither of them is saved nor indexed.
+
+    :param bucket: The bucket the instance belongs to.
+    :param data_path: The folder containing the data file.
+    :param user: The user that created the instance.
+    :return: The instance and the path of its TOML file.
+    """
     instance = Instance(name=data_path.name,
-                        data=[str(data_file)],
+                        data=[str(data_path.joinpath(DATA_FILENAME))],
                         user=user,
                         start_time=start_time,
                         end_time=end_time,
-                        parent=bucket_ID)
+                        parent=bucket.ID)
 
     instance_path = data_path.joinpath(instance.ID[:8] + '_' + data_path.name + '.toml')
     bucket.add_instance(instance_path, instance.ID)
 
-    bucket_copy = create_path_entity_copy(bucket)
-    bucket_copy.to_TOML(Path(UUID_TO_PATH_INDEX[bucket_ID]))
-
-    instance_copy = create_path_entity_copy(instance)
-    instance_copy.to_TOML(instance_path)
-
-    add_ent_to_index(instance, instance_path)
-
-    return make_response("Instance added", 201)
+    return instance, instance_path
 
 
 def add_analysis_files_to_instance(body):
@@ -1358,7 +2496,7 @@ def add_analysis_files_to_instance(body):
     uuid_ = PATH_TO_UUID_INDEX[str(data_path)]
     if uuid_ not in INDEX:
         abort(404, f"Instance with path {data_path} not found")
-    instance = INDEX[uuid_]
+    instance = _hydrate(INDEX[uuid_])
 
     if "analysis_files" not in body or body['analysis_files'] == "":
         abort(400, f"No analysis files are provided")
@@ -1367,31 +2505,143 @@ def add_analysis_files_to_instance(body):
     if not isinstance(analysis_files, list):
         abort(400, f"Analysis files should be a list")
 
-    for analysis_file in analysis_files:
-        path = Path(analysis_file)
-        if not path.is_file():
-            abort(404, f"Analysis file with path {path} not found")
-
-        if path.suffix == '.jpg' or path.suffix == '.png':
-            if path not in instance.images and analysis_file not in instance.images:
-                img = Image.open(path)
-                instance.images.append(str(path))
-        elif path.suffix == '.html':
-            if path not in instance.analysis and analysis_file not in instance.analysis:
-                instance.images.append(str(path))
-        elif path.suffix == '.ipynb':
-            if path not in instance.analysis and analysis_file not in instance.analysis:
-                instance.analysis.append(str(path))
-        elif path.suffix == '.json':
-            if path not in instance.stored_params and analysis_file not in instance.stored_params:
-                instance.stored_params.append(str(path))
-
-    instance_copy = create_path_entity_copy(instance)
-    instance_copy.to_TOML(data_path)
+    with INDEX_LOCK:
+        for analysis_file in analysis_files:
+            path = Path(analysis_file)
+            if not path.is_file():
+                abort(404, f"Analysis file with path {path} not found")
+
+            _add_analysis_file(instance, path)
+
+        _save_entity(instance, data_path)
 
     return make_response("Analysis files added", 201)
 
 
+def _add_analysis_file(instance: Instance, path: Path) -> bool:
+    """
+    Adds an analysis file to the field of the instance that corresponds to its suffix. Images and html plots go to
+    images, notebooks to analysis, JSON files to stored_params and tag files to tags. The instance is not saved.
+
+    :param instance: The instance the file belongs to.
+    :param path: The path to the analysis file.
+    :return: True if the instance changed.
+    """
+    file = str(path)
+    if path.suffix in IMAGE_SUFFIXES or path.suffix == '.html':
+        if file in instance.images:
+            return False
+        instance.images.append(file)
+        if path.suffix in IMAGE_SUFFIXES:
+            INSTANCEIMAGE[file] = instance.ID
+    elif path.suffix == '.ipynb':
+        # Rendered ahead of time so the first view of the instance does not wait for it. Also done when the notebook
+        # is already in the instance, since it might have changed.
+        NOTEBOOK_CACHE.warm([file])
+        if file in instance.analysis:
+            return False
+        instance.analysis.append(file)
+    elif path.suffix == '.json':
+        if file in instance.stored_params:
+            return False
+        instance.stored_params.append(file)
+    elif path.suffix == '.tag':
+        # remove the leading and ending '__'
+        tag = path.stem[2:-2]
+        # Instances created without tags have an empty string instead of a list.
+        if not isinstance(instance.tags, list):
+            instance.tags = [instance.tags] if instance.tags != '' else []
+        if tag in instance.tags:
+            return False
+        instance.tags.append(tag)
+    else:
+        return False
+    return True
+
+
+def _start_bucket_watcher() -> None:
+    """
+    Starts watching the folders of all the buckets. The folder of a bucket is the one holding its TOML file.
+    """
+    global BUCKET_WATCHER
+
+    roots = [Path(bucket_path).parent for bucket_path in DRAGONLAIR.buckets.values()]
+    BUCKET_WATCHER = BucketWatcher(roots, _ingest_watched_paths, debounce=WATCH_DEBOUNCE)
+    BUCKET_WATCHER.start()
+
+
+def _bucket_of_path(path: Path) -> Optional[Bucket]:
+    """
+    Returns the bucket with the deepest folder containing path, or None if the path is not in the folder of any bucket.
+    """
+    ret, depth = None, -1
+    for bucket_path in DRAGONLAIR.buckets.values():
+        folder = Path(bucket_path).parent
+        if path.is_relative_to(folder) and len(folder.parts) > depth and str(bucket_path) in PATH_TO_UUID_INDEX:
+            ret, depth = INDEX[PATH_TO_UUID_INDEX[str(bucket_path)]], len(folder.parts)
+    return ret
+
+
+def _ingest_watched_paths(paths: List[Path]) -> None:
+    """
+    Called by the bucket watcher with the paths that changed. Creates an instance for every new measurement folder and
+    adds the analysis files to the instance of the measurement folder they are in. Each modified instance and bucket is
+    saved once.
+
+    :param paths: Data files, analysis files and folders that were created or modified.
+    """
+    files = set()
+    for path in paths:
+        if path.is_dir():
+            files.update(p for p in path.rglob('*') if p.name == DATA_FILENAME or p.suffix in ANALYSIS_SUFFIXES)
+        elif path.is_file():
+            files.add(path)
+
+    with INDEX_LOCK:
+        modified_buckets = {}
+        modified_instances = {}
+        files_per_bucket = {}
+        for file in files:
+            bucket = _bucket_of_path(file)
+            if bucket is not None:
+                files_per_bucket.setdefault(bucket.ID, []).append(file)
+
+        for bucket_ID, bucket_files in files_per_bucket.items():
+            bucket = INDEX[bucket_ID]
+            instance_folders = _instance_folders(bucket)
+
+            # New measurements first, so the analysis files in their folders go to the new instances.
+            for file in sorted(bucket_files, key=lambda f: f.name != DATA_FILENAME):
+                if file.name == DATA_FILENAME:
+                    if _has_instance(file.parent, instance_folders):
+                        continue
+                    instance, instance_path = _create_instance(bucket, file.parent, bucket.user)
+                    add_ent_to_index(instance, instance_path)
+                    instance_folders[file.parent] = instance.ID
+                    # Analysis files might have settled before the data file did.
+                    for analysis_file in file.parent.rglob('*'):
+                        if analysis_file.suffix in ANALYSIS_SUFFIXES:
+                            _add_analysis_file(instance, analysis_file)
+                    modified_buckets[bucket.ID] = bucket
+                    modified_instances[instance.ID] = instance
+                    continue
+
+                ins_ID = next((instance_folders[folder] for folder in file.parents if folder in instance_folders), None)
+                if ins_ID is None or ins_ID not in INDEX:
+                    continue
+                instance = _hydrate(INDEX[ins_ID])
+                if _add_analysis_file(instance, file):
+                    modified_instances[ins_ID] = instance
+
+        for instance in modified_instances.values():
+            _save_entity(instance)
+        for bucket in modified_buckets.values():
+            _save_entity(bucket)
+
+    if len(modified_instances) > 0:
+        print(f"Bucket watcher saved {len(modified_instances)} instances and {len(modified_buckets)} buckets.")
+
+
 def get_instance_image(imagePath):
 
     path = Path(imagePath.replace('#', '/'))
@@ -1401,6 +2651,7 @@ def get_instance_image(imagePath):
     return send_file(path)
 
 
+@_holding_index_lock
 def toggle_star(data_loc: str):
     """
     Toggles the star tag of an instance.This changes both the parameter in the folder containing the instance as well as the TOML file.
@@ -1432,14 +2683,12 @@ def toggle_star(data_loc: str):
         star_path.unlink()
         if "star" in instance.tags:
             instance.tags.remove("star")
-            instance_copy = create_path_entity_copy(instance)
-            instance_copy.to_TOML(instance_path)
+            _save_entity(instance, instance_path)
     else:
         star_path.touch()
         if "star" not in instance.tags:
             instance.tags.append("star")
-            instance_copy = create_path_entity_copy(instance)
-            instance_copy.to_TOML(instance_path)
+            _save_entity(instance, instance_path)
 
     return make_response("Star toggled", 201)
 
@@ -1450,10 +2699,7 @@ def get_buckets():
     API function that returns a dictionary of all the buckets
     :return: json with keys being the ID of the bucket and the value its name.
     """
-    ret = {}
-    for k, v in INDEX.items():
-        if isinstance(v, Bucket):
-            ret[k] = v.name
+    ret = {ID: INDEX[ID].name for ID in SECONDARY_INDEX.query(type=Bucket.__name__)}
     return ret, 201
 
 
@@ -1489,7 +2735,7 @@ def get_stored_params(ID):
     if ID not in INDEX:
         abort(404, f"Entity with ID {ID} not found")
 
-    ent = INDEX[ID]
+    ent = _hydrate(INDEX[ID])
 
     if not isinstance(ent, Instance):
         abort(400, f"Entity with ID {ID} is not an instance")
@@ -1525,6 +2771,7 @@ def get_fake_mentions():
     return json.dumps(fake_dict), 201
 
 
+@_holding_index_lock
 def toggle_bookmark(ID):
     """
     API function that toggles the bookmark of an entity
@@ -1536,10 +2783,9 @@ def toggle_bookmark(ID):
 
     ent = INDEX[ID]
     ent.toggle_bookmark()
+    SECONDARY_INDEX.update(ent, 'bookmarked')
 
-    # Convert uuids in the entity to paths and saves the change
-    path_copy = create_path_entity_copy(ent)
-    path_copy.to_TOML(Path(UUID_TO_PATH_INDEX[ID]))
+    _record_change(ent, journal.attributes_set(bookmarked=ent.bookmarked))
 
     return make_response("Bookmark toggled", 201)
 
@@ -0,0 +1,221 @@
+"""
+Append-only journal of the changes made to entities. Each change is a single JSON line, so the cost of persisting an
+edit does not depend on the size of the entity or of its history. A background compactor periodically writes the
+entities that changed to their TOML files and discards the journal lines that are now part of them. At startup, any
+journal left behind is replayed on top of the TOML files.
+
+Applying a record is idempotent: the TOML file of an entity may already contain some of the changes in the journal
+if the entity was written after they happened, replaying those changes leaves the entity unchanged.
+"""
+import os
+import json
+import shutil
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+
+from dragon_core.components import Comment, ContentBlock, Reply, SupportedContentBlockType
+from .persistence import WriteBehindFlusher
+
+JOURNAL_FILENAME = '_dragon_journal.jsonl'
+
+
+def _compacting_path(path: Path) -> Path:
+    return path.with_name(path.name + '.compacting')
+
+
+class Journal(WriteBehindFlusher):
+    """
+    Appends change records to the journal file and marks their entities as dirty. On each flush, the journal is moved
+    aside, the dirty entities are written to disk and the moved journal is deleted. If any entity fails to be written,
+    the moved journal is kept and the next journal is appended to it.
+
+    :param path: The path to the journal file.
+    :param write: Called with the ID of a dirty entity to write it to its TOML file.
+    :param interval: Seconds between compactions.
+    """
+    def __init__(self, path: Union[str, Path], write: Callable[[str], None], interval: float = 30.0):
+        super().__init__(write, interval)
+        self.path = Path(path)
+        self.compacting_path = _compacting_path(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, ID: str, record: dict) -> None:
+        """
+        Writes a record of a change to the entity with the passed ID.
+        """
+        line = json.dumps({"entity": ID, **record}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self._dirty.add(ID)
+
+    def stop(self) -> None:
+        super().stop()
+        self._file.close()
+
+    def _take_dirty(self):
+        dirty = super()._take_dirty()
+        if len(dirty) == 0:
+            return dirty
+
+        # Records written from now on go to a new journal, they are not part of the entities written by this flush.
+        self._file.close()
+        if self.compacting_path.exists():
+            with open(self.compacting_path, 'a', encoding='utf-8') as dst, open(self.path, encoding='utf-8') as src:
+                shutil.copyfileobj(src, dst)
+            self.path.unlink()
+        else:
+            os.replace(self.path, self.compacting_path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return dirty
+
+    def _after_flush(self, succeeded: bool) -> None:
+        if succeeded:
+            self.compacting_path.unlink(missing_ok=True)
+
+
+def read_journal(path: Union[str, Path]) -> Iterator[dict]:
+    """
+    Yields the records of a journal in the order they were written, including the ones of an unfinished compaction.
+    Lines that cannot be parsed, like the last one if the server stopped while writing it, are skipped.
+    """
+    path = Path(path)
+    for file in (_compacting_path(path), path):
+        if not file.is_file():
+            continue
+        with open(file, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping unreadable line in journal {file}: {line}")
+
+
+def delete_journal(path: Union[str, Path]) -> None:
+    path = Path(path)
+    _compacting_path(path).unlink(missing_ok=True)
+    path.unlink(missing_ok=True)
+
+
+def _serialize_content(block: ContentBlock, content):
+    if block.block_type == SupportedContentBlockType.image:
+        return str(content[0]), content[1]
+    return content
+
+
+def _deserialize_content(block: ContentBlock, content):
+    if block.block_type == SupportedContentBlockType.image:
+        return Path(content[0]), content[1]
+    return content
+
+
+def block_added(block: ContentBlock, under_child: Optional[str] = None) -> dict:
+    return {"op": "add_block", "block": block.to_dict(), "under_child": under_child}
+
+
+def block_modified(block: ContentBlock) -> dict:
+    """
+    Records the latest version of a block together with how many versions it has, so replaying it twice does not
+    add the version twice. If the block already has that many versions, the modification replaced the latest one.
+    """
+    content, author, date = block.latest_version()
+    return {"op": "modify_block",
+            "block": block.ID,
+            "content": _serialize_content(block, content),
+            "author": author,
+            "date": date,
+            "version": len(block.content)}
+
+
+def block_deleted(block_id: str) -> dict:
+    return {"op": "delete_block", "block": block_id}
+
+
+def comment_added(comment: Comment) -> dict:
+    return {"op": "add_comment", "comment": comment.to_dict()}
+
+
+def reply_added(comment_id: str, reply: Reply) -> dict:
+    return {"op": "add_reply", "comment": comment_id, "reply": reply.to_dict()}
+
+
+def comment_resolved(comment_id: str) -> dict:
+    return {"op": "resolve_comment", "comment": comment_id}
+
+
+def attributes_set(**attributes) -> dict:
+    return {"op": "set", "attributes": attributes}
+
+
+def apply_record(ent, record: dict) -> None:
+    """
+    Applies a journal record to an entity. Changes that are already present in the entity are skipped.
+
+    :param ent: The complete (not a skeleton) entity the record belongs to.
+    :param record: The record as returned by read_journal.
+    """
+    op = record["op"]
+    if op == "add_block":
+        if _exists(ent.get_content_block, record["block"]["ID"]):
+            return
+        block = ContentBlock.from_dict(record["block"])
+        ent.content_blocks.append(block)
+        ent._block_positions.appended(ent.content_blocks)
+        if not _exists(ent._find_order_index, block.ID):
+            position = len(ent.order)
+            if record["under_child"] is not None and _exists(ent._find_order_index, record["under_child"]):
+                position = ent._find_order_index(record["under_child"]) + 1
+            ent.order.insert(position, (block.ID, "content_block", True))
+
+    elif op == "modify_block":
+        block = ent.get_content_block(record["block"])
+        content = _deserialize_content(block, record["content"])
+        if len(block.content) > record["version"]:
+            return
+        if len(block.content) == record["version"]:
+            # Either the same modification, or a squashed one replacing the latest version.
+            block.content[-1] = content
+            block.authors[-1] = record["author"]
+            block.dates[-1] = record["date"]
+            return
+        block.content.append(content)
+        block.authors.append(record["author"])
+        block.dates.append(record["date"])
+
+    elif op == "delete_block":
+        ent.get_content_block(record["block"]).deleted = True
+        if _exists(ent._find_order_index, record["block"]):
+            ent.order[ent._find_order_index(record["block"])] = (record["block"], "content_block", False)
+
+    elif op == "add_comment":
+        if _exists(ent.get_comment, record["comment"]["ID"]):
+            return
+        ent.comments.append(Comment.from_dict(record["comment"]))
+        ent._comment_positions.appended(ent.comments)
+
+    elif op == "add_reply":
+        comment = ent.get_comment(record["comment"])
+        if any(reply.ID == record["reply"]["ID"] for reply in comment.replies):
+            return
+        comment.replies.append(Reply.from_dict(record["reply"]))
+
+    elif op == "resolve_comment":
+        ent.get_comment(record["comment"]).resolved = True
+
+    elif op == "set":
+        for attribute, value in record["attributes"].items():
+            setattr(ent, attribute, value)
+
+    else:
+        raise ValueError(f"Unknown journal operation {op}")
+
+
+def _exists(find: Callable[[str], object], ID: str) -> bool:
+    """
+    Returns True if find, one of the lookups of the entity that raise ValueError for unknown IDs, finds the ID.
+    """
+    try:
+        find(ID)
+        return True
+    except ValueError:
+        return False
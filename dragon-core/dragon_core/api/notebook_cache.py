@@ -0,0 +1,179 @@
+"""
+On-disk cache of the HTML of rendered analysis notebooks. Rendering a notebook with nbconvert takes from a fraction of a
+second to several seconds depending on its size, so every notebook is rendered once and read from the cache afterwards.
+
+Rendered notebooks are keyed by the path, modification time and size of the notebook, so a notebook that changes is
+rendered again. The total size of the cache is bounded, the least recently used notebooks are deleted first. The
+modification time of the cached files records when they were last used, so the order survives restarts.
+"""
+import os
+import queue
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Iterable, Optional, Union
+
+import nbformat
+from nbconvert import HTMLExporter
+
+
+def render_notebook(path: Union[str, Path]) -> str:
+    """
+    Converts a notebook into HTML.
+    """
+    # Read the notebook
+    nb = nbformat.read(path, as_version=4)
+
+    # Create HTML exporter
+    html_exporter = HTMLExporter()
+    html_exporter.theme = "dark"  # Change the theme of the notebook
+    html_exporter.template_name = 'classic'  # use classic template (you can change this)
+
+    # Export the notebook to HTML format
+    (body, resources) = html_exporter.from_notebook_node(nb)
+    return str(body)
+
+
+class NotebookCache:
+    """
+    Keeps the rendered HTML of notebooks in a directory.
+
+    :param directory: Where the rendered notebooks are stored. Created if it does not exist.
+    :param max_size: Size in bytes the cached files can take before the least recently used ones are deleted.
+    """
+    _SUFFIX = '.html'
+
+    def __init__(self, directory: Union[str, Path], max_size: int = 512 * 1024 ** 2):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+        # Holds as keys the filenames of the cached files and as values their size, least recently used first.
+        self._files = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._worker = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self._SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._size += size
+
+    def _filename(self, path: Path) -> Optional[str]:
+        """
+        Returns the name of the cached file of the current version of the notebook, None if the notebook is missing.
+        """
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        key = f"{path.resolve()}|{stat.st_mtime_ns}|{stat.st_size}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest() + self._SUFFIX
+
+    def version(self, path: Union[str, Path]) -> Optional[str]:
+        """
+        Returns an identifier of the current version of the notebook without rendering it, None if it is missing.
+        """
+        name = self._filename(Path(path))
+        if name is None:
+            return None
+        return name.removesuffix(self._SUFFIX)
+
+    def get(self, path: Union[str, Path]) -> str:
+        """
+        Returns the HTML of the notebook, rendering it if it is not cached.
+
+        :param path: The path to the notebook.
+        """
+        path = Path(path)
+        name = self._filename(path)
+        if name is None:
+            raise FileNotFoundError(f"Notebook {path} not found")
+
+        cached_path = self.directory.joinpath(name)
+        with self._lock:
+            cached = name in self._files
+            if cached:
+                self._files.move_to_end(name)
+        if cached:
+            try:
+                html = cached_path.read_text(encoding='utf-8')
+                os.utime(cached_path)
+                return html
+            except OSError:
+                # Deleted from outside, rendered again below.
+                with self._lock:
+                    self._forget(name)
+
+        html = render_notebook(path)
+        self._store(name, html)
+        return html
+
+    def warm(self, paths: Iterable[Union[str, Path]]) -> None:
+        """
+        Renders the notebooks that are not cached in a background thread.
+        """
+        with self._lock:
+            for path in paths:
+                path = str(path)
+                if path not in self._queued:
+                    self._queued.add(path)
+                    self._queue.put(path)
+
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._warm_worker, daemon=True)
+                self._worker.start()
+
+    def _warm_worker(self) -> None:
+        while True:
+            path = self._queue.get()
+            try:
+                self.get(path)
+            except Exception as e:
+                print(f"Could not render notebook {path} exception: \n{e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(path)
+
+    def _store(self, name: str, html: str) -> None:
+        cached_path = self.directory.joinpath(name)
+        tmp_path = cached_path.with_name(f"{name}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_text(html, encoding='utf-8')
+            os.replace(tmp_path, cached_path)
+        except OSError as e:
+            print(f"Could not cache rendered notebook in {cached_path} exception: \n{e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        size = cached_path.stat().st_size
+        with self._lock:
+            self._forget(name)
+            self._files[name] = size
+            self._size += size
+            self._evict()
+
+    def _forget(self, name: str) -> None:
+        """
+        Removes a file from the index. Must be called holding the lock.
+        """
+        size = self._files.pop(name, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self) -> None:
+        """
+        Deletes the least recently used files until the cache fits in max_size. Must be called holding the lock.
+        """
+        while self._size > self.max_size and len(self._files) > 1:
+            name = next(iter(self._files))
+            self._forget(name)
+            self.directory.joinpath(name).unlink(missing_ok=True)
@@ -0,0 +1,99 @@
+"""
+Write-behind persistence for entities. Instead of rewriting the TOML file of an entity on every change, the entity is
+marked as dirty and a background thread writes every dirty entity once per flush interval. Entities modified many times
+within the same interval, like when the editor autosaves, are written only once.
+"""
+import atexit
+import threading
+from typing import Callable, Set
+
+
+class WriteBehindFlusher:
+    """
+    Keeps track of the dirty entities and writes them from a background thread.
+
+    :param write: Called with the ID of a dirty entity to write it to disk.
+    :param interval: Seconds between flushes.
+    """
+    def __init__(self, write: Callable[[str], None], interval: float = 1.0):
+        self.write = write
+        self.interval = interval
+
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        # Only one flush at a time, the one at shutdown can happen while the thread is flushing.
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Stops the background thread and writes everything that is still dirty.
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        atexit.unregister(self.stop)
+        self.flush()
+
+    def mark_dirty(self, ID: str) -> None:
+        with self._lock:
+            self._dirty.add(ID)
+
+    def is_dirty(self, ID: str) -> bool:
+        return ID in self._dirty
+
+    def discard(self, ID: str) -> None:
+        """
+        Forgets about a dirty entity, used when it was written by other means.
+        """
+        with self._lock:
+            self._dirty.discard(ID)
+
+    def flush(self) -> None:
+        """
+        Writes every dirty entity. Entities that fail to be written stay dirty and are retried on the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                dirty = self._take_dirty()
+
+            failed = set()
+            for ID in dirty:
+                try:
+                    self.write(ID)
+                except Exception as e:
+                    print(f"Could not write entity {ID}, retrying on the next flush. exception: \n{e}")
+                    failed.add(ID)
+
+            if len(failed) > 0:
+                with self._lock:
+                    self._dirty.update(failed)
+
+            self._after_flush(len(failed) == 0)
+
+    def _take_dirty(self) -> Set[str]:
+        """
+        Returns the dirty entities and starts a new empty set. Called holding the lock.
+        """
+        dirty = self._dirty
+        self._dirty = set()
+        return dirty
+
+    def _after_flush(self, succeeded: bool) -> None:
+        """
+        Called after every flush.
+
+        :param succeeded: False if any entity could not be written.
+        """
+        pass
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
@@ -0,0 +1,126 @@
+"""
+Secondary indices over the entities of INDEX. Every registered index maps the values of one attribute (the type, the
+users, whether it is bookmarked...) to the IDs of the entities that have them, so finding the entities with a value
+costs as much as the number of entities found instead of going through the whole lair.
+
+Indices are registered with a function returning the values an entity is indexed under. The functions that add
+entities or change any of those values call add or update, everything else is left as it is.
+
+Results keep the order in which the entities were added, the same order they have in INDEX.
+"""
+import threading
+from typing import Callable, Hashable, Iterable, List
+
+
+class SecondaryIndex:
+    """
+    Registry of the secondary indices of the entities.
+    """
+    def __init__(self):
+        # Holds as keys the names of the indices and as values the function returning the values of an entity.
+        self._keys = {}
+        # Holds as keys the names of the indices and as values dictionaries of value to the set of IDs that have it.
+        self._entries = {}
+        # Holds as keys the names of the indices and as values dictionaries of ID to the values it is indexed under,
+        # used to remove the entity from its old values when they change.
+        self._values = {}
+        # Holds as keys the IDs of the entities and as values when they were first added.
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, keys: Callable[[object], Iterable[Hashable]]) -> None:
+        """
+        Adds a new index. Entities already added are not indexed by it until they are added or updated again.
+
+        :param name: The name of the index, used to query it.
+        :param keys: Returns the values an entity is indexed under, an entity can have any number of them. None values
+            are not indexed.
+        """
+        with self._lock:
+            self._keys[name] = keys
+            self._entries[name] = {}
+            self._values[name] = {}
+
+    def add(self, ent) -> None:
+        """
+        Indexes the entity by all the registered indices. Adding an entity that is already indexed updates it.
+        """
+        with self._lock:
+            self._positions.setdefault(ent.ID, len(self._positions))
+            for name in self._keys:
+                self._index(name, ent)
+
+    def update(self, ent, *names: str) -> None:
+        """
+        Indexes the entity again after its values change. Only the passed indices are updated, all of them if none
+        are passed.
+        """
+        with self._lock:
+            if ent.ID not in self._positions:
+                return
+            for name in names if len(names) > 0 else self._keys:
+                self._index(name, ent)
+
+    def values_of(self, name: str, ID: str) -> tuple:
+        """
+        Returns the values the entity is indexed under in the index, an empty tuple if it is not indexed.
+        """
+        with self._lock:
+            return self._values[name].get(ID, ())
+
+    def query(self, **values) -> List[str]:
+        """
+        Returns the IDs of the entities that have every one of the passed values, as keyword arguments of the name of
+        the index and the value. A list of values matches the entities that have any of them.
+
+        :raises KeyError: If one of the names is not a registered index.
+        """
+        with self._lock:
+            matches = []
+            for name, value in values.items():
+                entries = self._entries[name]
+                if isinstance(value, (list, tuple, set)):
+                    ids = set()
+                    for v in value:
+                        ids.update(entries.get(v, ()))
+                else:
+                    ids = entries.get(value, set())
+                matches.append(ids)
+
+            if len(matches) == 0:
+                return []
+            matches.sort(key=len)
+            ret = set(matches[0])
+            for ids in matches[1:]:
+                ret.intersection_update(ids)
+            return sorted(ret, key=self._positions.__getitem__)
+
+    def rebuild(self, entities: Iterable) -> None:
+        """
+        Drops every indexed entity and indexes the passed ones, in order.
+        """
+        with self._lock:
+            self._positions.clear()
+            for name in self._keys:
+                self._entries[name].clear()
+                self._values[name].clear()
+            for ent in entities:
+                self._positions.setdefault(ent.ID, len(self._positions))
+                for name in self._keys:
+                    self._index(name, ent)
+
+    def _index(self, name: str, ent) -> None:
+        """
+        Moves the entity from its old values to its current ones in the index. Must be called holding the lock.
+        """
+        values = tuple(v for v in self._keys[name](ent) if v is not None)
+        entries = self._entries[name]
+        for old in self._values[name].get(ent.ID, ()):
+            if old not in values:
+                ids = entries[old]
+                ids.discard(ent.ID)
+                if len(ids) == 0:
+                    del entries[old]
+        for v in values:
+            entries.setdefault(v, set()).add(ent.ID)
+        self._values[name][ent.ID] = values
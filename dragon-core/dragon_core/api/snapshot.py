@@ -0,0 +1,75 @@
+"""
+Helpers to persist the in-memory indices of the API to a single binary file, so that a restart of the server only needs
+to re-parse the TOML files that changed since the snapshot was taken instead of the whole lair.
+"""
+import os
+import pickle
+from pathlib import Path
+from typing import Optional, Union, Tuple, List
+
+# Bump whenever the content of the snapshot changes, old snapshots are discarded.
+SNAPSHOT_VERSION = 6
+
+
+def file_signature(path: Union[str, Path]) -> Optional[Tuple[int, int]]:
+    """
+    Returns the modification time (in nanoseconds) and size of a file, or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def write_snapshot(snapshot_path: Union[str, Path], state: dict, files: List[str]) -> None:
+    """
+    Writes the state to disk together with the signature of every file it was built from.
+    The snapshot is written to a temporary file first and then moved in place so a crash never leaves a partial file.
+
+    :param snapshot_path: Where the snapshot is stored.
+    :param state: Dictionary with the objects to persist. Everything in it must be picklable.
+    :param files: The paths of all the TOML files the state was built from.
+    """
+    snapshot_path = Path(snapshot_path)
+    signatures = {path: file_signature(path) for path in files}
+    data = {"version": SNAPSHOT_VERSION, "files": signatures, "state": state}
+
+    tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_snapshot(snapshot_path: Union[str, Path]) -> Optional[Tuple[dict, List[str]]]:
+    """
+    Reads a snapshot and checks which of the files it was built from changed since it was written.
+
+    :param snapshot_path: Where the snapshot is stored.
+    :return: None if the snapshot does not exist, is corrupt, was written by a different version or if any of the
+        files it was built from does not exist anymore. Otherwise, a tuple with the persisted state and the list of
+        files whose modification time or size changed.
+    """
+    snapshot_path = Path(snapshot_path)
+    if not snapshot_path.is_file():
+        return None
+
+    try:
+        with open(snapshot_path, 'rb') as f:
+            data = pickle.load(f)
+    except Exception as e:
+        print(f"Could not read the snapshot at {snapshot_path}, ignoring it. exception: \n{e}")
+        return None
+
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    changed = []
+    for path, signature in data["files"].items():
+        current = file_signature(path)
+        if current is None:
+            return None
+        if current != signature:
+            changed.append(path)
+
+    return data["state"], changed
@@ -0,0 +1,85 @@
+"""
+Cache of the structure of the libraries returned by generate_structure. The JSON of every entity's subtree is kept
+already serialized, so a request only encodes the subtrees that changed since the last one and joins the rest as they
+are. Anything that changes the name, the children or the deleted flag of an entity invalidates it together with its
+ancestors, every other subtree stays cached.
+
+The output is the same string json.dumps produces for the nested dictionaries of the structure.
+"""
+import json
+import threading
+from typing import Callable, Iterable, Optional
+
+
+class StructureCache:
+    """
+    Keeps the serialized structure of every entity built so far.
+
+    :param get_entity: Returns the entity with the passed ID, raising KeyError if it is not indexed.
+    :param roots: Returns the IDs of the libraries, in the order they appear in the structure.
+    """
+    def __init__(self, get_entity: Callable[[str], object], roots: Callable[[], Iterable[str]]):
+        self._get_entity = get_entity
+        self._roots = roots
+
+        # Holds as keys the IDs of entities and as values the JSON of their subtree.
+        self._subtrees = {}
+        # JSON of the list of every library, None if something changed since it was built.
+        self._tree: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def tree(self) -> str:
+        """
+        Returns the JSON of the structure of all the libraries.
+        """
+        with self._lock:
+            if self._tree is None:
+                self._tree = '[' + ', '.join(self._subtree(ID) for ID in self._roots()) + ']'
+            return self._tree
+
+    def subtree(self, ID: str) -> str:
+        """
+        Returns the JSON of the structure of the entity with the passed ID.
+        """
+        with self._lock:
+            return self._subtree(ID)
+
+    def invalidate(self, ID: str) -> None:
+        """
+        Drops the cached subtree of the entity and of all of its ancestors. Needs to be called after the name, the
+        children or the deleted flag of the entity change.
+        """
+        with self._lock:
+            self._tree = None
+            seen = set()
+            while ID and ID not in seen:
+                seen.add(ID)
+                self._subtrees.pop(ID, None)
+                try:
+                    ID = self._get_entity(ID).parent
+                except KeyError:
+                    break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._subtrees.clear()
+            self._tree = None
+
+    def _subtree(self, ID: str) -> str:
+        """
+        Returns the cached JSON of the subtree, building it from the cached subtrees of its children. Must be called
+        holding the lock.
+        """
+        serialized = self._subtrees.get(ID)
+        if serialized is not None:
+            return serialized
+
+        ent = self._get_entity(ID)
+        children = []
+        for child in ent.children:
+            if self._get_entity(child).deleted is False:
+                children.append(self._subtree(child))
+        serialized = (f'{{"name": {json.dumps(ent.name)}, "id": {json.dumps(ent.ID)}, '
+                      f'"children": [{", ".join(children)}], "type": {json.dumps(ent.__class__.__name__)}}}')
+        self._subtrees[ID] = serialized
+        return serialized
@@ -0,0 +1,177 @@
+"""
+Watches the folders of data buckets for new measurements and analysis files so they can be added to the index without
+the measurement scripts calling the API.
+
+Uses watchdog (inotify on linux) if it is installed, otherwise it falls back to periodically listing the folders.
+Events are debounced: a path is only reported once it has not changed for the debounce period, so files that are still
+being written are reported once they are done.
+"""
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Union
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Name of the data file that marks a folder as a measurement.
+DATA_FILENAME = 'data.ddh5'
+# Suffixes of the files that are added to the instance of the measurement folder they are in.
+ANALYSIS_SUFFIXES = ('.png', '.jpg', '.html', '.ipynb', '.json', '.tag')
+
+
+def is_watched_file(path: Union[str, Path]) -> bool:
+    """
+    Returns True if the path is a data file or an analysis file.
+    """
+    path = Path(path)
+    return path.name == DATA_FILENAME or path.suffix in ANALYSIS_SUFFIXES
+
+
+class _EventHandler(FileSystemEventHandler):
+    """
+    Forwards the watchdog events of the watched folders to the watcher.
+    """
+    def __init__(self, watcher: 'BucketWatcher'):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        self.watcher.notify(event.dest_path)
+
+
+class BucketWatcher:
+    """
+    Watches a set of folders recursively and calls the callback with the paths of the data and analysis files that
+    were created or modified in them. Directories created or moved inside the watched folders are reported as well,
+    since files moved together with their folder do not produce events of their own.
+
+    :param roots: The folders to watch.
+    :param callback: Called from the watcher thread with a list of the paths that settled.
+    :param debounce: Seconds a path needs to go without changes before being reported. When polling, it is also the
+        time between listings of the folders.
+    :param use_polling: Forces the polling fallback even if watchdog is installed.
+    """
+    def __init__(self,
+                 roots: Iterable[Union[str, Path]],
+                 callback: Callable[[List[Path]], None],
+                 debounce: float = 2.0,
+                 use_polling: bool = False):
+
+        self.roots = set()
+        self.callback = callback
+        self.debounce = debounce
+        self.polling = use_polling or Observer is None
+
+        # Holds as keys the paths that changed and as values the last time they did.
+        self._pending = {}
+        # Holds as keys the files seen by the last listing and as values their modification time and size.
+        self._signatures = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+
+        for root in roots:
+            self.add_root(root)
+
+    def add_root(self, root: Union[str, Path]) -> None:
+        """
+        Starts watching another folder. Files already in it are not reported.
+        """
+        root = Path(root)
+        if root in self.roots or not root.is_dir():
+            return
+
+        self.roots.add(root)
+        if self.polling:
+            self._signatures.update(self._list_files(root))
+        elif self._observer is not None:
+            self._observer.schedule(_EventHandler(self), str(root), recursive=True)
+
+    def start(self) -> None:
+        if not self.polling:
+            self._observer = Observer()
+            for root in self.roots:
+                self._observer.schedule(_EventHandler(self), str(root), recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def notify(self, path: Union[str, Path]) -> None:
+        """
+        Records that a path changed, restarting its debounce period.
+        """
+        path = Path(path)
+        if path.is_dir() or is_watched_file(path):
+            with self._lock:
+                self._pending[path] = time.monotonic()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.debounce / 2 if not self.polling else self.debounce):
+            if self.polling:
+                self._poll()
+            self._flush()
+
+    def _flush(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            settled = [path for path, changed in self._pending.items() if now - changed >= self.debounce]
+            for path in settled:
+                del self._pending[path]
+
+        if len(settled) > 0:
+            try:
+                self.callback(settled)
+            except Exception as e:
+                print(f"Error ingesting watched files {settled} exception: \n{e}")
+
+    def _poll(self) -> None:
+        current = {}
+        for root in self.roots:
+            current.update(self._list_files(root))
+
+        for path, signature in current.items():
+            if self._signatures.get(path) != signature:
+                self.notify(path)
+        self._signatures = current
+
+    @staticmethod
+    def _list_files(root: Path) -> dict:
+        """
+        Returns the modification time and size of every data and analysis file under root.
+        """
+        ret = {}
+        for dir_path, _, filenames in os.walk(root):
+            for filename in filenames:
+                if is_watched_file(filename):
+                    path = Path(dir_path).joinpath(filename)
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    ret[path] = (stat.st_mtime_ns, stat.st_size)
+        return ret
@@ -2,3 +2,4 @@ from .param import Parameter
 from .content_blocks import ContentBlock, SupportedContentBlockType, create_text_block, create_image_block, create_image_link_block
 from .comments import Comment, Reply, create_comment
 from .table import Table
+from .order import Order
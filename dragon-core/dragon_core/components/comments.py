@@ -54,6 +54,7 @@ class Comment:
                       timestamp=[time]
                       )
         self.replies.append(reply)
+        return reply
 
     def to_dict(self):
         return {"ID": self.ID,
@@ -1,15 +1,27 @@
 import json
 import uuid
+import zlib
+import base64
 from enum import Enum
 from pathlib import Path
+from datetime import datetime
 from dataclasses import dataclass
-from typing import Union, Tuple, List, Any
+from typing import Union, Tuple, List, Any, Optional
 
 
 from ..utils import create_timestamp
 from .table import Table
 
 
+# Seconds within which consecutive modifications by the same author replace the latest version of a content block
+# instead of adding a new one. 0 keeps every modification.
+SQUASH_WINDOW = 0.0
+
+# Length of a compressed chunk of text history under which the deltas of the next serialization are merged into it
+# instead of starting a new chunk, so the number of chunks grows with the size of the history and not with how many
+# times it was saved.
+HISTORY_CHUNK_SIZE = 4096
+
 
 class SupportedContentBlockType(Enum):
     """
@@ -23,6 +35,229 @@ class SupportedContentBlockType(Enum):
 
 
 
+def _common_prefix_length(a: str, b: str) -> int:
+    """
+    Length of the common prefix of two strings, found with a binary search over slice comparisons so the characters
+    are compared in C instead of one at a time.
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """
+    Length of the common suffix of two strings, at most limit.
+    """
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _diff(newer: str, older: str) -> list:
+    """
+    Returns the delta that turns newer back into older: [prefix, suffix, middle] such that
+    older == newer[:prefix] + middle + newer[len(newer) - suffix:]. Edits of a single region, like typing, produce a
+    delta the size of the edit.
+    """
+    prefix = _common_prefix_length(newer, older)
+    suffix = _common_suffix_length(newer, older, min(len(newer), len(older)) - prefix)
+    return [prefix, suffix, older[prefix:len(older) - suffix]]
+
+
+def _within_window(earlier: str, later: str, window: float) -> bool:
+    """
+    Returns True if the timestamp later happened at most window seconds after earlier.
+    Timestamps that cannot be parsed are never within the window.
+    """
+    try:
+        elapsed = (datetime.fromisoformat(later) - datetime.fromisoformat(earlier)).total_seconds()
+    except (TypeError, ValueError):
+        return False
+    return 0 <= elapsed <= window
+
+
+def _undiff(newer: str, delta: list) -> str:
+    prefix, suffix, middle = delta
+    return newer[:prefix] + middle + newer[len(newer) - suffix:]
+
+
+def _pack(deltas: list) -> str:
+    return base64.b64encode(zlib.compress(json.dumps(deltas).encode('utf-8'))).decode('ascii')
+
+
+def _unpack(chunk: str) -> list:
+    return json.loads(zlib.decompress(base64.b64decode(chunk)).decode('utf-8'))
+
+
+class ContentHistory:
+    """
+    Sequence holding every version of the content of a text block. The latest version (the tip) is kept in full and
+    every earlier version is kept as a delta from the version after it. Deltas that were loaded or already serialized
+    are kept compressed in chunks of about HISTORY_CHUNK_SIZE and are only decompressed when an earlier version is
+    requested.
+
+    Behaves like the list of versions it replaces: indexing, iterating, len and append work as they did on the list.
+    Accessing or replacing the latest version is O(1), any other version requires decompressing the chunks holding the
+    deltas after it.
+
+    :param versions: Every version of the content, oldest first.
+    """
+    def __init__(self, versions: Optional[List[str]] = None):
+        versions = list(versions) if versions is not None else []
+        self._length = len(versions)
+        self._tip = versions[-1] if len(versions) > 0 else None
+        # Compressed chunks of deltas of the oldest versions, oldest first, as in the serialized history.
+        self._chunks: List[str] = []
+        # Deltas that are not in _chunks yet, oldest first.
+        self._recent = [_diff(newer, older) for older, newer in zip(versions, versions[1:])]
+
+    @classmethod
+    def from_serialized(cls, tip: str, history: Union[str, List[str], None], length: int) -> 'ContentHistory':
+        """
+        Creates the history from the latest version and the chunks returned by serialize_history.
+
+        :param tip: The latest version.
+        :param history: The compressed chunks of deltas of the earlier versions. A single string is a history with one
+            chunk, as written before the history was chunked.
+        :param length: How many versions there are, including the latest one.
+        """
+        ret = cls([tip])
+        ret._length = length
+        if isinstance(history, str):
+            history = [history]
+        ret._chunks = [chunk for chunk in history if chunk] if history else []
+        return ret
+
+    def serialize_history(self) -> List[str]:
+        """
+        Returns the deltas of every version except the latest one as compressed chunks, oldest first. Only the deltas
+        added since the last call are compressed, together with the ones of the last chunk if it is shorter than
+        HISTORY_CHUNK_SIZE. The other chunks serialized before are returned as they were.
+        """
+        if len(self._recent) > 0:
+            if len(self._chunks) > 0 and len(self._chunks[-1]) < HISTORY_CHUNK_SIZE:
+                self._recent = _unpack(self._chunks.pop()) + self._recent
+            self._chunks.append(_pack(self._recent))
+            self._recent = []
+        return list(self._chunks)
+
+    def _newest_deltas(self):
+        """
+        Yields the deltas from the newest to the oldest one, decompressing the chunks only when they are reached.
+        """
+        yield from reversed(self._recent)
+        for chunk in reversed(self._chunks):
+            yield from reversed(_unpack(chunk))
+
+    def _take_newest(self, count: int) -> list:
+        """
+        Removes the newest count deltas and returns them, oldest first. Only the chunks holding them are decompressed,
+        the older deltas of the last of those chunks stay uncompressed until the next serialization.
+        """
+        while len(self._recent) < count and len(self._chunks) > 0:
+            self._recent = _unpack(self._chunks.pop()) + self._recent
+        split = len(self._recent) - count
+        ret = self._recent[split:]
+        self._recent = self._recent[:split]
+        return ret
+
+    def append(self, content: str) -> None:
+        if self._length > 0:
+            self._recent.append(_diff(content, self._tip))
+        self._tip = content
+        self._length += 1
+
+    def keep(self, indices: List[int]) -> None:
+        """
+        Removes every version that is not in indices. The versions before the first removed one keep their deltas, so
+        removing recent versions does not decompress the older history.
+
+        :param indices: The sorted indices of the versions to keep.
+        """
+        first_removed = next((i for i, j in enumerate(indices) if i != j), len(indices))
+        if first_removed >= self._length:
+            return
+
+        # The version before the first removed one is the first whose delta changes.
+        start = max(first_removed - 1, 0)
+        versions = [self._tip]
+        for delta in reversed(self._take_newest(self._length - 1 - start)):
+            versions.append(_undiff(versions[-1], delta))
+        versions.reverse()
+
+        if first_removed > 0:
+            self._tip, self._length = versions[0], start + 1
+        else:
+            self._tip, self._length = None, 0
+        for i in indices:
+            if i > start:
+                self.append(versions[i - start])
+
+    def __setitem__(self, index, content: str) -> None:
+        """
+        Only the latest version can be replaced, earlier versions are immutable. The version before it is found by
+        undoing the last delta, the rest of the history is not touched.
+        """
+        if index < 0:
+            index += self._length
+        if index != self._length - 1:
+            raise IndexError("only the latest version of a content history can be replaced")
+
+        if self._length > 1:
+            last = self._take_newest(1)[0]
+            self._recent.append(_diff(content, _undiff(self._tip, last)))
+        self._tip = content
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("content history index out of range")
+        if index == self._length - 1:
+            return self._tip
+
+        version = self._tip
+        steps = self._length - 1 - index
+        for delta in self._newest_deltas():
+            version = _undiff(version, delta)
+            steps -= 1
+            if steps == 0:
+                break
+        return version
+
+    def __iter__(self):
+        if self._length == 0:
+            return iter([])
+        versions = [self._tip]
+        for delta in self._newest_deltas():
+            versions.append(_undiff(versions[-1], delta))
+        return reversed(versions)
+
+    def __eq__(self, other):
+        if isinstance(other, (ContentHistory, list)):
+            return len(self) == len(other) and list(self) == list(other)
+        return False
+
+    def __repr__(self):
+        return f"ContentHistory({list(self)!r})"
+
+
 @dataclass
 class ContentBlock:
     """
@@ -33,7 +268,7 @@ class ContentBlock:
     - creation_user: The user that originally created the content block.
     - creation_time: Timestamp of the creation of the content block.
     - deleted: A boolean indicating if the content block has been deleted.
-    - content: A list holding every modified content.
+    - content: A list holding every modified content. For text content this is a ContentHistory.
     - dates: A list of timestamps of the content block.
     - authors: A list of users that have modified the content block.
     - block_type: The type of the content block. This is an instance of SupportedContentBlockType.
@@ -47,11 +282,17 @@ class ContentBlock:
     authors: List[str]
     block_type: SupportedContentBlockType
 
+    def __post_init__(self):
+        # Only text content is stored as deltas, images and links are small and rarely modified.
+        if not isinstance(self.content, ContentHistory) and all(isinstance(c, str) for c in self.content):
+            self.content = ContentHistory(self.content)
+
     def modify(self, content: Union[str, tuple[Path, str]], user: str) -> None:
         """
         Modify the content_block.
         This will check if the content or user are different
         and append the new comment to the list of comments and update the timestamp.
+        If the same user modified the block less than SQUASH_WINDOW seconds ago, the latest version is replaced instead.
         Passing the user is required.
 
         :param content: The actual content.
@@ -59,11 +300,43 @@ class ContentBlock:
         """
 
         if content != self.content[-1] or user != self.authors[-1]:
-            self.content.append(content)
             time = create_timestamp()
+            if SQUASH_WINDOW > 0 and user == self.authors[-1] and _within_window(self.dates[-1], time, SQUASH_WINDOW):
+                self.content[-1] = content
+                self.dates[-1] = time
+                return
+
+            self.content.append(content)
             self.dates.append(time)
             self.authors.append(user)
 
+    def squash(self, window: float = None) -> bool:
+        """
+        Applies the squashing rule of modify to the existing history: every version followed by a version of the same
+        author less than window seconds later is removed.
+
+        :param window: Seconds within which consecutive versions are squashed. Defaults to SQUASH_WINDOW.
+        :return: True if any version was removed.
+        """
+        if window is None:
+            window = SQUASH_WINDOW
+        if window <= 0 or len(self.content) < 2:
+            return False
+
+        keep = [i for i in range(len(self.dates))
+                if i == len(self.dates) - 1 or self.authors[i] != self.authors[i + 1] or
+                not _within_window(self.dates[i], self.dates[i + 1], window)]
+        if len(keep) == len(self.dates):
+            return False
+
+        if isinstance(self.content, ContentHistory):
+            self.content.keep(keep)
+        else:
+            self.content = [self.content[i] for i in keep]
+        self.dates = [self.dates[i] for i in keep]
+        self.authors = [self.authors[i] for i in keep]
+        return True
+
     def latest_version(self) -> Tuple[Any, str, str]:
         """
         Function returning the last version of the content block. The return object is a tuple containing in order:
@@ -75,34 +348,53 @@ class ContentBlock:
         """
         return self.content[-1], self.authors[-1], self.dates[-1]
 
-    def to_dict(self) -> dict:
+    def to_dict(self, full_history: bool = False) -> dict:
         """
         Convert the ContentBlock to a dictionary suitable for JSON serialization.
+        Text content is serialized as a list with only the latest version and a 'history' field with the compressed
+        chunks of deltas of the earlier versions.
+
+        :param full_history: If True, every version of text content is included in the content list instead.
         """
 
         serialized_content = self.content
+        history = None
         if self.block_type == SupportedContentBlockType.image:
             serialized_content = [(str(content[0]), content[1]) for content in self.content]
-
-        return {
+        elif isinstance(self.content, ContentHistory):
+            if full_history:
+                serialized_content = list(self.content)
+            else:
+                serialized_content = [self.content[-1]] if len(self.content) > 0 else []
+                history = self.content.serialize_history()
+
+        ret = {
             'ID': self.ID,
             'creation_user': self.creation_user,
             'creation_time': self.creation_time,
             'deleted': self.deleted,
             'content': serialized_content,
-            'dates': self.dates,
-            'authors': self.authors,
+            # Copied so the dictionary keeps matching the serialized history after the block is modified.
+            'dates': list(self.dates),
+            'authors': list(self.authors),
             'block_type': self.block_type.value
         }
+        if history is not None:
+            ret['history'] = history
+        return ret
 
     @classmethod
     def from_dict(cls, data: dict) -> 'ContentBlock':
         """
-        Create a ContentBlock instance from a dictionary.
+        Create a ContentBlock instance from a dictionary. Accepts both the content with every version and the content
+        with only the latest version plus the 'history' field.
         """
         data['block_type'] = SupportedContentBlockType(data['block_type'])
         if data['block_type'] == SupportedContentBlockType.image:
             data['content'] = [(Path(content[0]), content[1]) for content in data['content']]
+        if 'history' in data:
+            data['content'] = ContentHistory.from_serialized(data['content'][-1], data.pop('history'),
+                                                             len(data['dates']))
         return cls(**data)
 
     def __str__(self):
@@ -0,0 +1,218 @@
+"""
+Order of the children and content blocks of an entity. Items are inserted under other items by ID, so the order is kept
+in an implicit treap: a randomly balanced binary tree where the position of an item is the number of items to its left.
+Inserting at any position and finding the position of an item by its ID take logarithmic time instead of shifting or
+scanning the whole list.
+
+The order behaves like the list it replaces: it can be indexed, iterated, compared with lists and it is serialized as
+one.
+"""
+import random
+from typing import Iterable, Iterator, Optional
+
+
+class _Node:
+    __slots__ = ('item', 'priority', 'size', 'left', 'right', 'parent')
+
+    def __init__(self, item):
+        self.item = item
+        self.priority = random.random()
+        self.size = 1
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+        self.parent: Optional[_Node] = None
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _update(node: _Node) -> None:
+    """
+    Recomputes the size of the node and points its children back to it.
+    """
+    node.size = 1 + _size(node.left) + _size(node.right)
+    if node.left is not None:
+        node.left.parent = node
+    if node.right is not None:
+        node.right.parent = node
+
+
+def _split(node: Optional[_Node], k: int):
+    """
+    Splits the tree into one holding its first k items and one holding the rest.
+    """
+    if node is None:
+        return None, None
+    node.parent = None
+    if _size(node.left) >= k:
+        left, right = _split(node.left, k)
+        node.left = right
+        _update(node)
+        return left, node
+    left, right = _split(node.right, k - _size(node.left) - 1)
+    node.right = left
+    _update(node)
+    return node, right
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """
+    Joins two trees, every item of left goes before every item of right.
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+class Order:
+    """
+    List of order items (tuples of ID, item type and whether it is shown) with logarithmic inserts and lookups of
+    positions by ID.
+
+    :param items: The initial items.
+    """
+    def __init__(self, items: Iterable = ()):
+        self._root: Optional[_Node] = None
+        # Holds as keys the IDs of the items and as values the nodes holding them, more than one if the ID is repeated.
+        self._nodes = {}
+        self._build(items)
+
+    def _build(self, items: Iterable) -> None:
+        """
+        Builds the tree from the items in linear time, keeping the node with the highest priority above the rest.
+        """
+        stack = []
+        nodes = []
+        for item in items:
+            node = _Node(item)
+            nodes.append(node)
+            last = None
+            while len(stack) > 0 and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if len(stack) > 0:
+                stack[-1].right = node
+            stack.append(node)
+
+        if len(stack) == 0:
+            return
+        self._root = stack[0]
+
+        # Sizes and parents, children before their parents.
+        pending = [self._root]
+        visited = []
+        while len(pending) > 0:
+            node = pending.pop()
+            visited.append(node)
+            if node.left is not None:
+                pending.append(node.left)
+            if node.right is not None:
+                pending.append(node.right)
+        for node in reversed(visited):
+            _update(node)
+
+        for node in nodes:
+            self._nodes.setdefault(node.item[0], []).append(node)
+
+    def _node_at(self, index: int) -> _Node:
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Order index out of range")
+        node = self._root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    @staticmethod
+    def _position(node: _Node) -> int:
+        position = _size(node.left)
+        while node.parent is not None:
+            if node is node.parent.right:
+                position += _size(node.parent.left) + 1
+            node = node.parent
+        return position
+
+    def index_of(self, ID: str) -> Optional[int]:
+        """
+        Returns the position of the first item with the passed ID, None if there is none.
+        """
+        nodes = self._nodes.get(ID)
+        if nodes is None:
+            return None
+        return min(self._position(node) for node in nodes)
+
+    def insert(self, index: int, item) -> None:
+        """
+        Inserts the item before the position index, with the same semantics as list.insert.
+        """
+        if index < 0:
+            index = max(0, index + len(self))
+        index = min(index, len(self))
+
+        node = _Node(item)
+        left, right = _split(self._root, index)
+        self._root = _merge(_merge(left, node), right)
+        self._root.parent = None
+        self._nodes.setdefault(item[0], []).append(node)
+
+    def append(self, item) -> None:
+        self.insert(len(self), item)
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def __iter__(self) -> Iterator:
+        stack = []
+        node = self._root
+        while len(stack) > 0 or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.item
+            node = node.right
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self._node_at(index).item
+
+    def __setitem__(self, index: int, item) -> None:
+        node = self._node_at(index)
+        old_ID = node.item[0]
+        node.item = item
+        if old_ID != item[0]:
+            nodes = self._nodes[old_ID]
+            nodes.remove(node)
+            if len(nodes) == 0:
+                del self._nodes[old_ID]
+            self._nodes.setdefault(item[0], []).append(node)
+
+    def __eq__(self, other):
+        if isinstance(other, (Order, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def __repr__(self):
+        return f"Order({list(self)!r})"
@@ -42,4 +42,45 @@ def verify_and_parse_config(config_path: Path) -> dict:
         raise ValueError("host not found in config file")
     ret['host'] = c['host']
 
+    # Optional settings controlling how the lair is loaded.
+    # Number of workers used to parse TOML files when loading the lair, 0 loads them one at a time.
+    ret['loading_workers'] = c.get('loading_workers', 0)
+    if c.get('loading_executor', 'thread') not in ('thread', 'process'):
+        raise ValueError("loading_executor must be either 'thread' or 'process'")
+    ret['loading_executor'] = c.get('loading_executor', 'thread')
+    # Path to the file where a snapshot of the indices is kept to speed up restarts. Empty disables snapshots.
+    ret['snapshot_path'] = c.get('snapshot_path', '')
+    # Seconds to wait after a change to the lair (users, libraries, buckets) before writing its file.
+    ret['lair_write_debounce'] = c.get('lair_write_debounce', 1.0)
+    # Directory where the rendered analysis notebooks are cached. Empty uses _notebook_cache in the resource path.
+    ret['notebook_cache_path'] = c.get('notebook_cache_path', '')
+    # Size in megabytes of the notebook cache, the least recently used notebooks are deleted once it is full.
+    ret['notebook_cache_mb'] = c.get('notebook_cache_mb', 512)
+    # Size in megabytes of the responses of read_one kept in memory to answer repeated requests without serializing.
+    ret['read_cache_mb'] = c.get('read_cache_mb', 64)
+    # Seconds within which consecutive modifications of a content block by the same author replace its latest version.
+    # 0 keeps every modification.
+    ret['squash_window'] = c.get('squash_window', 0.0)
+    # If True, the existing histories are squashed with squash_window in a background thread after loading.
+    ret['squash_histories'] = c.get('squash_histories', False)
+    # If True, changes to content blocks, comments and bookmarks are appended to a journal that a background thread
+    # compacts into the TOML files every journal_compaction_interval seconds.
+    ret['journal'] = c.get('journal', False)
+    ret['journal_compaction_interval'] = c.get('journal_compaction_interval', 30.0)
+    # If True, modified entities are written by a background thread every write_behind_interval seconds.
+    ret['write_behind'] = c.get('write_behind', False)
+    ret['write_behind_interval'] = c.get('write_behind_interval', 1.0)
+    # If True, the folders of the buckets are watched and new measurements and analysis files are added automatically.
+    ret['watch_buckets'] = c.get('watch_buckets', False)
+    # Seconds a watched file needs to go without changes before being added.
+    ret['watch_debounce'] = c.get('watch_debounce', 2.0)
+    # Seconds during which an ID that could not be found on disk is not looked up again.
+    ret['missing_id_ttl'] = c.get('missing_id_ttl', 30.0)
+    # If True, images are decoded in a background thread after loading to report the broken ones.
+    ret['verify_images'] = c.get('verify_images', False)
+    # If True, only the skeleton of the entities is loaded at start and the rest is read when an entity is used.
+    ret['lazy_loading'] = c.get('lazy_loading', False)
+    # Memory budget in MB for entities read on demand when lazy_loading is on, estimated from their TOML files.
+    ret['hydration_budget_mb'] = c.get('hydration_budget_mb', 256)
+
     return ret
@@ -12,6 +12,7 @@ from connexion.middleware import MiddlewarePosition
 from starlette.middleware.cors import CORSMiddleware
 
 from dragon_core.config import verify_and_parse_config
+from dragon_core.scripts.migrate_lair import migrate_lair
 from dragon_core.scripts.new_env_creator import create_simulated_env
 
 
@@ -37,6 +38,7 @@ def start_server(config_path: Path) -> None:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag"],
     )
 
     app.add_api('./api/API_specification.yaml')
@@ -58,6 +60,15 @@ def dragon_ignite_fire_sack() -> None:
     start_server(config_path)
 
 
+def dragon_migrate_lair() -> None:
+    parser = argparse.ArgumentParser(description='Migrates the entity files of a lair to the latest format')
+    parser.add_argument("lair_path", type=str, help="Path to the directory of the lair")
+
+    args = parser.parse_args()
+
+    migrate_lair(Path(args.lair_path))
+
+
 def start_debug_server() -> None:
 
     # Replace path to config
@@ -1,7 +1,7 @@
 import importlib
 import json
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional
 
 import tomllib as toml
 from jinja2 import Environment, FileSystemLoader
@@ -100,12 +100,21 @@ def generate_class(config_path: Union[str, Path],
         f.write(schema_output)
 
 
+# Fields that are left out when reading only the skeleton of an entity, with the type of their empty value.
+SKELETON_EXCLUDED_FIELDS = {'content_blocks': list,
+                            'comments': list,
+                            'data_structure': dict,
+                            'analysis': list,
+                            'stored_params': list}
+
+
 # TODO: Have error catching this for when there are more than a single item
-def read_from_TOML(path: Union[str, Path]) -> object:
+def read_from_TOML(path: Union[str, Path], skeleton: bool = False) -> object:
     """
     Reads a TOML file and returns an instantiated object of the class specified in the file.
 
     :param path: The path to the TOML file.
+    :param skeleton: If True, the fields in SKELETON_EXCLUDED_FIELDS are not loaded and are left empty instead.
     :return: An instantiated object of the class specified in the TOML file.
     """
     with open(str(path), 'rb') as f:
@@ -116,6 +125,11 @@ def read_from_TOML(path: Union[str, Path]) -> object:
     module = importlib.import_module(f'dragon_core.modules.{data["type"].lower()}')
     _class = getattr(module, data.pop('type'))
 
+    if skeleton:
+        for field in SKELETON_EXCLUDED_FIELDS:
+            data.pop(field, None)
+        return _class(**data)
+
     if len(data['content_blocks']) > 0:
         data['content_blocks'] = [ContentBlock.from_dict(json.loads(x)) for x in data['content_blocks']]
 
@@ -127,6 +141,16 @@ def read_from_TOML(path: Union[str, Path]) -> object:
     return ins
 
 
+def try_read_from_TOML(path: Union[str, Path], skeleton: bool = False) -> Optional[object]:
+    """
+    Same as read_from_TOML, but returns None if the file cannot be read as an entity.
+    """
+    try:
+        return read_from_TOML(path, skeleton=skeleton)
+    except Exception:
+        return None
+
+
 def generate_all_classes() -> None:
     """
     Helper class to create all the classes in the schemas directory.
@@ -4,7 +4,7 @@ The customization of this entity is still to be determined, so for now I will be
 """
 import re
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Union, Callable
 
 import tomlkit
 
@@ -39,10 +39,11 @@ class Bucket(Entity):
     def get_instance_uuid(self, instance_path):
         return self.path_to_uuid[instance_path]
 
-    def to_TOML(self, path: Optional[Union[str, Path]] = None):
+    def to_TOML(self, path: Optional[Union[str, Path]] = None,
+                translate: Optional[Callable[[str], str]] = None):
 
         if hasattr(super(), 'to_TOML'):
-            doc = super().to_TOML()
+            doc = super().to_TOML(translate=translate)
             vals = doc[self.name]
         else:
             doc = tomlkit.document()
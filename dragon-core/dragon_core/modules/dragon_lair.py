@@ -1,5 +1,7 @@
 import uuid
-from typing import List
+import atexit
+import threading
+from typing import List, Optional
 from pathlib import Path
 from dataclasses import dataclass
 
@@ -35,6 +37,11 @@ class DragonLair:
 
     config fields go here ...
 
+    [meta]
+    ID = "1234"
+    format_version = 2
+    ...
+
     [buckets]
     bucket1ID = "/path/to/bucket1"
     bucket2ID = "/path/to/bucket2"
@@ -73,14 +80,24 @@ class DragonLair:
     """
 
     _FILENAME: str = '_dragon_lair.toml'
-
-    def __init__(self, dir_path: Path):
+    # How many modification timestamps are kept, older ones are dropped as new ones are added.
+    MAX_MODIFIED_TIMESTAMPS: int = 100
+    # Latest format of the entity files. In format 1, entities reference their parent, children and data buckets by
+    # the path of their TOML files. In format 2 they reference them by UUID, the path of an entity is found through the
+    # ID prefix of its filename, so renaming an entity only rewrites its own file.
+    FORMAT_VERSION: int = 2
+
+    def __init__(self, dir_path: Path, write_debounce: float = 0):
         """
         Class that helps manage the _dragon_lair.toml file. This is used a central place for the whole system.
         It includes all the available Libraries as well as user information for now.
 
         While users can be specified in the config, we need to keep track of other information about them such as
         profile pictures, etc.
+
+        :param dir_path: The directory of the lair.
+        :param write_debounce: Seconds to wait after a change before writing the file, changes happening in the
+            meantime are written together. 0 writes the file on every change.
         """
 
         self._intro_warning = ('COMPUTER MANAGED FILE, PLEASE DO NOT EDIT MANUALLY \n# This is the central management '
@@ -92,11 +109,17 @@ class DragonLair:
         self.ID = None
         self.creation_timestamp = None
         self.modified_timestamps = None
+        # Format of the entity files of the lair, lairs created before format versions existed are format 1.
+        self.format_version = 1
         # keys, email of the user; value the User dataclass
         self.users: dict[str, User] = {}
         self.buckets: dict[str, Path] = {}
         self.libraries: List[DragonLibrary] = []
 
+        self.write_debounce = write_debounce
+        self._write_timer: Optional[threading.Timer] = None
+        self._write_lock = threading.Lock()
+
         # loads itself from file.
         if not self.dir_path.exists():
             raise FileNotFoundError(f"cannot start Lab Dragon, lair's directory not found at {self.dir_path}")
@@ -120,6 +143,7 @@ class DragonLair:
         meta['ID'] = ID
         meta['creation_timestamp'] = create_timestamp()
         meta['modified_timestamps'] = [create_timestamp()]
+        meta['format_version'] = self.FORMAT_VERSION
         doc.add("meta", meta)
 
         buckets = table()
@@ -138,7 +162,8 @@ class DragonLair:
 
         self.ID = ID
         self.creation_timestamp = meta['creation_timestamp']
-        self.modified_timestamps = meta['modified_timestamps']
+        self.modified_timestamps = list(meta['modified_timestamps'])
+        self.format_version = self.FORMAT_VERSION
 
     def load_from_file(self):
 
@@ -153,7 +178,8 @@ class DragonLair:
                 case "meta":
                     self.ID = tab['ID']
                     self.creation_timestamp = tab['creation_timestamp']
-                    self.modified_timestamps = tab['modified_timestamps']
+                    self.modified_timestamps = list(tab['modified_timestamps'])
+                    self.format_version = tab.get('format_version', 1)
 
                 case "buckets":
                     for bucket_name, bucket_path in tab.items():
@@ -178,42 +204,89 @@ class DragonLair:
             raise ValueError(f"Bucket with name {name} already exists in the lair")
 
         self.buckets[name] = bucket_path
-        self.to_file()
+        self._changed()
 
     def delete_bucket(self, name):
         if name not in self.buckets:
             raise ValueError(f"Bucket with name {name} does not exist in the lair")
 
         del self.buckets[name]
-        self.to_file()
+        self._changed()
 
     def add_user(self, email, name, profile_color=""):
         if email in self.users:
             raise ValueError(f"User with email {email} already exists in the lair")
 
         self.users[email] = User(email=email, name=name, profile_color=profile_color)
-        self.to_file()
+        self._changed()
 
     def delete_user(self, email):
         if email not in self.users:
             raise ValueError(f"User with email {email} does not exist in the lair")
 
         del self.users[email]
-        self.to_file()
+        self._changed()
 
     def set_user_color(self, email: str, color: str):
         if email not in self.users:
             raise ValueError(f"User with email {email} does not exist in the lair")
 
         self.users[email].profile_color = color
-        self.to_file()
+        self._changed()
 
     def insert_library_instance(self, library_instance: Library):
+        # The instance is not part of the file, so there is nothing to write.
         for lib in self.libraries:
             if lib.ID == library_instance.ID:
                 lib.instance = library_instance
                 break
-        self.to_file()
+
+    def _changed(self):
+        """
+        Records a modification timestamp and writes the file, right away or once the debounce period is over.
+        """
+        with self._write_lock:
+            self.modified_timestamps.append(create_timestamp())
+            del self.modified_timestamps[:-self.MAX_MODIFIED_TIMESTAMPS]
+
+            if self.write_debounce <= 0:
+                self.to_file()
+                return
+
+            if self._write_timer is None:
+                self._write_timer = threading.Timer(self.write_debounce, self.flush)
+                self._write_timer.daemon = True
+                self._write_timer.start()
+                atexit.register(self.flush)
+
+    def flush(self):
+        """
+        Writes the file now if there are changes waiting for the debounce period to end.
+        """
+        with self._write_lock:
+            if self._write_timer is None:
+                return
+            self._write_timer.cancel()
+            self._write_timer = None
+            atexit.unregister(self.flush)
+            self.to_file()
+
+    def update_path(self, old_path: Path, new_path: Path):
+        """
+        Updates the path of the library or bucket whose TOML file moved from old_path to new_path.
+        """
+        changed = False
+        for library in self.libraries:
+            if str(library.path) == str(old_path):
+                library.path = new_path
+                changed = True
+        for name, bucket_path in self.buckets.items():
+            if str(bucket_path) == str(old_path):
+                self.buckets[name] = new_path
+                changed = True
+
+        if changed:
+            self._changed()
 
     def add_library(self, lib: Library, lib_path: Path):
         if lib.name in self.libraries:
@@ -224,7 +297,7 @@ class DragonLair:
                                             deleted=False,
                                             path=lib_path,
                                             instance=lib))
-        self.to_file()
+        self._changed()
 
     def delete_library(self, lib_name: str):
         if lib_name not in self.libraries:
@@ -235,7 +308,7 @@ class DragonLair:
                 lib.deleted = True
                 break
 
-        self.to_file()
+        self._changed()
 
     def to_file(self):
         doc = document()
@@ -244,8 +317,8 @@ class DragonLair:
         meta = table()
         meta['ID'] = self.ID
         meta['creation_timestamp'] = self.creation_timestamp
-        self.modified_timestamps.append(create_timestamp())  # Add another modification timestamp
         meta['modified_timestamps'] = self.modified_timestamps
+        meta['format_version'] = self.format_version
         doc.add("meta", meta)
 
         buckets = table()
@@ -269,7 +342,7 @@ class DragonLair:
             tab['ID'] = library.ID
             tab['deleted'] = library.deleted
             tab['path'] = str(library.path)
-            doc.add(library.name, tab)
+            doc.add(str(library.name), tab)
 
         with open(self.file_path, 'w') as f:
             dump(doc, f)
@@ -2,14 +2,50 @@ import uuid
 import tomlkit
 
 from pathlib import Path
-from typing import List, Tuple, Optional, Union
+from typing import List, Tuple, Optional, Union, Callable
 
 from dragon_core.utils import create_timestamp
 from dragon_core.components import (ContentBlock,
                                     SupportedContentBlockType,
                                     Table, create_text_block,
                                     create_image_block, create_image_link_block,
-                                    Comment, create_comment)
+                                    Comment, create_comment, Order)
+
+
+def _item_id(item) -> str:
+    return item.ID
+
+
+class _PositionIndex:
+    """
+    Maps the IDs of the items of a list to their position in it. The index does not look at the list when finding an
+    item, it has to be rebuilt every time the list is replaced and told about every item appended to it.
+
+    :param key: Returns the ID of an item of the list. Needs to be a module level function so entities can be pickled.
+    """
+    def __init__(self, key: Callable[[object], str]):
+        self._key = key
+        self._positions = {}
+
+    def find(self, ID: str) -> Optional[int]:
+        """
+        Returns the position of the first item with the passed ID, None if there is none.
+        """
+        return self._positions.get(ID)
+
+    def rebuild(self, items: list) -> None:
+        """
+        Indexes every item of the list, needs to be called after replacing it.
+        """
+        self._positions = {}
+        for i, item in enumerate(items):
+            self._positions.setdefault(self._key(item), i)
+
+    def appended(self, items: list) -> None:
+        """
+        Registers the last item of the list, needs to be called after appending to it.
+        """
+        self._positions.setdefault(self._key(items[-1]), len(items) - 1)
 
 
 # FIXME: The items in the order should all be the same, not some tuple and some list.
@@ -17,6 +53,9 @@ class Entity(object):
 
     # If True, checks everytime the entity is saved to_TOML if the filename starts with the first 8 digits of the ID. If it doesn't it adds them.
     START_FILENAME_WITH_ID = True
+
+    # Attributes derived from the others to speed up lookups, they are left out when comparing entities.
+    LOOKUP_ATTRIBUTES = ('_block_positions', '_comment_positions')
     
     def __init__(self,
                  user: str,
@@ -56,10 +95,15 @@ class Entity(object):
         self.deleted = deleted
         self.description = description
 
-        if isinstance(order, list) and len(order) != 0:
-            self.order = order
+        # Positions of the content blocks and comments by their ID.
+        self._block_positions = _PositionIndex(_item_id)
+        self._comment_positions = _PositionIndex(_item_id)
+
+        # Items are inserted under other items, the order finds and inserts them in logarithmic time.
+        if isinstance(order, (list, Order)) and len(order) != 0:
+            self.order = Order(order)
         else:
-            self.order = [].copy()
+            self.order = Order()
 
         if isinstance(content_blocks, list) and len(content_blocks) != 0:
             self.content_blocks = content_blocks
@@ -100,10 +144,20 @@ class Entity(object):
         else:
             self.end_time = end_time
 
-    def to_TOML(self, path: Optional[Union[str,Path]] = None):
+    def to_TOML(self, path: Optional[Union[str,Path]] = None,
+                translate: Optional[Callable[[str], str]] = None):
+        """
+        Creates the TOML document of the entity and writes it to path if passed.
+
+        :param path: Where to write the document.
+        :param translate: Applied to the references to other entities (parent, children and data buckets) while they
+            are written, used to write the paths of their TOML files instead of their UUIDs without copying the entity.
+        """
+        if translate is None:
+            translate = lambda ref: ref
 
         if hasattr(super(), 'to_TOML'):
-            doc = super().to_TOML()
+            doc = super().to_TOML(translate=translate)
             vals = doc[self.name]
         else:
             doc = tomlkit.document()
@@ -117,7 +171,7 @@ class Entity(object):
         
         vals['previous_names'] = self.previous_names
         
-        vals['parent'] = str(self.parent)
+        vals['parent'] = str(translate(self.parent))
         
         vals['deleted'] = self.deleted
         
@@ -129,11 +183,11 @@ class Entity(object):
         vals['comments'] = [str(comment) for comment in self.comments]
 
         # We want to save the str version of every child, not the object.
-        vals['children'] = [str(child) for child in self.children]
+        vals['children'] = [str(translate(child)) for child in self.children]
         
         vals['params'] = self.params
         
-        vals['data_buckets'] = self.data_buckets
+        vals['data_buckets'] = [translate(bucket) for bucket in self.data_buckets]
         
         vals['bookmarked'] = self.bookmarked
         
@@ -162,14 +216,48 @@ class Entity(object):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self._compared_attributes() == other._compared_attributes()
         return False
 
+    def _compared_attributes(self) -> dict:
+        return {key: value for key, value in self.__dict__.items() if key not in self.LOOKUP_ATTRIBUTES}
+
+    @property
+    def content_blocks(self) -> List[ContentBlock]:
+        return self._content_blocks
+
+    @content_blocks.setter
+    def content_blocks(self, content_blocks: List[ContentBlock]) -> None:
+        # Replacing the list (loading, hydrating, evicting, replaying the journal) indexes it again.
+        self._content_blocks = content_blocks
+        self._block_positions.rebuild(content_blocks)
+
+    @property
+    def comments(self) -> List[Comment]:
+        return self._comments
+
+    @comments.setter
+    def comments(self, comments: List[Comment]) -> None:
+        self._comments = comments
+        self._comment_positions.rebuild(comments)
+
     def _find_order_index(self, item_id):
-        for i, item in enumerate(self.order):
-            if item[0] == item_id:
-                return i
-        raise ValueError(f"Item with id {item_id} not found in order.")
+        index = self.order.index_of(item_id)
+        if index is None:
+            raise ValueError(f"Item with id {item_id} not found in order.")
+        return index
+
+    def get_content_block(self, block_id) -> ContentBlock:
+        index = self._block_positions.find(block_id)
+        if index is None:
+            raise ValueError(f"Content block with id {block_id} does not exist.")
+        return self.content_blocks[index]
+
+    def get_comment(self, comment_id) -> Comment:
+        index = self._comment_positions.find(comment_id)
+        if index is None:
+            raise ValueError(f"Comment with id {comment_id} does not exist.")
+        return self.comments[index]
 
     def add_child(self, child, under_child=None, _add_to_order=True):
         """
@@ -189,46 +277,46 @@ class Entity(object):
     def add_text_block(self, content, user=None, under_child=None, _add_to_order=True):
         new_content_block = create_text_block(content, user)
         self.content_blocks.append(new_content_block)
+        self._block_positions.appended(self.content_blocks)
         if under_child is not None:
             index = self._find_order_index(under_child)
             self.order.insert(index+1, (new_content_block.ID, "content_block", True))
-            return
+            return new_content_block
 
         if _add_to_order:
             self.order.append((new_content_block.ID, "content_block", True))
+        return new_content_block
 
     def add_image_block(self, image_path, title, user=None, under_child=None, _add_to_order=True):
         new_image_block = create_image_block(image_path, title, user)
         self.content_blocks.append(new_image_block)
+        self._block_positions.appended(self.content_blocks)
         if under_child is not None:
             index = self._find_order_index(under_child)
             self.order.insert(index+1, (new_image_block.ID, "content_block", True))
-            return
+            return new_image_block
 
         if _add_to_order:
             self.order.append((new_image_block.ID, "content_block", True))
+        return new_image_block
 
     def add_image_link_block(self, instance_id, image_path, user=None, under_child=None, _add_to_order=True):
         new_image_block = create_image_link_block(image_path, instance_id, user)
         self.content_blocks.append(new_image_block)
+        self._block_positions.appended(self.content_blocks)
         if under_child is not None:
             index = self._find_order_index(under_child)
             self.order.insert(index+1, (new_image_block.ID, "content_block", True))
-            return
+            return new_image_block
 
         if _add_to_order:
             self.order.append((new_image_block.ID, "content_block", True))
+        return new_image_block
 
 
     def modify_text_block(self, block_id, content, user):
 
-        block = None
-        for blo in self.content_blocks:
-            if blo.ID == block_id:
-                block = blo
-                break
-        if block is None:
-            raise ValueError(f"Content block with id {block_id} does not exist.")
+        block = self.get_content_block(block_id)
 
         block.modify(content=content, user=user)
         return True
@@ -237,13 +325,7 @@ class Entity(object):
         if image_path is None and title is None:
             return True
 
-        block = None
-        for blo in self.content_blocks:
-            if blo.ID == block_id:
-                block = blo
-                break
-        if block is None:
-            raise ValueError(f"Content block with id {block_id} does not exist.")
+        block = self.get_content_block(block_id)
 
         if image_path is None:
             image_path = block.content[-1][0]
@@ -255,13 +337,7 @@ class Entity(object):
 
     def delete_block(self, block_id):
 
-        block = None
-        for blo in self.content_blocks:
-            if blo.ID == block_id:
-                block = blo
-                break
-        if block is None:
-            raise ValueError(f"Content block with id {block_id} does not exist.")
+        block = self.get_content_block(block_id)
 
         order = self._find_order_index(block_id)
         self.order[order] = (block_id, "content_block", False)
@@ -276,39 +352,22 @@ class Entity(object):
         return True
 
     def add_comment(self, body, user, content_block_id=None):
-        target_block = None
+        target = self.ID
         if content_block_id is not None:
-            for block in self.content_blocks:
-                if block.ID == content_block_id:
-                    target_block = block
-                    break
-            if target_block is None:
-                raise ValueError(f"Content block with id {content_block_id} does not exist.")
-
-        target = content_block_id if target_block is not None else self.ID
-        self.comments.append(create_comment(body=body, parent=self.ID, target=target, user=user))
-        return True
+            target = self.get_content_block(content_block_id).ID
+
+        comment = create_comment(body=body, parent=self.ID, target=target, user=user)
+        self.comments.append(comment)
+        self._comment_positions.appended(self.comments)
+        return comment
 
     def add_comment_reply(self, comment_id, body, user):
-        comment = None
-        for com in self.comments:
-            if com.ID == comment_id:
-                comment = com
-                break
-        if comment is None:
-            raise ValueError(f"Comment with id {comment_id} does not exist.")
+        comment = self.get_comment(comment_id)
 
-        comment.add_reply(body, user)
-        return True
+        return comment.add_reply(body, user)
 
     def resolve_comment(self, comment_id):
-        comment = None
-        for com in self.comments:
-            if com.ID == comment_id:
-                comment = com
-                break
-        if comment is None:
-            raise ValueError(f"Comment with id {comment_id} does not exist.")
+        comment = self.get_comment(comment_id)
 
         comment.resolved = True
         return True
@@ -1,6 +1,6 @@
 import tomlkit
 
-from typing import List, Tuple, Dict, Optional, Union
+from typing import List, Tuple, Dict, Optional, Union, Callable
 from pathlib import Path as Path
 from dragon_core.modules.entity import Entity as Entity
 
@@ -56,10 +56,11 @@ class Instance(Entity):
         # if len(data) != 0:
         #     self.populate_itself()
 
-    def to_TOML(self, path: Optional[Union[str,Path]] = None):
+    def to_TOML(self, path: Optional[Union[str,Path]] = None,
+                translate: Optional[Callable[[str], str]] = None):
 
         if hasattr(super(), 'to_TOML'):
-            doc = super().to_TOML()
+            doc = super().to_TOML(translate=translate)
             vals = doc[self.name]
         else:
             doc = tomlkit.document()
@@ -99,7 +100,7 @@ class Instance(Entity):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self._compared_attributes() == other._compared_attributes()
         return False
 
     def populate_itself(self):
@@ -2,16 +2,17 @@ import uuid
 import tomlkit
 
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Union, Callable
 from dragon_core.modules.entity import Entity as Entity
 
 
 class Step(Entity):
 
-    def to_TOML(self, path: Optional[Union[str,Path]] = None):
+    def to_TOML(self, path: Optional[Union[str,Path]] = None,
+                translate: Optional[Callable[[str], str]] = None):
 
         if hasattr(super(), 'to_TOML'):
-            doc = super().to_TOML()
+            doc = super().to_TOML(translate=translate)
             vals = doc[self.name]
         else:
             doc = tomlkit.document()
@@ -37,5 +38,5 @@ class Step(Entity):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self._compared_attributes() == other._compared_attributes()
         return False
@@ -1,15 +1,16 @@
 import tomlkit
 
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Union, Callable
 from dragon_core.modules.entity import Entity as Entity
 
 
 class Task(Entity):
-    def to_TOML(self, path: Optional[Union[str,Path]] = None):
+    def to_TOML(self, path: Optional[Union[str,Path]] = None,
+                translate: Optional[Callable[[str], str]] = None):
 
         if hasattr(super(), 'to_TOML'):
-            doc = super().to_TOML()
+            doc = super().to_TOML(translate=translate)
             vals = doc[self.name]
         else:
             doc = tomlkit.document()
@@ -35,7 +36,7 @@ class Task(Entity):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self._compared_attributes() == other._compared_attributes()
         return False
 
     
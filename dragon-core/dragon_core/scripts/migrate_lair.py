@@ -0,0 +1,107 @@
+"""
+Migrates the entity files of a lair to the latest format (DragonLair.FORMAT_VERSION). In format 2, entities reference
+their parent, children and data buckets by UUID instead of by the path of their TOML files, and the ID prefix of the
+filename is used to find the file of an entity. Files whose name does not start with the ID prefix are renamed.
+
+The server must be stopped while migrating. If snapshots are enabled, the snapshot is discarded on the next start.
+"""
+import argparse
+from pathlib import Path
+from typing import Dict
+
+from dragon_core.modules import DragonLair, Bucket, Entity
+from dragon_core.generators.meta import read_from_TOML
+
+
+def _read_lair_entities(lair: DragonLair) -> Dict[str, Entity]:
+    """
+    Reads every entity of a format 1 lair, following the paths of the children of the libraries and the instances of
+    the buckets.
+
+    :return: Dictionary with the path to every TOML file as keys and the entity as values.
+    """
+    entities = {}
+    level = [str(lib.path) for lib in lair.libraries] + [str(path) for path in lair.buckets.values()]
+    while len(level) > 0:
+        next_level = []
+        for path in level:
+            if path in entities:
+                continue
+            ent = read_from_TOML(path)
+            entities[path] = ent
+            next_level += [str(child) for child in ent.children]
+            if isinstance(ent, Bucket):
+                next_level += [str(ins_path) for ins_path in ent.path_to_uuid.keys()]
+        level = next_level
+    return entities
+
+
+def migrate_lair(lair_path: Path) -> int:
+    """
+    Rewrites every entity of the lair in the latest format and updates the format version of the lair.
+
+    :param lair_path: The directory of the lair.
+    :return: The number of entity files rewritten.
+    """
+    lair = DragonLair(Path(lair_path))
+    if lair.format_version >= DragonLair.FORMAT_VERSION:
+        print(f"Lair at {lair_path} is already in format {lair.format_version}")
+        return 0
+
+    entities = _read_lair_entities(lair)
+    path_to_uuid = {str(Path(path)): ent.ID for path, ent in entities.items()}
+
+    unresolved = []
+
+    def translate(ref):
+        ref = str(ref)
+        if ref == '' or ref in path_to_uuid.values():
+            return ref
+        ID = path_to_uuid.get(str(Path(ref)))
+        if ID is None:
+            unresolved.append(ref)
+            return ref
+        return ID
+
+    # Files need to start with the ID prefix to be found.
+    new_paths = {}
+    for path, ent in entities.items():
+        path = Path(path)
+        if not path.name.startswith(ent.ID[:8] + '_'):
+            new_paths[str(path)] = path.parent.joinpath(ent.ID[:8] + '_' + path.name)
+
+    for ent in entities.values():
+        # to_TOML writes the order as it is, entities created with the paths of their children keep them in the order.
+        for i, (item, item_type, show) in enumerate(ent.order):
+            if item_type == "entity":
+                ID = translate(item)
+                if ID != str(item):
+                    ent.order[i] = (ID, item_type, show)
+
+        if isinstance(ent, Bucket):
+            ent.path_to_uuid = {new_paths.get(str(p), p): ID for p, ID in ent.path_to_uuid.items()}
+            ent.uuid_to_path = {ID: p for p, ID in ent.path_to_uuid.items()}
+
+    for path, ent in entities.items():
+        ent.to_TOML(new_paths.get(path, path), translate=translate)
+
+    for old_path, new_path in new_paths.items():
+        Path(old_path).unlink()
+        lair.update_path(old_path, new_path)
+
+    lair.format_version = DragonLair.FORMAT_VERSION
+    lair.to_file()
+
+    if len(unresolved) > 0:
+        print(f"Could not resolve {len(unresolved)} references, they were left as they were:\n" + "\n".join(unresolved))
+    print(f"Migrated {len(entities)} entities of the lair at {lair_path} to format {lair.format_version}")
+    return len(entities)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Migrate the entity files of a lair to the latest format.')
+    parser.add_argument('lair_path', type=Path, help='Path to the directory of the lair')
+
+    args = parser.parse_args()
+
+    migrate_lair(args.lair_path)
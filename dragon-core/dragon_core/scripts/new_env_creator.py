@@ -23,6 +23,7 @@ from labcore.data.datadict_storage import datadict_to_hdf5
 
 from dragon_core.modules import Bucket, Project, Task, Step, Instance, DragonLair, Library, Notebook
 from dragon_core.utils import delete_directory_contents
+from dragon_core.scripts.migrate_lair import migrate_lair
 
 
 def simulate_resonator_response(f0, Q, Qc, f_start, f_end, path) -> Tuple[Path, Path, Path]:
@@ -295,8 +296,9 @@ def create_simulated_env(target: Path) -> Path:
 
 #    delete_directory_contents(target)
 
-    # Creating lair
+    # Creating lair. The entities below reference each other by path, the lair is migrated once they are written.
     lair = DragonLair(target)
+    lair.format_version = 1
 
     # Creating data bucket
     data_path = target / 'data'
@@ -557,5 +559,6 @@ def create_simulated_env(target: Path) -> Path:
         item.to_TOML(item_path)
 
     lair.add_library(library_1, library_1_path)
+    migrate_lair(target)
 
     return lair.file_path
\ No newline at end of file
@@ -1,7 +1,9 @@
 import os
 import sys
+import json
 from pathlib import Path
 
+import flask
 import pytest
 import connexion
 import tomllib as toml
@@ -103,7 +105,46 @@ def root_entity(client):
     return toml_file, loaded_entity
 
 
+# -- Testing the API functions over a lair in a temporary directory -- #
 
+@pytest.fixture()
+def lair_path(tmp_path, monkeypatch):
+    """
+    Empty lair directory the API is pointed to through the environment. Options of the API can be set with
+    monkeypatch.setenv before calling load_api.
+    """
+    path = tmp_path / 'lair'
+    path.mkdir()
+    monkeypatch.setenv('LAIRS_DIRECTORY', str(path))
+    monkeypatch.setenv('RESOURCE_PATH', str(tmp_path / 'resources'))
+    monkeypatch.setenv('API_URL_PREFIX', 'http://localhost:8000')
+    monkeypatch.setenv('URL_HOST', 'http://localhost:3000')
+    monkeypatch.setenv('USERS', json.dumps({'test_user': 'Test User'}))
+    # Tests write the lair file themselves, pending writes of the API would overwrite it.
+    monkeypatch.setenv('LAIR_WRITE_DEBOUNCE', '0')
+    return path
 
 
-
+@pytest.fixture()
+def load_api(lair_path, monkeypatch):
+    """
+    Returns a function that loads the lair into the API and returns the entities module. The API functions are called
+    inside a request context, like when the server calls them.
+    """
+    app = flask.Flask(__name__)
+    with app.test_request_context():
+        from dragon_core.api import entities
+        monkeypatch.setattr(entities, 'LOADING_FROM_ENV', True)
+
+        def load():
+            entities.set_initial_indices()
+            entities.load_all_entities()
+            return entities
+
+        yield load
+
+        # Background threads of the API would keep writing to the lair after the test.
+        for background in (entities.JOURNAL, entities.WRITE_BEHIND, entities.BUCKET_WATCHER):
+            if background is not None:
+                background.stop()
+        entities.JOURNAL = entities.WRITE_BEHIND = entities.BUCKET_WATCHER = None
@@ -0,0 +1,116 @@
+import gzip
+import json
+
+import flask
+import pytest
+from werkzeug.exceptions import NotFound
+
+from dragon_core.api import notebook_cache
+from dragon_core.api.watcher import DATA_FILENAME
+
+user = 'test_user'
+
+
+def _read_notebook(entities, ID, index, headers=None):
+    with flask.Flask(__name__).test_request_context(headers=headers or {}):
+        return entities.read_analysis_notebook(ID, index)
+
+
+@pytest.fixture()
+def instance(load_api, tmp_path, monkeypatch):
+    """
+    Instance of a measurement with an analysis notebook. Notebooks are rendered only when requested.
+    """
+    rendered = []
+    monkeypatch.setattr(notebook_cache, 'render_notebook',
+                        lambda path: rendered.append(path) or f"<html>{path.read_text()}</html>")
+    entities = load_api()
+    monkeypatch.setattr(entities.NOTEBOOK_CACHE, 'warm', lambda paths: None)
+
+    folder = tmp_path / "bucket"
+    measurement = folder / "measurement"
+    measurement.mkdir(parents=True)
+    (measurement / DATA_FILENAME).write_text("data")
+    notebook = measurement / "analysis.ipynb"
+    notebook.write_text("first")
+    entities.add_bucket(user, "bucket", str(folder))
+    entities._ingest_watched_paths([measurement])
+
+    bucket = entities.INDEX[entities.PATH_TO_UUID_INDEX[str(entities.DRAGONLAIR.buckets["bucket"])]]
+    instance = entities.INDEX[next(iter(bucket.path_to_uuid.values()))]
+    assert instance.analysis == [str(notebook)]
+    return entities, instance, notebook, rendered
+
+
+def test_notebooks_are_listed_by_url_in_read_one(instance):
+    entities, instance, notebook, rendered = instance
+    with flask.Flask(__name__).test_request_context():
+        response = entities.read_one(instance.ID)
+
+    analysis = json.loads(response.get_data())['analysis']
+    assert analysis == [{"name": "analysis", "url": f"/api/entities/{instance.ID}/analysis/0"}]
+    assert rendered == []
+
+
+def test_notebooks_are_rendered_once_and_revalidated_by_etag(instance):
+    entities, instance, notebook, rendered = instance
+    first = _read_notebook(entities, instance.ID, 0)
+    assert first.status_code == 200
+    assert first.get_data(as_text=True) == "<html>first</html>"
+    assert first.headers['Content-Type'] == 'text/html; charset=utf-8'
+    assert 'Content-Encoding' not in first.headers
+    etag = first.headers['ETag']
+
+    cached = _read_notebook(entities, instance.ID, 0, {'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b""
+    assert _read_notebook(entities, instance.ID, 0).get_data(as_text=True) == "<html>first</html>"
+    assert len(rendered) == 1
+
+    # Changing the notebook changes its version, the old ETag no longer matches.
+    notebook.write_text("second, longer")
+    changed = _read_notebook(entities, instance.ID, 0, {'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_data(as_text=True) == "<html>second, longer</html>"
+    assert len(rendered) == 2
+
+
+def test_notebooks_are_gzipped_when_accepted(instance):
+    entities, instance, notebook, rendered = instance
+    response = _read_notebook(entities, instance.ID, 0, {'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.get_data()).decode('utf-8') == "<html>first</html>"
+
+    plain = _read_notebook(entities, instance.ID, 0, {'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'] == response.headers['ETag']
+
+
+def test_missing_notebooks_are_not_found(instance):
+    entities, instance, notebook, rendered = instance
+    for index in (-1, 1):
+        with pytest.raises(NotFound):
+            _read_notebook(entities, instance.ID, index)
+    with pytest.raises(NotFound):
+        _read_notebook(entities, "not an ID", 0)
+
+    entities.add_library({"name": "library", "user": user})
+    with pytest.raises(NotFound):
+        _read_notebook(entities, entities.DRAGONLAIR.libraries[0].ID, 0)
+
+    notebook.unlink()
+    with pytest.raises(NotFound):
+        _read_notebook(entities, instance.ID, 0)
+    assert rendered == []
+
+
+def test_instances_are_loaded_holding_the_index_lock(instance, monkeypatch):
+    entities, instance, notebook, rendered = instance
+    held = []
+    monkeypatch.setattr(entities, '_load_entity_by_id', lambda ID: held.append(entities.INDEX_LOCK._is_owned()))
+    with pytest.raises(NotFound):
+        _read_notebook(entities, "not an ID", 0)
+    assert held == [True]
@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+from dragon_core.api.watcher import BucketWatcher, DATA_FILENAME
+from dragon_core.generators.meta import read_from_TOML
+
+user = 'test_user'
+
+
+def _measurement(folder, *analysis_files):
+    folder.mkdir(parents=True)
+    (folder / DATA_FILENAME).write_text("data")
+    for name in analysis_files:
+        (folder / name).write_text(name)
+    return folder
+
+
+def test_polling_reports_settled_changes(tmp_path):
+    (tmp_path / "existing.png").write_text("a")
+    reported = []
+    watcher = BucketWatcher([tmp_path], reported.append, debounce=60, use_polling=True)
+
+    (tmp_path / "new.png").write_text("b")
+    (tmp_path / "ignored.txt").write_text("c")
+    watcher._poll()
+    watcher._flush()
+    assert reported == []
+
+    # Once the debounce period passes without changes.
+    watcher.debounce = 0
+    watcher._flush()
+    assert reported == [[tmp_path / "new.png"]]
+
+    (tmp_path / "existing.png").write_text("changed")
+    watcher._poll()
+    watcher._flush()
+    assert reported[-1] == [tmp_path / "existing.png"]
+    watcher._poll()
+    watcher._flush()
+    assert len(reported) == 2
+
+
+def test_errors_of_the_callback_do_not_stop_the_watcher(tmp_path):
+    def fail(paths):
+        raise ValueError("cannot ingest")
+
+    watcher = BucketWatcher([tmp_path], fail, debounce=0, use_polling=True)
+    watcher.notify(tmp_path / "new.png")
+    watcher._flush()
+    assert watcher._pending == {}
+
+
+@pytest.fixture()
+def bucket(load_api, tmp_path):
+    entities = load_api()
+    folder = tmp_path / "bucket"
+    folder.mkdir()
+    entities.add_bucket(user, "bucket", str(folder))
+    return entities, entities.INDEX[entities.PATH_TO_UUID_INDEX[str(entities.DRAGONLAIR.buckets["bucket"])]], folder
+
+
+def test_new_measurements_become_instances(bucket):
+    entities, bucket, folder = bucket
+    measurement = _measurement(folder / "2024" / "measurement", "plot.png", "fit.json", "__good__.tag")
+    (folder / "2024" / "unrelated.png").write_text("not in a measurement")
+
+    entities._ingest_watched_paths([folder / "2024"])
+    assert len(bucket.path_to_uuid) == 1
+    instance_path, instance_ID = next(iter(bucket.path_to_uuid.items()))
+    instance = entities.INDEX[instance_ID]
+    assert instance.images == [str(measurement / "plot.png")]
+    assert instance.stored_params == [str(measurement / "fit.json")]
+    assert instance.tags == ["good"]
+    assert entities.INSTANCEIMAGE[str(measurement / "plot.png")] == instance_ID
+
+    assert read_from_TOML(instance_path).ID == instance_ID
+    assert instance_ID in read_from_TOML(entities.DRAGONLAIR.buckets["bucket"]).path_to_uuid.values()
+
+    # Reporting the same folder again does not create another instance, new analysis files are added.
+    (measurement / "second.png").write_text("b")
+    entities._ingest_watched_paths([folder / "2024", measurement / "second.png"])
+    assert len(bucket.path_to_uuid) == 1
+    assert instance.images == [str(measurement / "plot.png"), str(measurement / "second.png")]
+    assert read_from_TOML(instance_path).images == instance.images
+
+
+def test_files_outside_buckets_are_ignored(bucket, tmp_path):
+    entities, bucket, folder = bucket
+    outside = _measurement(tmp_path / "outside", "plot.png")
+    entities._ingest_watched_paths([outside, outside / "plot.png"])
+    assert bucket.path_to_uuid == {}
+    assert str(outside / "plot.png") not in entities.INSTANCEIMAGE
+
+
+def test_watching_the_buckets_of_the_lair(load_api, tmp_path, monkeypatch):
+    monkeypatch.setenv('WATCH_BUCKETS', 'true')
+    monkeypatch.setenv('WATCH_DEBOUNCE', '0.1')
+    entities = load_api()
+    folder = tmp_path / "bucket"
+    folder.mkdir()
+    entities.add_bucket(user, "bucket", str(folder))
+    bucket = entities.INDEX[entities.PATH_TO_UUID_INDEX[str(entities.DRAGONLAIR.buckets["bucket"])]]
+
+    _measurement(folder / "measurement", "plot.png")
+    deadline = time.monotonic() + 10
+    while len(bucket.path_to_uuid) == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(bucket.path_to_uuid) == 1
+
+
+@pytest.mark.parametrize('write_behind', [False, True])
+@pytest.mark.parametrize('watcher_first', [True, False])
+def test_folders_reported_by_the_watcher_and_a_client_get_one_instance(load_api, tmp_path, monkeypatch,
+                                                                        write_behind, watcher_first):
+    if write_behind:
+        monkeypatch.setenv('WRITE_BEHIND', 'true')
+        monkeypatch.setenv('WRITE_BEHIND_INTERVAL', '3600')
+    entities = load_api()
+    folder = tmp_path / "bucket"
+    folder.mkdir()
+    entities.add_bucket(user, "bucket", str(folder))
+    bucket = entities.INDEX[entities.PATH_TO_UUID_INDEX[str(entities.DRAGONLAIR.buckets["bucket"])]]
+    measurement = _measurement(folder / "measurement", "plot.png")
+
+    def post():
+        response = entities.add_instance({"bucket_ID": bucket.ID, "data_loc": str(measurement), "user": user})
+        assert response.status_code == 201
+
+    def ingest():
+        entities._ingest_watched_paths([measurement])
+
+    for report in ((ingest, post) if watcher_first else (post, ingest)):
+        report()
+    post()
+
+    assert len(bucket.path_to_uuid) == 1
+    assert len([ent for ent in entities.INDEX.values() if ent.__class__.__name__ == "Instance"]) == 1
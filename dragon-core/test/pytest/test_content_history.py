@@ -0,0 +1,172 @@
+import json
+
+from dragon_core.components import ContentBlock, create_text_block
+from dragon_core.components import content_blocks
+from dragon_core.components.content_blocks import ContentHistory
+
+user = 'test_user'
+
+
+def test_history_reconstructs_every_version():
+    versions = ["", "a", "ab", "abc", "a new line\nabc", "a new line\nabc", "replaced"]
+    history = ContentHistory(versions[:2])
+    history.serialize_history()
+    for version in versions[2:]:
+        history.append(version)
+
+    assert len(history) == len(versions)
+    assert history[-1] == versions[-1]
+    assert [history[i] for i in range(len(versions))] == versions
+    assert list(history) == versions
+    assert history[1:3] == versions[1:3]
+
+
+def test_block_round_trip_keeps_only_latest_version_in_full():
+    block = create_text_block("first", user)
+    for i in range(50):
+        block.modify(f"first\nline {i}", user)
+
+    data = block.to_dict()
+    assert data['content'] == ["first\nline 49"]
+    assert 'history' in data
+
+    loaded = ContentBlock.from_dict(json.loads(json.dumps(data)))
+    assert loaded == block
+    assert loaded.latest_version() == block.latest_version()
+    assert loaded.to_dict(full_history=True)['content'] == list(block.content)
+
+
+def test_blocks_with_full_content_list_are_loaded():
+    block = create_text_block("first", user)
+    block.modify("second", user)
+    data = block.to_dict(full_history=True)
+    assert data['content'] == ["first", "second"]
+    assert 'history' not in data
+
+    loaded = ContentBlock.from_dict(json.loads(json.dumps(data)))
+    assert isinstance(loaded.content, ContentHistory)
+    assert list(loaded.content) == ["first", "second"]
+
+
+def test_modifications_within_the_squash_window_replace_the_latest_version(monkeypatch):
+    monkeypatch.setattr(content_blocks, 'SQUASH_WINDOW', 60.0)
+    block = create_text_block("first", user)
+    block.modify("first edit", user)
+    block.modify("second edit", user)
+    assert list(block.content) == ["second edit"]
+    assert len(block.dates) == len(block.authors) == 1
+
+    block.modify("other user", "other_user")
+    assert list(block.content) == ["second edit", "other user"]
+
+
+def test_squashing_existing_history():
+    block = create_text_block("a", user)
+    block.modify("ab", user)
+    block.modify("abc", "other_user")
+    block.dates = ["2024-01-01T10:00:00+00:00", "2024-01-01T10:00:30+00:00", "2024-01-01T10:00:40+00:00"]
+
+    assert not block.squash(10.0)
+    assert block.squash(60.0)
+    assert list(block.content) == ["ab", "abc"]
+    assert block.dates == ["2024-01-01T10:00:30+00:00", "2024-01-01T10:00:40+00:00"]
+    assert block.authors == [user, "other_user"]
+
+
+def _record_unpacked(monkeypatch):
+    unpacked = []
+    unpack = content_blocks._unpack
+
+    def recording(chunk):
+        unpacked.append(chunk)
+        return unpack(chunk)
+
+    monkeypatch.setattr(content_blocks, '_unpack', recording)
+    return unpacked
+
+
+def test_serializing_only_compresses_the_new_deltas(monkeypatch):
+    versions = [f"line {i}\n" * (i + 1) for i in range(20)]
+    history = ContentHistory(versions[:10])
+    old_chunks = history.serialize_history()
+    assert len(old_chunks) == 1
+    # Only chunks shorter than HISTORY_CHUNK_SIZE take the deltas of the next serialization.
+    monkeypatch.setattr(content_blocks, 'HISTORY_CHUNK_SIZE', len(old_chunks[0]))
+
+    unpacked = _record_unpacked(monkeypatch)
+    for version in versions[10:]:
+        history.append(version)
+    chunks = history.serialize_history()
+    assert chunks[:1] == old_chunks and len(chunks) == 2
+    assert history.serialize_history() == chunks
+
+    history[-1] = "replaced"
+    assert unpacked == [chunks[-1]]
+    assert history.serialize_history()[:1] == old_chunks
+    assert history[-2] == versions[-2]
+
+    loaded = ContentHistory.from_serialized("replaced", history.serialize_history(), len(versions))
+    assert list(loaded) == versions[:-1] + ["replaced"]
+
+
+def test_saving_many_times_keeps_the_number_of_chunks_bounded(monkeypatch):
+    monkeypatch.setattr(content_blocks, 'HISTORY_CHUNK_SIZE', 1024)
+    versions = [f"version {i}: " + "text " * (i % 50) for i in range(500)]
+    history = ContentHistory(versions[:1])
+    unpacked = _record_unpacked(monkeypatch)
+    for version in versions[1:]:
+        history.append(version)
+        chunks = history.serialize_history()
+
+    # Every chunk but the last one is full, so they grow with the size of the history and not with the saves.
+    assert all(len(chunk) >= 1024 for chunk in chunks[:-1])
+    assert len(chunks) <= sum(len(chunk) for chunk in chunks) // 1024 + 1
+    assert len(chunks) < 50
+    # Only the last chunk is decompressed to merge the new deltas.
+    assert all(len(chunk) < 1024 for chunk in unpacked)
+
+    loaded = ContentHistory.from_serialized(versions[-1], chunks, len(versions))
+    assert list(loaded) == versions
+
+
+def test_history_in_a_single_string_is_loaded():
+    versions = ["a", "ab", "abc"]
+    old_format = content_blocks._pack(ContentHistory(versions)._recent)
+    assert list(ContentHistory.from_serialized("abc", old_format, 3)) == versions
+
+
+def test_squashed_edits_do_not_touch_older_history(monkeypatch):
+    block = create_text_block("first", user)
+    for i in range(20):
+        block.modify(f"first\nline {i}", user if i % 2 else "other_user")
+    old_chunks = block.content.serialize_history()
+    older = list(block.content)
+    monkeypatch.setattr(content_blocks, 'HISTORY_CHUNK_SIZE', len(old_chunks[0]))
+
+    unpacked = _record_unpacked(monkeypatch)
+    monkeypatch.setattr(content_blocks, 'SQUASH_WINDOW', 60.0)
+    for i in range(5):
+        block.modify(f"squashed {i}", "third_user")
+    assert unpacked == []
+    assert list(block.content) == older + ["squashed 4"]
+
+    monkeypatch.setattr(content_blocks, 'SQUASH_WINDOW', 0.0)
+    block.modify("kept", "third_user")
+    unpacked.clear()
+    assert block.squash(60.0)
+    assert unpacked == []
+    assert block.content.serialize_history()[:1] == old_chunks
+    assert list(block.content) == older + ["kept"]
+    assert len(block.content) == len(block.dates) == len(block.authors)
+
+
+def test_keeping_versions_of_the_history():
+    versions = [str(i) * i for i in range(8)]
+    for keep in ([1, 2, 5, 7], [0, 7], [3, 4, 5, 6, 7], list(range(8))):
+        history = ContentHistory(versions[:4])
+        history.serialize_history()
+        for version in versions[4:]:
+            history.append(version)
+        history.keep(keep)
+        assert list(history) == [versions[i] for i in keep]
+        assert len(history) == len(keep)
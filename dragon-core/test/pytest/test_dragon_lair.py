@@ -0,0 +1,94 @@
+import time
+
+import pytest
+import tomllib as toml
+
+from dragon_core.modules.dragon_lair import DragonLair
+
+
+def read_lair_file(lair):
+    with open(lair.file_path, 'rb') as f:
+        return toml.load(f)
+
+
+def lair_file_users(lair):
+    # An empty array of tables is not written, so a lair without users has no users key.
+    return [user['email'] for user in read_lair_file(lair).get('users', [])]
+
+
+def test_changes_are_written_right_away_without_debounce(tmp_path):
+    lair = DragonLair(tmp_path)
+    lair.add_user('smaug@lonely.mountain', 'Smaug')
+
+    assert lair_file_users(lair) == ['smaug@lonely.mountain']
+    assert lair._write_timer is None
+
+
+def test_changes_in_the_debounce_period_are_written_together(tmp_path, monkeypatch):
+    lair = DragonLair(tmp_path, write_debounce=0.2)
+    writes = []
+    to_file = lair.to_file
+    monkeypatch.setattr(lair, 'to_file', lambda: (writes.append(1), to_file()))
+
+    lair.add_user('smaug@lonely.mountain', 'Smaug')
+    lair.add_user('glaurung@angband', 'Glaurung')
+    lair.set_user_color('smaug@lonely.mountain', '#FF0000')
+    assert writes == []
+    assert lair_file_users(lair) == []
+
+    deadline = time.monotonic() + 5
+    while len(writes) == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.3)
+
+    assert writes == [1]
+    users = {user['email']: user for user in read_lair_file(lair)['users']}
+    assert sorted(users) == ['glaurung@angband', 'smaug@lonely.mountain']
+    assert users['smaug@lonely.mountain']['profile_color'] == '#FF0000'
+
+
+def test_flush_writes_pending_changes(tmp_path):
+    lair = DragonLair(tmp_path, write_debounce=3600)
+    lair.add_user('smaug@lonely.mountain', 'Smaug')
+    assert lair_file_users(lair) == []
+
+    lair.flush()
+    assert lair_file_users(lair) == ['smaug@lonely.mountain']
+    assert lair._write_timer is None
+
+    # Nothing is pending anymore, so flushing again leaves the file alone.
+    mtime = lair.file_path.stat().st_mtime_ns
+    lair.flush()
+    assert lair.file_path.stat().st_mtime_ns == mtime
+
+
+def test_failed_changes_are_not_written(tmp_path):
+    lair = DragonLair(tmp_path, write_debounce=3600)
+    lair.add_user('smaug@lonely.mountain', 'Smaug')
+    lair.flush()
+
+    with pytest.raises(ValueError):
+        lair.add_user('smaug@lonely.mountain', 'Smaug')
+    assert lair._write_timer is None
+
+
+def test_modification_timestamps_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(DragonLair, 'MAX_MODIFIED_TIMESTAMPS', 5)
+    lair = DragonLair(tmp_path)
+    for i in range(12):
+        lair.add_user(f'dragon{i}@lair', f'Dragon {i}')
+
+    assert len(lair.modified_timestamps) == 5
+    assert len(read_lair_file(lair)['meta']['modified_timestamps']) == 5
+    assert DragonLair(tmp_path).modified_timestamps == lair.modified_timestamps
+
+
+def test_pending_writes_reach_the_disk_before_reloading(load_api, monkeypatch):
+    monkeypatch.setenv('LAIR_WRITE_DEBOUNCE', '3600')
+    entities = load_api()
+    entities.DRAGONLAIR.add_user('smaug@lonely.mountain', 'Smaug')
+    assert 'smaug@lonely.mountain' not in lair_file_users(entities.DRAGONLAIR)
+
+    entities = load_api()
+    assert 'smaug@lonely.mountain' in entities.DRAGONLAIR.users
+    entities.DRAGONLAIR.flush()
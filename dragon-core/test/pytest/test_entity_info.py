@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from werkzeug.exceptions import NotFound
+
+user = 'test_user'
+
+
+def _info(entities, ID):
+    response = entities.read_entity_info(ID)
+    assert response.status_code == 201
+    return json.loads(response.get_data())
+
+
+def _add(entities, parent, name, type_):
+    entities.add_entity({"name": name, "user": user, "parent": parent, "type": type_})
+    return entities.INDEX[parent].children[-1]
+
+
+@pytest.fixture()
+def tree(load_api):
+    """
+    library -> notebook -> (project -> task, other project)
+    """
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.DRAGONLAIR.libraries[0].ID
+    notebook = _add(entities, library, "notebook", "Notebook")
+    project = _add(entities, notebook, "project", "Project")
+    task = _add(entities, project, "task", "Task")
+    other = _add(entities, notebook, "other project", "Project")
+    return entities, {"library": library, "notebook": notebook, "project": project, "task": task, "other": other}
+
+
+def test_aggregates_follow_added_entities(tree):
+    entities, IDs = tree
+    assert _info(entities, IDs["library"]) == {"rank": 3, "num_children": 4, "deleted_children": 0, "live_children": 4}
+    assert _info(entities, IDs["notebook"]) == {"rank": 2, "num_children": 3, "deleted_children": 0,
+                                                "live_children": 3}
+    assert _info(entities, IDs["task"]) == {"rank": 0, "num_children": 0, "deleted_children": 0, "live_children": 0}
+
+    step = _add(entities, IDs["task"], "step", "Step")
+    assert _info(entities, IDs["library"])["rank"] == 4
+    assert _info(entities, IDs["notebook"])["num_children"] == 4
+    assert _info(entities, IDs["project"]) == {"rank": 2, "num_children": 2, "deleted_children": 0,
+                                               "live_children": 2}
+    assert _info(entities, step)["num_children"] == 0
+
+
+def test_deleted_entities_are_counted_in_every_ancestor(tree):
+    entities, IDs = tree
+    entities.delete_entity(IDs["task"])
+
+    assert _info(entities, IDs["project"]) == {"rank": 1, "num_children": 1, "deleted_children": 1,
+                                               "live_children": 0}
+    assert _info(entities, IDs["notebook"]) == {"rank": 2, "num_children": 3, "deleted_children": 1,
+                                                "live_children": 2}
+    assert _info(entities, IDs["library"])["deleted_children"] == 1
+
+    entities.delete_entity(IDs["other"])
+    assert _info(entities, IDs["library"]) == {"rank": 3, "num_children": 4, "deleted_children": 2, "live_children": 2}
+
+
+def test_stored_aggregates_match_the_ones_computed_on_load(tree, load_api):
+    entities, IDs = tree
+    entities.delete_entity(IDs["task"])
+    stored = {ID: _info(entities, ID) for ID in IDs.values()}
+
+    with entities.AGGREGATES_LOCK:
+        entities.SUBTREE_AGGREGATES.clear()
+        recomputed = {ID: entities._compute_aggregates(ID) for ID in IDs.values()}
+    assert recomputed == stored
+
+    entities = load_api()
+    assert {ID: _info(entities, ID) for ID in IDs.values()} == stored
+
+
+def test_info_of_unknown_entities_is_not_found(tree):
+    entities, IDs = tree
+    with pytest.raises(NotFound):
+        entities.read_entity_info("not an ID")
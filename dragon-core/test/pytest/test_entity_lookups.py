@@ -0,0 +1,66 @@
+import json
+import pickle
+
+import pytest
+
+from dragon_core.modules import Step
+from dragon_core.api import journal
+
+user = 'test_user'
+
+
+def test_lookups_follow_replaced_lists():
+    step = Step(name="step", user=[user])
+    blocks = [step.add_text_block(f"block {i}", user) for i in range(3)]
+    assert step.get_content_block(blocks[1].ID) is blocks[1]
+    assert step._find_order_index(blocks[2].ID) == 2
+
+    # Lists replaced without going through the entity methods, like when hydrating or evicting.
+    step.order.insert(0, ("other", "entity", True))
+    step.content_blocks = list(reversed(step.content_blocks))
+    assert step._find_order_index(blocks[2].ID) == 3
+    assert step.get_content_block(blocks[0].ID) is blocks[0]
+    step.content_blocks = []
+    with pytest.raises(ValueError):
+        step.get_content_block(blocks[0].ID)
+
+    comment = step.add_comment("a comment", user)
+    step.resolve_comment(comment.ID)
+    assert step.get_comment(comment.ID).resolved
+
+
+def test_unknown_IDs_do_not_rebuild_the_lookups():
+    step = Step(name="step", user=[user])
+    block = step.add_text_block("block", user)
+    positions = step._block_positions._positions
+    with pytest.raises(ValueError):
+        step.get_content_block("unknown")
+    with pytest.raises(ValueError):
+        step.get_comment("unknown")
+    assert step._block_positions._positions is positions
+    assert step.get_content_block(block.ID) is block
+
+
+def test_journal_replay_updates_the_lookups():
+    step = Step(name="step", user=[user])
+    block = step.add_text_block("block", user)
+    comment = step.add_comment("a comment", user)
+    replayed = Step(name="step", user=[user], ID=step.ID)
+    for record in [journal.block_added(block), journal.comment_added(comment)]:
+        journal.apply_record(replayed, json.loads(json.dumps({"entity": step.ID, **record})))
+
+    assert replayed.get_content_block(block.ID).ID == block.ID
+    assert replayed.get_comment(comment.ID).ID == comment.ID
+
+
+def test_lookups_do_not_affect_equality():
+    step = Step(name="step", user=[user])
+    block = step.add_text_block("block", user)
+    copy = pickle.loads(pickle.dumps(step))
+    copy._block_positions._positions = {}
+    assert copy == step
+    assert step._block_positions != copy._block_positions
+
+    copy.content_blocks[0].deleted = True
+    assert copy != step
+    assert step.get_content_block(block.ID) is step.content_blocks[0]
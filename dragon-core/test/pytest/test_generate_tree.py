@@ -0,0 +1,100 @@
+import sys
+import json
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.exceptions import BadRequest, NotFound
+
+user = 'test_user'
+
+
+def _tree(entities, ID, **kwargs):
+    response = entities.generate_tree(ID, **kwargs)
+    assert response.status_code == 201
+    return json.loads(response.get_data())
+
+
+@pytest.fixture()
+def tree(load_api):
+    """
+    library -> notebook -> (p1 -> (t1, t2), p2)
+    """
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.DRAGONLAIR.libraries[0].ID
+
+    def add(parent, name, type_):
+        entities.add_entity({"name": name, "user": user, "parent": parent, "type": type_})
+        return entities.INDEX[parent].children[-1]
+
+    notebook = add(library, "notebook", "Notebook")
+    p1 = add(notebook, "p1", "Project")
+    add(p1, "t1", "Task")
+    add(p1, "t2", "Task")
+    add(notebook, "p2", "Project")
+    return entities, library, notebook, p1
+
+
+def test_whole_tree(tree):
+    entities, library, notebook, p1 = tree
+    assert _tree(entities, library) == ("library\n"
+                                        "    └── notebook\n"
+                                        "        ├── p1\n"
+                                        "        │   ├── t1\n"
+                                        "        │   └── t2\n"
+                                        "        └── p2\n")
+    assert _tree(entities, p1) == ("p1\n"
+                                   "    ├── t1\n"
+                                   "    └── t2\n")
+
+
+def test_trees_cut_by_depth_and_breadth_are_marked_incomplete(tree):
+    entities, library, notebook, p1 = tree
+    assert _tree(entities, library, deepness=2) == ("library\n"
+                                                    "    └── notebook\n"
+                                                    "        └ ⋯ \n")
+    assert _tree(entities, library, breadth=1) == ("library\n"
+                                                   "    └── notebook\n"
+                                                   "        ├── p1\n"
+                                                   "        │   ├── t1\n"
+                                                   "        │   └ ⋯ \n"
+                                                   "        └ ⋯ \n")
+    assert _tree(entities, library, depth=3, breadth=1) == ("library\n"
+                                                            "    └── notebook\n"
+                                                            "        ├── p1\n"
+                                                            "        │   └ ⋯ \n"
+                                                            "        └ ⋯ \n")
+
+
+def test_tree_as_json(tree):
+    entities, library, notebook, p1 = tree
+    ret = _tree(entities, notebook, depth=2, breadth=1, as_json=True)
+    assert ret == {"name": "notebook", "id": notebook, "type": "Notebook", "complete": False,
+                   "children": [{"name": "p1", "id": p1, "type": "Project", "children": [], "complete": False}]}
+
+    ret = _tree(entities, notebook, as_json=True)
+    assert ret["complete"] is True
+    assert [child["name"] for child in ret["children"]] == ["p1", "p2"]
+    assert [child["name"] for child in ret["children"][0]["children"]] == ["t1", "t2"]
+
+
+def test_deep_trees_do_not_hit_the_recursion_limit(load_api, monkeypatch):
+    entities = load_api()
+    levels = sys.getrecursionlimit() + 100
+    index = {str(i): SimpleNamespace(name=f"level {i}", children=[str(i + 1)] if i + 1 < levels else [])
+             for i in range(levels)}
+    monkeypatch.setattr(entities, 'INDEX', index)
+
+    lines = _tree(entities, "0", depth=levels).splitlines()
+    assert len(lines) == levels
+    assert lines[-1] == "    " * (levels - 1) + "└── " + f"level {levels - 1}"
+
+
+def test_unknown_entities_and_invalid_sizes(tree):
+    entities, library, notebook, p1 = tree
+    with pytest.raises(NotFound):
+        entities.generate_tree("not an ID")
+    with pytest.raises(BadRequest):
+        entities.generate_tree(library, depth=0)
+    with pytest.raises(BadRequest):
+        entities.generate_tree(library, breadth=-1)
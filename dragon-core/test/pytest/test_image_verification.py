@@ -0,0 +1,81 @@
+import time
+import threading
+
+import pytest
+from PIL import Image
+
+from dragon_core.modules import Instance
+from dragon_core.api.watcher import DATA_FILENAME
+
+user = 'test_user'
+
+
+@pytest.fixture()
+def images(tmp_path):
+    """
+    A valid image, a file with an image suffix that is not an image and the path of an image that does not exist.
+    """
+    folder = tmp_path / "images"
+    folder.mkdir()
+    valid = folder / "valid.png"
+    Image.new("RGB", (4, 4), "red").save(valid)
+    corrupt = folder / "corrupt.png"
+    corrupt.write_bytes(b"not a png")
+    return valid, corrupt, folder / "missing.png"
+
+
+def test_registering_instances_does_not_open_images(load_api, images, monkeypatch):
+    entities = load_api()
+    valid, corrupt, missing = images
+
+    def open_image(*args, **kwargs):
+        raise AssertionError("images are only opened by the background verification")
+    monkeypatch.setattr(entities.Image, 'open', open_image)
+
+    instance = Instance(name="instance", user=[user], images=[str(valid), str(corrupt), str(missing)])
+    entities._register_instance(instance, valid.parent / f"{instance.ID[:8]}_instance.toml")
+
+    assert entities.INSTANCEIMAGE == {str(valid): instance.ID, str(corrupt): instance.ID}
+    assert entities.IMAGES_TO_VERIFY == {str(valid), str(corrupt)}
+    assert entities.BROKEN_IMAGES == {str(missing): "File not found"}
+
+
+def test_verification_records_broken_images(load_api, images, capsys):
+    entities = load_api()
+    valid, corrupt, missing = images
+
+    entities._verify_images([valid, corrupt, missing])
+    assert sorted(entities.BROKEN_IMAGES) == sorted([str(corrupt), str(missing)])
+    report = capsys.readouterr().out
+    assert "Found 2 broken images" in report
+    assert str(corrupt) in report and str(missing) in report and str(valid) not in report
+
+
+def test_images_are_verified_in_the_background_after_loading(load_api, tmp_path, monkeypatch):
+    entities = load_api()
+    folder = tmp_path / "bucket"
+    measurement = folder / "measurement"
+    measurement.mkdir(parents=True)
+    (measurement / DATA_FILENAME).write_text("data")
+    Image.new("RGB", (4, 4), "red").save(measurement / "valid.png")
+    (measurement / "corrupt.png").write_bytes(b"not a png")
+    Image.new("RGB", (4, 4), "red").save(measurement / "deleted.png")
+    entities.add_bucket(user, "bucket", str(folder))
+    entities._ingest_watched_paths([measurement])
+    (measurement / "deleted.png").unlink()
+
+    opened_in = []
+    open_image = entities.Image.open
+    monkeypatch.setattr(entities.Image, 'open', lambda *args, **kwargs:
+                        opened_in.append(threading.current_thread()) or open_image(*args, **kwargs))
+    monkeypatch.setenv('VERIFY_IMAGES', 'true')
+    entities = load_api()
+    # The missing image is found while loading, the corrupt one once the verification decodes it.
+    assert entities.BROKEN_IMAGES[str(measurement / "deleted.png")] == "File not found"
+
+    deadline = time.monotonic() + 10
+    while str(measurement / "corrupt.png") not in entities.BROKEN_IMAGES and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert sorted(entities.get_indices()['BROKEN_IMAGES']) == sorted([str(measurement / "corrupt.png"),
+                                                                      str(measurement / "deleted.png")])
+    assert len(opened_in) > 0 and threading.main_thread() not in opened_in
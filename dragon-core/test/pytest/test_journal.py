@@ -0,0 +1,96 @@
+import json
+import threading
+
+from dragon_core.modules import Step
+from dragon_core.generators.meta import read_from_TOML
+from dragon_core.api import journal
+from dragon_core.components import content_blocks
+
+user = 'test_user'
+
+
+def _replay(records):
+    step = Step(name="replayed", user=[user], ID=records[0]["entity"])
+    for record in records:
+        journal.apply_record(step, json.loads(json.dumps(record)))
+    return step
+
+
+def test_replaying_records_twice_does_not_change_the_entity():
+    step = Step(name="original", user=[user])
+    records = []
+
+    block = step.add_text_block("first", user)
+    records.append({"entity": step.ID, **journal.block_added(block)})
+    step.modify_text_block(block.ID, "second", user)
+    records.append({"entity": step.ID, **journal.block_modified(block)})
+    comment = step.add_comment("a comment", user)
+    records.append({"entity": step.ID, **journal.comment_added(comment)})
+    reply = step.add_comment_reply(comment.ID, "a reply", user)
+    records.append({"entity": step.ID, **journal.reply_added(comment.ID, reply)})
+    step.delete_block(block.ID)
+    records.append({"entity": step.ID, **journal.block_deleted(block.ID)})
+
+    replayed = _replay(records)
+    for record in records:
+        journal.apply_record(replayed, json.loads(json.dumps(record)))
+
+    assert [b.content for b in replayed.content_blocks] == [["first", "second"]]
+    assert replayed.content_blocks[0].deleted
+    assert replayed.order == [(block.ID, "content_block", False)]
+    assert len(replayed.comments) == 1
+    assert [r.body for r in replayed.comments[0].replies] == [["a reply"]]
+
+
+def test_journal_compaction(tmp_path):
+    written = []
+    path = tmp_path / journal.JOURNAL_FILENAME
+    jour = journal.Journal(path, written.append)
+
+    jour.append("a", journal.attributes_set(bookmarked=True))
+    jour.append("a", journal.attributes_set(bookmarked=False))
+    jour.append("b", journal.comment_resolved("c"))
+    assert len(list(journal.read_journal(path))) == 3
+
+    jour.flush()
+    assert sorted(written) == ["a", "b"]
+    assert list(journal.read_journal(path)) == []
+    jour.stop()
+
+
+def test_replaying_squashed_modifications(monkeypatch):
+    monkeypatch.setattr(content_blocks, 'SQUASH_WINDOW', 60.0)
+    step = Step(name="original", user=[user])
+    block = step.add_text_block("first", user)
+    records = [{"entity": step.ID, **journal.block_added(block)}]
+    for content in ["second", "third"]:
+        step.modify_text_block(block.ID, content, user)
+        records.append({"entity": step.ID, **journal.block_modified(block)})
+
+    replayed = _replay(records)
+    for record in records:
+        journal.apply_record(replayed, json.loads(json.dumps(record)))
+
+    assert [b.content for b in replayed.content_blocks] == [["third"]]
+
+
+def test_compaction_waits_for_requests_modifying_the_entity(load_api, monkeypatch):
+    monkeypatch.setenv('JOURNAL', 'true')
+    monkeypatch.setenv('JOURNAL_COMPACTION_INTERVAL', '3600')
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+    entities.add_text_block(library.ID, "first", user)
+
+    # A request in the middle of modifying the library.
+    with entities.INDEX_LOCK:
+        compaction = threading.Thread(target=entities.JOURNAL.flush)
+        compaction.start()
+        compaction.join(0.2)
+        assert compaction.is_alive()
+        block = library.add_text_block("second", [user])
+    compaction.join()
+
+    written = read_from_TOML(entities.UUID_TO_PATH_INDEX[library.ID])
+    assert [b.ID for b in written.content_blocks][-1] == block.ID
+    assert [item[0] for item in written.order] == [item[0] for item in library.order]
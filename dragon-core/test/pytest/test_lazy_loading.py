@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from dragon_core.generators.meta import read_from_TOML
+
+user = 'test_user'
+
+
+@pytest.fixture()
+def lazy_lair(load_api, monkeypatch):
+    """
+    Lair with a library and two notebooks holding a text block and a comment each, loaded lazily.
+    """
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library_ID = entities.DRAGONLAIR.libraries[0].ID
+    for name in ("first", "second"):
+        entities.add_entity({"name": name, "user": user, "parent": library_ID, "type": "Notebook"})
+    notebooks = list(entities.INDEX[library_ID].children)
+    for ID in notebooks:
+        entities.add_text_block(ID, f"text of {entities.INDEX[ID].name}", user)
+        entities.add_comment(ID, user, {"comment": "a comment"})
+
+    monkeypatch.setenv('LAZY_LOADING', 'true')
+    entities = load_api()
+    return entities, notebooks
+
+
+def test_only_skeletons_are_loaded(lazy_lair):
+    entities, notebooks = lazy_lair
+    for ID in notebooks:
+        ent = entities.INDEX[ID]
+        assert ent.content_blocks == [] and ent.comments == []
+        assert ent.name in ("first", "second")
+    assert len(entities.HYDRATED) == 0
+
+    body = json.loads(entities.read_one(notebooks[0]).get_data())
+    assert [json.loads(block)['content'] for block in body['content_blocks']] == [["text of first"]]
+    assert len(entities.INDEX[notebooks[0]].comments) == 1
+    assert list(entities.HYDRATED) == [notebooks[0]]
+    assert entities.INDEX[notebooks[1]].content_blocks == []
+
+
+def test_modifying_a_skeleton_keeps_what_was_on_disk(lazy_lair):
+    entities, notebooks = lazy_lair
+    entities.add_text_block(notebooks[0], "added", user)
+    block_ID = entities.INDEX[notebooks[0]].content_blocks[0].ID
+    entities.edit_text_block(notebooks[0], block_ID, "edited", user)
+
+    written = read_from_TOML(entities.UUID_TO_PATH_INDEX[notebooks[0]])
+    assert [block.content[-1] for block in written.content_blocks] == ["edited", "added"]
+    assert len(written.comments) == 1
+
+
+def test_least_recently_used_entities_are_evicted(lazy_lair, monkeypatch):
+    entities, notebooks = lazy_lair
+    sizes = [os.path.getsize(entities.UUID_TO_PATH_INDEX[ID]) for ID in notebooks]
+    monkeypatch.setattr(entities, 'HYDRATION_GRACE_PERIOD', 0)
+    monkeypatch.setattr(entities, 'HYDRATION_BUDGET', max(sizes))
+
+    entities.read_one(notebooks[0])
+    entities.read_one(notebooks[1])
+    assert list(entities.HYDRATED) == [notebooks[1]]
+    assert entities.HYDRATED_SIZE == sizes[1]
+    assert entities.INDEX[notebooks[0]].content_blocks == [] and entities.INDEX[notebooks[0]].comments == []
+    assert len(entities.INDEX[notebooks[1]].content_blocks) == 1
+
+    # Evicted entities are hydrated again when needed, with their lookups working.
+    block_ID = read_from_TOML(entities.UUID_TO_PATH_INDEX[notebooks[0]]).content_blocks[0].ID
+    entities.edit_text_block(notebooks[0], block_ID, "edited", user)
+    assert entities.INDEX[notebooks[0]].get_content_block(block_ID).content[-1] == "edited"
+
+
+def test_recently_used_and_dirty_entities_are_not_evicted(lazy_lair, monkeypatch):
+    entities, notebooks = lazy_lair
+    monkeypatch.setattr(entities, 'HYDRATION_BUDGET', 0)
+
+    entities.read_one(notebooks[0])
+    entities.read_one(notebooks[1])
+    assert list(entities.HYDRATED) == notebooks
+
+    monkeypatch.setattr(entities, 'HYDRATION_GRACE_PERIOD', 0)
+    monkeypatch.setattr(entities, '_is_dirty', lambda ID: ID == notebooks[0])
+    with entities.HYDRATION_LOCK:
+        entities._evict_hydrated()
+    assert list(entities.HYDRATED) == [notebooks[0]]
+    assert len(entities.INDEX[notebooks[0]].content_blocks) == 1
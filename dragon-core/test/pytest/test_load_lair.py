@@ -0,0 +1,30 @@
+import pytest
+
+from dragon_core.modules import DragonLair, Library, Task
+
+user = 'test_user'
+
+
+@pytest.mark.parametrize('workers, executor', [(0, 'thread'), (2, 'thread'), (2, 'process')])
+def test_files_that_cannot_be_read_are_skipped(lair_path, load_api, monkeypatch, workers, executor):
+    monkeypatch.setenv('LOADING_WORKERS', str(workers))
+    monkeypatch.setenv('LOADING_EXECUTOR', executor)
+
+    lair = DragonLair(lair_path)
+    lair.format_version = 1
+    library = Library(name="library", user=[user])
+    library_path = lair_path / f"{library.ID[:8]}_library.toml"
+    tasks = [Task(name=f"task {i}", user=[user], parent=str(library_path)) for i in range(2)]
+    task_paths = [lair_path / f"{task.ID[:8]}_{task.name}.toml" for task in tasks]
+    for task, task_path in zip(tasks, task_paths):
+        library.add_child(str(task_path))
+        task.to_TOML(task_path)
+    library.to_TOML(library_path)
+    lair.add_library(library, library_path)
+    task_paths[0].write_text("not [a valid TOML file")
+
+    entities = load_api()
+
+    assert list(entities.INDEX) == [library.ID, tasks[1].ID]
+    assert entities.INDEX[library.ID].children == [str(task_paths[0]), tasks[1].ID]
+    assert entities.INDEX[tasks[1].ID].parent == library.ID
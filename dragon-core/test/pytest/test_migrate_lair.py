@@ -0,0 +1,56 @@
+from dragon_core.modules import DragonLair, Library, Task
+from dragon_core.generators.meta import read_from_TOML
+from dragon_core.scripts.migrate_lair import migrate_lair
+
+user = 'test_user'
+
+
+def test_migration_replaces_paths_with_uuids(tmp_path):
+    lair = DragonLair(tmp_path)
+    lair.format_version = 1
+    library = Library(name="library", user=[user])
+    task = Task(name="task", user=[user], parent=library.ID)
+    library.add_child(task.ID)
+
+    library_path = tmp_path.joinpath(f"{library.ID[:8]}_library.toml")
+    # Files without the ID prefix are renamed.
+    task_path = tmp_path.joinpath("task.toml")
+    Task.START_FILENAME_WITH_ID = False
+    try:
+        library.to_TOML(library_path, translate=lambda ref: str(task_path))
+        task.to_TOML(task_path, translate=lambda ref: str(library_path))
+    finally:
+        Task.START_FILENAME_WITH_ID = True
+    lair.add_library(library, library_path)
+
+    assert migrate_lair(tmp_path) == 2
+
+    assert not task_path.exists()
+    migrated_library = read_from_TOML(library_path)
+    migrated_task = read_from_TOML(tmp_path.joinpath(f"{task.ID[:8]}_task.toml"))
+    assert migrated_library.children == [task.ID]
+    assert migrated_task.parent == library.ID
+    assert DragonLair(tmp_path).format_version == DragonLair.FORMAT_VERSION
+
+
+def test_migration_replaces_paths_in_the_order(lair_path, load_api):
+    lair = DragonLair(lair_path)
+    lair.format_version = 1
+    library = Library(name="library", user=[user])
+    library_path = lair_path / f"{library.ID[:8]}_library.toml"
+    tasks = [Task(name=f"task {i}", user=[user], parent=str(library_path)) for i in range(2)]
+    # Like the environments of new_env_creator, the children are added by the path of their files.
+    for task in tasks:
+        task_path = lair_path / f"{task.ID[:8]}_{task.name}.toml"
+        library.add_child(str(task_path))
+        task.to_TOML(task_path)
+    library.to_TOML(library_path)
+    lair.add_library(library, library_path)
+
+    assert migrate_lair(lair_path) == 3
+    assert [item[0] for item in read_from_TOML(library_path).order] == [task.ID for task in tasks]
+
+    entities = load_api()
+    entities.delete_entity(tasks[0].ID)
+    assert entities.INDEX[tasks[0].ID].deleted is True
+    assert [item[0] for item in read_from_TOML(library_path).order] == [task.ID for task in tasks]
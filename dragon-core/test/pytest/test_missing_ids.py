@@ -0,0 +1,107 @@
+from pathlib import Path
+
+import pytest
+from werkzeug.exceptions import NotFound
+
+from dragon_core.modules import Notebook
+from dragon_core.api.watcher import DATA_FILENAME
+
+user = 'test_user'
+
+
+@pytest.fixture()
+def library(load_api, monkeypatch):
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+
+    scans = []
+    scan = entities._scan_for_prefix
+    monkeypatch.setattr(entities, '_scan_for_prefix',
+                        lambda prefix, directories: scans.append(prefix) or scan(prefix, directories))
+    return entities, library, scans
+
+
+def _write_notebook(entities, library, ID=None, name="written elsewhere"):
+    notebook = Notebook(name=name, user=[user], parent=library.ID, ID=ID)
+    notebook.to_TOML(Path(entities.UUID_TO_PATH_INDEX[library.ID]).parent)
+    return notebook
+
+
+def test_entities_written_after_loading_are_found(library):
+    entities, library, scans = library
+    notebook = _write_notebook(entities, library)
+
+    assert entities.read_one(notebook.ID).status_code == 201
+    assert scans == [notebook.ID[:8]]
+    assert entities.INDEX[notebook.ID].name == "written elsewhere"
+    assert entities.INDEX[notebook.ID].parent == library.ID
+    assert notebook.ID in entities.SECONDARY_INDEX.query(library=library.ID)
+
+    # Loaded entities are not looked for again.
+    entities.read_one(notebook.ID)
+    assert len(scans) == 1
+
+
+def test_files_with_the_same_prefix_holding_other_entities_are_skipped(library):
+    entities, library, scans = library
+    notebook = _write_notebook(entities, library)
+    other_ID = notebook.ID[:8] + "-0000-0000-0000-000000000000"
+
+    with pytest.raises(NotFound):
+        entities.read_one(other_ID)
+    assert notebook.ID not in entities.INDEX
+    assert other_ID in entities.MISSING_IDS
+
+
+def test_missing_IDs_are_not_looked_for_until_they_expire(library, monkeypatch):
+    entities, library, scans = library
+    ID = "12345678-0000-0000-0000-000000000000"
+    for _ in range(3):
+        with pytest.raises(NotFound):
+            entities.read_one(ID)
+    assert scans == [ID[:8]]
+
+    # Created after being looked for, it is found once the ID expires.
+    notebook = _write_notebook(entities, library, ID=ID)
+    with pytest.raises(NotFound):
+        entities.read_one(ID)
+    monkeypatch.setattr(entities, 'MISSING_ID_TTL', 0)
+    assert entities.read_one(ID).status_code == 201
+    assert entities.INDEX[ID].name == notebook.name
+    assert ID not in entities.MISSING_IDS
+
+
+def test_entities_loaded_while_waiting_for_the_lock_are_not_looked_for(library):
+    entities, library, scans = library
+    assert entities._load_entity_by_id(library.ID) is library
+    assert scans == []
+    assert library.ID not in entities.MISSING_IDS
+
+
+def test_misses_list_each_lair_directory_once_per_ttl(library, tmp_path, monkeypatch):
+    entities, library, scans = library
+    measurement = tmp_path / "bucket" / "measurement"
+    measurement.mkdir(parents=True)
+    (measurement / DATA_FILENAME).write_text("data")
+    entities.add_bucket(user, "bucket", str(tmp_path / "bucket"))
+    entities._ingest_watched_paths([measurement])
+
+    listed = []
+    list_directory = entities._list_directory
+    monkeypatch.setattr(entities, '_list_directory', lambda directory: listed.append(Path(directory)) or
+                        list_directory(directory))
+    for i in range(5):
+        with pytest.raises(NotFound):
+            entities.read_one(f"{i:08}-0000-0000-0000-000000000000")
+    assert len(scans) == 5
+    # The folders of the instances are never listed.
+    assert sorted(listed) == sorted(entities._lair_directories())
+    assert measurement not in listed
+
+    # Files created in the meantime are found once the directories can be listed again.
+    notebook = _write_notebook(entities, library)
+    with pytest.raises(NotFound):
+        entities.read_one(notebook.ID)
+    monkeypatch.setattr(entities, 'MISSING_ID_TTL', 0)
+    assert entities.read_one(notebook.ID).status_code == 201
@@ -0,0 +1,48 @@
+import os
+
+import nbformat
+
+from dragon_core.api import notebook_cache
+from dragon_core.api.notebook_cache import NotebookCache
+
+
+def _write_notebook(path, text):
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_markdown_cell(text))
+    nbformat.write(nb, str(path))
+
+
+def test_notebooks_are_rendered_once_until_they_change(tmp_path, monkeypatch):
+    rendered = []
+    monkeypatch.setattr(notebook_cache, 'render_notebook', lambda path: rendered.append(path) or f"html of {path}")
+    notebook = tmp_path / "analysis.ipynb"
+    _write_notebook(notebook, "first")
+
+    cache = NotebookCache(tmp_path / "cache")
+    assert cache.get(notebook) == f"html of {notebook}"
+    assert cache.get(notebook) == f"html of {notebook}"
+    assert len(rendered) == 1
+
+    # A new cache on the same directory finds the rendered notebook.
+    assert NotebookCache(tmp_path / "cache").get(notebook) == f"html of {notebook}"
+    assert len(rendered) == 1
+
+    version = cache.version(notebook)
+    _write_notebook(notebook, "second, longer")
+    assert cache.version(notebook) != version
+    cache.get(notebook)
+    assert len(rendered) == 2
+    assert cache.version(tmp_path / "missing.ipynb") is None
+
+
+def test_least_recently_used_notebooks_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(notebook_cache, 'render_notebook', lambda path: "x" * 100)
+    notebooks = [tmp_path / f"{i}.ipynb" for i in range(3)]
+    for notebook in notebooks:
+        _write_notebook(notebook, str(notebook))
+
+    cache = NotebookCache(tmp_path / "cache", max_size=250)
+    for notebook in notebooks:
+        cache.get(notebook)
+
+    assert len(os.listdir(tmp_path / "cache")) == 2
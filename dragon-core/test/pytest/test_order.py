@@ -0,0 +1,63 @@
+import copy
+import pickle
+import random
+
+from dragon_core.components import Order
+
+
+def test_order_behaves_like_a_list():
+    random.seed(0)
+    order = Order()
+    expected = []
+    for i in range(500):
+        item = (f"id{i}", "content_block", True)
+        position = random.randint(0, len(expected))
+        order.insert(position, item)
+        expected.insert(position, item)
+
+    assert order == expected
+    assert len(order) == len(expected)
+    assert order[-1] == expected[-1]
+    assert order[10:20] == expected[10:20]
+    for ID in random.sample([item[0] for item in expected], 50):
+        assert order.index_of(ID) == next(i for i, item in enumerate(expected) if item[0] == ID)
+    assert order.index_of("missing") is None
+
+    order[3] = (expected[3][0], "content_block", False)
+    expected[3] = (expected[3][0], "content_block", False)
+    assert order == expected
+    assert order.index_of(expected[3][0]) == 3
+
+
+def test_order_is_copied_and_pickled_as_a_list():
+    order = Order([("a", "entity", True), ("b", "entity", True)])
+    for other in (pickle.loads(pickle.dumps(order)), copy.deepcopy(order)):
+        assert other == order
+        other.insert(1, ("c", "entity", True))
+        assert other.index_of("b") == 2
+        assert order.index_of("b") == 1
+
+
+def test_replacing_IDs_of_a_large_order():
+    n = 20000
+    order = Order([(f"path{i}", "entity", True) for i in range(n)])
+    # Like resolving the paths of a lair into IDs, every item is replaced once.
+    for i in range(n):
+        order[i] = (f"id{i}", "entity", True)
+
+    assert order.index_of("path0") is None
+    assert order.index_of(f"id{n - 1}") == n - 1
+    assert order.index_of("id12345") == 12345
+    assert len(order._nodes) == n
+
+
+def test_repeated_IDs():
+    order = Order([("a", "entity", True), ("b", "entity", True), ("a", "entity", False)])
+    assert order.index_of("a") == 0
+    order[0] = ("c", "entity", True)
+    assert order.index_of("a") == 2
+    order.insert(0, ("a", "entity", True))
+    assert order.index_of("a") == 0
+    order[3] = ("b", "entity", True)
+    assert order.index_of("b") == 2
+    assert order.index_of("a") == 0
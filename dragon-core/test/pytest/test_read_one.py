@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+
+import flask
+import pytest
+from werkzeug.exceptions import NotFound
+
+user = 'test_user'
+
+
+def _read(entities, ID, etag=None):
+    headers = {} if etag is None else {'If-None-Match': etag}
+    with flask.Flask(__name__).test_request_context(headers=headers):
+        return entities.read_one(ID)
+
+
+@pytest.fixture()
+def library(load_api):
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    return entities, entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+
+
+def test_unchanged_entities_get_a_304_response(library):
+    entities, library = library
+    first = _read(entities, library.ID)
+    assert first.status_code == 201
+    etag = first.headers['ETag']
+    assert json.loads(first.get_data())['ID'] == library.ID
+
+    cached = _read(entities, library.ID, etag)
+    assert cached.status_code == 304
+    assert cached.get_data() == b""
+    assert cached.headers['ETag'] == etag
+    assert _read(entities, library.ID, f'W/{etag}, "other"').status_code == 304
+    assert _read(entities, library.ID, '"other"').status_code == 201
+
+
+def test_changes_invalidate_the_cached_response(library):
+    entities, library = library
+    etag = _read(entities, library.ID).headers['ETag']
+
+    entities.add_text_block(library.ID, "a block", user)
+    changed = _read(entities, library.ID, etag)
+    assert changed.status_code == 201
+    assert changed.headers['ETag'] != etag
+    assert "a block" in changed.get_data(as_text=True)
+
+    # Renaming any entity changes the paths replaced in the text blocks of every entity.
+    etag = changed.headers['ETag']
+    entities.add_entity({"name": "notebook", "user": user, "parent": library.ID, "type": "Notebook"})
+    notebook_ID = entities.INDEX[library.ID].children[-1]
+    assert _read(entities, library.ID, etag).status_code == 201
+    etag = _read(entities, library.ID).headers['ETag']
+    entities.change_entity_name(notebook_ID, {"new_name": "renamed"})
+    assert _read(entities, library.ID, etag).status_code == 201
+
+
+def test_indexing_known_paths_again_keeps_the_cached_response(library):
+    entities, library = library
+    etag = _read(entities, library.ID).headers['ETag']
+
+    path = entities.UUID_TO_PATH_INDEX[library.ID]
+    entities.add_ent_to_index(library, Path(path))
+    entities.add_ent_to_index(library, path)
+    assert _read(entities, library.ID, etag).status_code == 304
+
+
+def test_paths_in_text_blocks_are_replaced_by_IDs(library):
+    entities, library = library
+    entities.add_entity({"name": "notebook", "user": user, "parent": library.ID, "type": "Notebook"})
+    notebook_ID = entities.INDEX[library.ID].children[-1]
+    notebook_path = str(entities.UUID_TO_PATH_INDEX[notebook_ID])
+    entities.add_text_block(library.ID, f"see [the notebook]({notebook_path})", user)
+
+    body = _read(entities, library.ID).get_data(as_text=True)
+    block = json.loads(json.loads(body)['content_blocks'][-1])
+    assert block['content'][-1] == f"see [the notebook]({notebook_ID})"
+
+
+def test_unknown_entities_are_not_found(library):
+    entities, library = library
+    with pytest.raises(NotFound):
+        _read(entities, "not-an-id")
+
+
+def test_text_blocks_are_returned_without_history(library):
+    entities, library = library
+    entities.add_entity({"name": "notebook", "user": user, "parent": library.ID, "type": "Notebook"})
+    notebook_path = str(entities.UUID_TO_PATH_INDEX[entities.INDEX[library.ID].children[-1]])
+    for body in ("no links", f"a [link]({notebook_path})"):
+        entities.add_text_block(library.ID, "first version", user)
+        entities.edit_text_block(library.ID, entities.INDEX[library.ID].content_blocks[-1].ID, body, user)
+
+    blocks = [json.loads(block) for block in json.loads(_read(entities, library.ID).get_data())['content_blocks']]
+    assert [block['content'] for block in blocks] == [["no links"],
+                                                     [f"a [link]({entities.INDEX[library.ID].children[-1]})"]]
+    assert all('history' not in block for block in blocks)
+    assert [len(block['dates']) for block in blocks] == [2, 2]
@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from dragon_core.modules import Library, Task, Step, Bucket
+
+user = 'test_user'
+
+
+def _no_filesystem(*args, **kwargs):
+    raise AssertionError("references are resolved without touching the filesystem")
+
+
+def _resolve_offline(entities, ents, monkeypatch):
+    with monkeypatch.context() as m:
+        for name in ("is_file", "exists", "stat"):
+            m.setattr(Path, name, _no_filesystem)
+        for name in ("listdir", "scandir", "stat"):
+            m.setattr(os, name, _no_filesystem)
+        entities._resolve_references(ents.values())
+
+
+@pytest.fixture()
+def path_lair(load_api, monkeypatch):
+    """
+    Entities of a format 1 lair, referencing each other by the paths of their files, indexed but not resolved.
+    """
+    entities = load_api()
+    monkeypatch.setattr(entities.DRAGONLAIR, 'format_version', 1)
+
+    paths = {name: f"/lair/{name}.toml" for name in ("library", "task", "step", "bucket")}
+    library = Library(name="library", user=[user])
+    task = Task(name="task", user=[user], parent=paths["library"])
+    step = Step(name="step", user=[user], parent=paths["task"])
+    bucket = Bucket(name="bucket", user=[user])
+    library.add_child(paths["task"])
+    library.add_child("/lair/deleted task.toml")
+    task.add_child(paths["step"])
+    task.data_buckets.append(paths["bucket"])
+    step.data_buckets.append("/lair/deleted bucket.toml")
+
+    ents = {"library": library, "task": task, "step": step, "bucket": bucket}
+    for name, ent in ents.items():
+        entities.add_ent_to_index(ent, paths[name])
+    return entities, ents
+
+
+def test_path_references_are_resolved_to_IDs(path_lair, monkeypatch):
+    entities, ents = path_lair
+    library, task, step, bucket = ents["library"], ents["task"], ents["step"], ents["bucket"]
+
+    _resolve_offline(entities, ents, monkeypatch)
+
+    assert library.children == [task.ID, "/lair/deleted task.toml"]
+    assert [item[0] for item in library.order] == [task.ID, "/lair/deleted task.toml"]
+    assert task.parent == library.ID
+    assert task.children == [step.ID] and [item[0] for item in task.order] == [step.ID]
+    assert task.data_buckets == [bucket.ID]
+    assert step.parent == task.ID
+
+    # Resolving again leaves the IDs as they are.
+    _resolve_offline(entities, ents, monkeypatch)
+    assert task.children == [step.ID] and task.parent == library.ID
+
+
+def test_unresolved_references_are_reported_once(path_lair, monkeypatch, capsys):
+    entities, ents = path_lair
+
+    _resolve_offline(entities, ents, monkeypatch)
+    report = capsys.readouterr().out
+    assert report.count("Could not resolve") == 1
+    # The deleted task is both a child and an item of the order of the library.
+    assert "Could not resolve 3 references" in report
+    assert report.count(f"{ents['library'].ID}: /lair/deleted task.toml") == 2
+    assert f"{ents['step'].ID}: /lair/deleted bucket.toml" in report
+
+
+def test_lairs_referencing_by_ID_are_not_resolved(path_lair, monkeypatch, capsys):
+    entities, ents = path_lair
+    monkeypatch.setattr(entities.DRAGONLAIR, 'format_version', 2)
+
+    _resolve_offline(entities, ents, monkeypatch)
+    assert ents["task"].parent == "/lair/library.toml"
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,53 @@
+from dragon_core.modules import DragonLair, Library, Task, Step
+from dragon_core.generators.meta import read_from_TOML
+
+user = 'test_user'
+
+
+def test_references_are_translated_while_serializing():
+    task = Task(name="task", user=[user], parent="parent-id")
+    step = Step(name="step", user=[user], parent=task.ID)
+    task.add_child(step.ID)
+    task.data_buckets.append("bucket-id")
+    paths = {"parent-id": "/lair/parent.toml", step.ID: "/lair/step.toml", "bucket-id": "/lair/bucket.toml"}
+
+    vals = task.to_TOML(translate=lambda ref: paths.get(ref, ref))["task"]
+    assert vals["parent"] == "/lair/parent.toml"
+    assert list(vals["children"]) == ["/lair/step.toml"]
+    assert list(vals["data_buckets"]) == ["/lair/bucket.toml"]
+    # The order keeps the IDs and the entity is not modified.
+    assert [item[0] for item in vals["order"]] == [step.ID]
+    assert task.parent == "parent-id" and task.children == [step.ID] and task.data_buckets == ["bucket-id"]
+    assert task.to_TOML()["task"]["children"] == [step.ID]
+
+
+def test_lairs_referencing_by_path_are_written_with_paths(lair_path, load_api):
+    lair = DragonLair(lair_path)
+    lair.format_version = 1
+    library = Library(name="library", user=[user])
+    library_path = lair_path / f"{library.ID[:8]}_library.toml"
+    task = Task(name="task", user=[user], parent=str(library_path))
+    task_path = lair_path / f"{task.ID[:8]}_task.toml"
+    library.add_child(str(task_path))
+    task.to_TOML(task_path)
+    library.to_TOML(library_path)
+    lair.add_library(library, library_path)
+
+    entities = load_api()
+    entities.add_text_block(library.ID, "a block", user)
+    entities.add_entity({"name": "step", "user": user, "parent": task.ID, "type": "Step"})
+    step_ID = entities.INDEX[task.ID].children[-1]
+
+    assert read_from_TOML(library_path).children == [str(task_path)]
+    written = read_from_TOML(task_path)
+    assert written.parent == str(library_path)
+    assert written.children == [entities.UUID_TO_PATH_INDEX[step_ID]]
+
+    # The entities in memory keep referencing each other by ID.
+    assert entities.INDEX[library.ID].children == [task.ID]
+    assert entities.INDEX[task.ID].parent == library.ID
+    assert entities.INDEX[step_ID].parent == task.ID
+
+    entities = load_api()
+    assert entities.INDEX[task.ID].children == [step_ID]
+    assert entities.INDEX[library.ID].content_blocks[0].content[-1] == "a block"
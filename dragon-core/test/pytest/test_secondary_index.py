@@ -0,0 +1,38 @@
+from dragon_core.modules import Library, Notebook, Project
+from dragon_core.api.secondary_index import SecondaryIndex
+
+user = 'test_user'
+
+
+def test_queries_follow_changes_and_keep_the_order_entities_were_added():
+    library = Library(name="library", user=[user])
+    notebook = Notebook(name="notebook", user=[user, 'other_user'], parent=library.ID)
+    projects = [Project(name=f"project {i}", user=[user], parent=notebook.ID) for i in range(3)]
+
+    index = SecondaryIndex()
+    index.register('type', lambda ent: (ent.__class__.__name__,))
+    index.register('user', lambda ent: ent.user)
+    index.register('bookmarked', lambda ent: (ent.bookmarked,))
+    index.register('parent', lambda ent: (ent.parent if ent.parent != '' else None,))
+    for ent in [library, notebook] + projects:
+        index.add(ent)
+
+    assert index.query(type='Project') == [p.ID for p in projects]
+    assert index.query(type=['Project', 'Library']) == [library.ID] + [p.ID for p in projects]
+    assert index.query(user='other_user') == [notebook.ID]
+    assert index.values_of('parent', library.ID) == ()
+
+    projects[2].toggle_bookmark()
+    projects[0].toggle_bookmark()
+    index.update(projects[2], 'bookmarked')
+    index.update(projects[0], 'bookmarked')
+    assert index.query(bookmarked=True) == [projects[0].ID, projects[2].ID]
+    assert index.query(type='Project', bookmarked=False) == [projects[1].ID]
+
+    projects[2].toggle_bookmark()
+    index.update(projects[2])
+    assert index.query(bookmarked=True, user=user) == [projects[0].ID]
+
+    index.rebuild([projects[1], library])
+    assert index.query(type=['Project', 'Library']) == [projects[1].ID, library.ID]
+    assert index.query(bookmarked=True) == []
@@ -0,0 +1,127 @@
+import os
+import pickle
+
+import pytest
+
+from dragon_core.api import snapshot
+from dragon_core.generators.meta import read_from_TOML
+
+user = 'test_user'
+
+
+@pytest.fixture()
+def lair(load_api, tmp_path, monkeypatch):
+    """
+    Lair with a library and two notebooks, loaded once from the files so the snapshot is written.
+    """
+    snapshot_path = tmp_path / 'snapshot.pickle'
+    monkeypatch.setenv('SNAPSHOT_PATH', str(snapshot_path))
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library_ID = entities.DRAGONLAIR.libraries[0].ID
+    for name in ("first", "second"):
+        entities.add_entity({"name": name, "user": user, "parent": library_ID, "type": "Notebook"})
+
+    load_api()
+    assert snapshot_path.is_file()
+    return load_api, snapshot_path
+
+
+def _record_full_loads(entities, monkeypatch):
+    full_loads = []
+    load_files = entities._load_all_entity_files
+    monkeypatch.setattr(entities, '_load_all_entity_files', lambda: full_loads.append(True) or load_files())
+    return full_loads
+
+
+def _record_parsed(entities, monkeypatch):
+    parsed = []
+    read_entity = entities._read_entity
+    monkeypatch.setattr(entities, '_read_entity', lambda path: parsed.append(str(path)) or read_entity(path))
+    return parsed
+
+
+def test_restart_from_the_snapshot(lair, monkeypatch):
+    load_api, snapshot_path = lair
+    from dragon_core.api import entities
+    expected = {ID: str(ent) for ID, ent in entities.INDEX.items()}
+    full_loads = _record_full_loads(entities, monkeypatch)
+    parsed = _record_parsed(entities, monkeypatch)
+
+    entities = load_api()
+    assert full_loads == [] and parsed == []
+    assert {ID: str(ent) for ID, ent in entities.INDEX.items()} == expected
+    library = entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+    assert [entities.INDEX[child].name for child in library.children] == ["first", "second"]
+    assert entities.SECONDARY_INDEX.query(type="Notebook") == library.children
+
+
+def test_only_changed_files_are_parsed_again(lair, monkeypatch):
+    load_api, snapshot_path = lair
+    from dragon_core.api import entities
+    library = entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+    path = entities.UUID_TO_PATH_INDEX[library.children[0]]
+
+    # Changed by something other than the API.
+    notebook = read_from_TOML(path)
+    notebook.description = "changed on disk"
+    notebook.to_TOML(path)
+
+    full_loads = _record_full_loads(entities, monkeypatch)
+    parsed = _record_parsed(entities, monkeypatch)
+    entities = load_api()
+    assert full_loads == []
+    assert parsed == [str(path)]
+    assert entities.INDEX[notebook.ID].description == "changed on disk"
+
+    # The snapshot was updated with the change.
+    parsed.clear()
+    load_api()
+    assert parsed == []
+
+
+@pytest.mark.parametrize("invalidate", ["deleted file", "corrupt", "old version", "other lair layout"])
+def test_stale_snapshots_load_the_whole_lair(lair, monkeypatch, invalidate):
+    load_api, snapshot_path = lair
+    from dragon_core.api import entities
+    library = entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+    if invalidate == "deleted file":
+        deleted = library.children[1]
+        entities.delete_entity(deleted)
+        os.remove(entities.UUID_TO_PATH_INDEX[deleted])
+    elif invalidate == "corrupt":
+        snapshot_path.write_bytes(b"not a snapshot")
+    elif invalidate == "old version":
+        monkeypatch.setattr(snapshot, 'SNAPSHOT_VERSION', snapshot.SNAPSHOT_VERSION + 1)
+    else:
+        monkeypatch.setenv('LAZY_LOADING', 'true')
+
+    full_loads = _record_full_loads(entities, monkeypatch)
+    entities = load_api()
+    assert full_loads == [True]
+    assert entities.INDEX[library.ID].name == "library"
+
+    # A new snapshot replaces the stale one.
+    full_loads.clear()
+    load_api()
+    assert full_loads == []
+
+
+def test_snapshot_reports_changed_files(tmp_path):
+    files = [tmp_path / f"{i}.toml" for i in range(3)]
+    for file in files:
+        file.write_text("a")
+    path = tmp_path / "snapshot.pickle"
+    snapshot.write_snapshot(path, {"index": {"a": 1}}, [str(file) for file in files])
+
+    assert snapshot.read_snapshot(path) == ({"index": {"a": 1}}, [])
+    files[1].write_text("changed")
+    assert snapshot.read_snapshot(path) == ({"index": {"a": 1}}, [str(files[1])])
+    files[2].unlink()
+    assert snapshot.read_snapshot(path) is None
+
+    with open(path, 'wb') as f:
+        pickle.dump({"version": snapshot.SNAPSHOT_VERSION - 1, "files": {}, "state": {}}, f)
+    assert snapshot.read_snapshot(path) is None
+    assert snapshot.read_snapshot(tmp_path / "missing.pickle") is None
+    assert not (tmp_path / "snapshot.pickle.tmp").exists()
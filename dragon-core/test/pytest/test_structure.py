@@ -0,0 +1,132 @@
+import json
+from pathlib import Path
+
+import pytest
+from werkzeug.exceptions import BadRequest, NotFound
+
+from dragon_core.modules import Library, Notebook, Project
+from dragon_core.api.structure import StructureCache
+
+user = 'test_user'
+
+
+def _expected(index, ID):
+    ent = index[ID]
+    children = [_expected(index, child) for child in ent.children if index[child].deleted is False]
+    return {"name": ent.name, "id": ent.ID, "children": children, "type": ent.__class__.__name__}
+
+
+def test_only_changed_subtrees_are_serialized_again():
+    library = Library(name="library", user=[user])
+    notebooks = [Notebook(name=f"notebook {i}", user=[user], parent=library.ID) for i in range(2)]
+    project = Project(name="projé", user=[user], parent=notebooks[0].ID)
+    index = {ent.ID: ent for ent in [library, project] + notebooks}
+    for notebook in notebooks:
+        library.add_child(notebook.ID)
+    notebooks[0].add_child(project.ID)
+
+    cache = StructureCache(lambda ID: index[ID], lambda: [library.ID])
+    assert cache.tree() == json.dumps([_expected(index, library.ID)])
+    assert cache.tree() == json.dumps([_expected(index, library.ID)])
+
+    # Without being invalidated, the second notebook keeps its cached name.
+    notebooks[1].name = "not invalidated"
+    project.change_name("renamed")
+    cache.invalidate(project.ID)
+    assert '"renamed"' in cache.tree()
+    assert '"notebook 1"' in cache.tree()
+    notebooks[1].name = "notebook 1"
+
+    notebooks[0].deleted = True
+    cache.invalidate(notebooks[0].ID)
+    assert cache.subtree(library.ID) == json.dumps(_expected(index, library.ID))
+
+
+def test_entities_loaded_on_request_appear_in_the_cached_structure(load_api):
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+    entities.add_entity({"name": "notebook", "user": user, "parent": library.ID, "type": "Notebook"})
+    notebook = entities.INDEX[library.children[-1]]
+    structure = json.loads(entities.generate_structure().get_data())
+    assert structure[0]["children"][0]["children"] == []
+
+    # A project written by another process, the notebook lists it before it is loaded.
+    project = Project(name="project", user=[user], parent=notebook.ID)
+    project.to_TOML(Path(entities.UUID_TO_PATH_INDEX[notebook.ID]).parent)
+    notebook.add_child(project.ID)
+
+    assert entities.read_one(project.ID).status_code == 201
+    structure = json.loads(entities.generate_structure().get_data())
+    assert structure[0]["children"][0]["children"] == [_expected(entities.INDEX, project.ID)]
+    assert project.ID in entities.SECONDARY_INDEX.query(type="Project")
+
+
+def _partial(entities, ID, **kwargs):
+    return json.loads(entities.generate_partial_structure(ID, **kwargs).get_data())
+
+
+def test_partial_structure_pages_follow_the_cursor(load_api):
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.INDEX[entities.DRAGONLAIR.libraries[0].ID]
+    for i in range(5):
+        entities.add_entity({"name": f"notebook {i}", "user": user, "parent": library.ID, "type": "Notebook"})
+    notebooks = list(library.children)
+    entities.add_entity({"name": "project", "user": user, "parent": notebooks[0], "type": "Project"})
+
+    page = _partial(entities, library.ID, depth=1, limit=2)
+    assert [child["id"] for child in page["children"]] == notebooks[:2]
+    assert page["num_children"] == 5 and page["has_more"] and page["cursor"] == notebooks[1]
+    # Children cut off by the depth only carry their count.
+    assert page["children"][0]["children"] == []
+    assert page["children"][0]["num_children"] == 1 and page["children"][0]["has_more"]
+    assert page["children"][0]["cursor"] is None
+    assert _partial(entities, notebooks[0], depth=1)["children"][0]["name"] == "project"
+
+    # Deleting the child the cursor points to does not move the next page.
+    entities.delete_entity(notebooks[1])
+    entities.delete_entity(notebooks[2])
+    page = _partial(entities, library.ID, depth=0, limit=2, cursor=page["cursor"])
+    assert page["children"] == [] and page["has_more"]
+    page = _partial(entities, library.ID, depth=1, limit=1, cursor=notebooks[1])
+    assert [child["id"] for child in page["children"]] == [notebooks[3]]
+    assert page["num_children"] == 3 and page["has_more"]
+    page = _partial(entities, library.ID, depth=1, limit=1, cursor=page["cursor"])
+    assert [child["id"] for child in page["children"]] == [notebooks[4]]
+    assert not page["has_more"] and page["cursor"] is None
+
+
+def test_partial_structure_errors(load_api):
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.DRAGONLAIR.libraries[0]
+
+    with pytest.raises(NotFound):
+        entities.generate_partial_structure("not-an-id")
+    with pytest.raises(BadRequest):
+        entities.generate_partial_structure(library.ID, depth=-1)
+    with pytest.raises(BadRequest):
+        entities.generate_partial_structure(library.ID, limit=0)
+    with pytest.raises(BadRequest):
+        entities.generate_partial_structure(library.ID, cursor="not-a-child")
+
+
+def test_ancestors_of_an_entity(load_api, monkeypatch):
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library = entities.DRAGONLAIR.libraries[0].ID
+    entities.add_entity({"name": "notebook", "user": user, "parent": library, "type": "Notebook"})
+    notebook = entities.INDEX[library].children[-1]
+    entities.add_entity({"name": "project", "user": user, "parent": notebook, "type": "Project"})
+    project = entities.INDEX[notebook].children[-1]
+
+    # Only the indices are read, the ancestors are not serialized.
+    monkeypatch.setattr(entities, '_serialize_entity', None)
+    ancestors = json.loads(entities.get_ancestors(project).get_data())
+    assert ancestors == [{"name": "library", "id": library, "type": "Library"},
+                         {"name": "notebook", "id": notebook, "type": "Notebook"}]
+    assert json.loads(entities.get_ancestors(library).get_data()) == []
+
+    with pytest.raises(NotFound):
+        entities.get_ancestors("not-an-id")
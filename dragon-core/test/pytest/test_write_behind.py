@@ -0,0 +1,102 @@
+from pathlib import Path
+
+from dragon_core.api.persistence import WriteBehindFlusher
+from dragon_core.generators.meta import read_from_TOML
+
+user = 'test_user'
+
+
+def test_dirty_entities_are_written_once_per_flush():
+    written = []
+    flusher = WriteBehindFlusher(written.append, interval=3600)
+    for ID in ["a", "b", "a", "a"]:
+        flusher.mark_dirty(ID)
+    assert flusher.is_dirty("a")
+
+    flusher.flush()
+    assert sorted(written) == ["a", "b"]
+    assert not flusher.is_dirty("a")
+    flusher.flush()
+    assert len(written) == 2
+
+    flusher.mark_dirty("c")
+    flusher.discard("c")
+    flusher.mark_dirty("d")
+    flusher.stop()
+    assert written[2:] == ["d"]
+
+
+def test_failed_writes_are_retried():
+    written = []
+    failures = ["a"]
+
+    def write(ID):
+        if ID in failures:
+            failures.remove(ID)
+            raise OSError("disk full")
+        written.append(ID)
+
+    flusher = WriteBehindFlusher(write, interval=3600)
+    flusher.mark_dirty("a")
+    flusher.flush()
+    assert written == [] and flusher.is_dirty("a")
+    flusher.flush()
+    assert written == ["a"] and not flusher.is_dirty("a")
+
+
+def test_changes_reach_the_disk_on_flush_and_restart(load_api, monkeypatch):
+    monkeypatch.setenv('WRITE_BEHIND', 'true')
+    monkeypatch.setenv('WRITE_BEHIND_INTERVAL', '3600')
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library_ID = entities.DRAGONLAIR.libraries[0].ID
+    path = Path(entities.UUID_TO_PATH_INDEX[library_ID])
+
+    entities.add_entity({"name": "notebook", "user": user, "parent": library_ID, "type": "Notebook"})
+    notebook_ID = entities.INDEX[library_ID].children[-1]
+    assert entities.WRITE_BEHIND.is_dirty(notebook_ID) and entities.WRITE_BEHIND.is_dirty(library_ID)
+    entities.WRITE_BEHIND.flush()
+    assert read_from_TOML(entities.UUID_TO_PATH_INDEX[notebook_ID]).parent == library_ID
+    assert read_from_TOML(path).children == [notebook_ID]
+
+    writes = []
+    to_TOML = entities.Library.to_TOML
+    monkeypatch.setattr(entities.Library, 'to_TOML', lambda self, *args, **kwargs:
+                        writes.append(self.ID) or to_TOML(self, *args, **kwargs))
+    for i in range(5):
+        entities.add_text_block(library_ID, f"block {i}", user)
+    assert read_from_TOML(path).content_blocks == []
+    assert entities.WRITE_BEHIND.is_dirty(library_ID)
+
+    entities.WRITE_BEHIND.flush()
+    assert writes == [library_ID]
+    assert [block.content[-1] for block in read_from_TOML(path).content_blocks] == [f"block {i}" for i in range(5)]
+
+    # Pending changes are written before the lair is loaded again.
+    entities.add_text_block(library_ID, "before restart", user)
+    entities = load_api()
+    assert entities.INDEX[library_ID].content_blocks[-1].content[-1] == "before restart"
+
+
+def test_renaming_entities_that_were_not_flushed_yet(load_api, monkeypatch):
+    monkeypatch.setenv('WRITE_BEHIND', 'true')
+    monkeypatch.setenv('WRITE_BEHIND_INTERVAL', '60')
+    entities = load_api()
+    entities.add_library({"name": "library", "user": user})
+    library_ID = entities.DRAGONLAIR.libraries[0].ID
+    entities.add_entity({"name": "notebook", "user": user, "parent": library_ID, "type": "Notebook"})
+    notebook_ID = entities.INDEX[library_ID].children[-1]
+    old_path = Path(entities.UUID_TO_PATH_INDEX[notebook_ID])
+    assert not old_path.exists()
+
+    response = entities.change_entity_name(notebook_ID, {"new_name": "renamed"})
+    assert response.status_code == 201
+    new_path = Path(entities.UUID_TO_PATH_INDEX[notebook_ID])
+    assert new_path != old_path and not old_path.exists()
+    assert read_from_TOML(new_path).name == "renamed"
+    assert not entities.WRITE_BEHIND.is_dirty(notebook_ID)
+
+    entities.WRITE_BEHIND.flush()
+    entities = load_api()
+    assert entities.INDEX[notebook_ID].name == "renamed"
+    assert entities.INDEX[library_ID].children == [notebook_ID]
@@ -1,14 +1,48 @@
+// Last response of getEntity for every entity together with its ETag, unchanged entities are answered with a 304.
+const entityCache = {};
+
 export async function getEntity(id) {
-    const res = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL || ""}/api/entities/${id}`);
-    
-    if (res.status === 201) {
-        return await res.json();
+    const cached = entityCache[id];
+    const res = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL || ""}/api/entities/${id}`,
+        cached ? {headers: {'If-None-Match': cached.etag}} : {});
+
+    if (res.status === 304 && cached) {
+        return cached.data;
+    } else if (res.status === 201) {
+        const data = await res.json();
+        const etag = res.headers.get('ETag');
+        if (etag) {
+            entityCache[id] = {etag: etag, data: data};
+        }
+        return data;
     } else {
         return null;
     }
 
 }
 
+// Rendered analysis notebooks with their ETag, fetched only when the notebook is opened.
+const analysisCache = {};
+
+export async function getAnalysisNotebook(url) {
+    const cached = analysisCache[url];
+    const res = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL || ""}${url}`,
+        cached ? {headers: {'If-None-Match': cached.etag}} : {});
+
+    if (res.status === 304 && cached) {
+        return cached.html;
+    } else if (res.status === 200) {
+        const html = await res.text();
+        const etag = res.headers.get('ETag');
+        if (etag) {
+            analysisCache[url] = {etag: etag, html: html};
+        }
+        return html;
+    } else {
+        return null;
+    }
+}
+
 export async function submitContentBlockEdition(entID, user, contentBlockId, newContent) {
 
     let response = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL || ""}/api/entities/` + entID + "/" + contentBlockId + "?&user=" + user, {
@@ -157,6 +191,31 @@ export async function getLibraryStructure(id) {
 
 }
 
+// Returns the structure of the entity only down to depth levels of children. Entities with has_more set have children
+// missing from the response, requesting them again with their cursor returns the next ones.
+export async function getPartialStructure(id, depth, cursor) {
+    let url = `${process.env.NEXT_PUBLIC_API_BASE_URL || ""}/api/entities/${id}/partial_structure?depth=${depth}`;
+    if (cursor) {
+        url += `&cursor=${cursor}`;
+    }
+    const res = await fetch(url);
+    if (res.status === 200) {
+        return await res.json();
+    } else {
+        return null;
+    }
+}
+
+// Returns the name, id and type of the ancestors of the entity, from the root of its tree down to its parent.
+export async function getAncestors(id) {
+    const res = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL || ""}/api/entities/${id}/ancestors`);
+    if (res.status === 200) {
+        return await res.json();
+    } else {
+        return null;
+    }
+}
+
 // FIXME: Handle errors properly
 export async function getLibraries() {
     const res = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL || ""}/api/entities/get_all_libraries`);
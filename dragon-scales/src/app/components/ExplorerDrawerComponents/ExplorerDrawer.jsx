@@ -2,10 +2,10 @@
 
 import { useRouter } from "next/navigation";
 import { useState, useEffect, useContext, useRef } from "react";
-import {Drawer, Typography, Stack} from "@mui/material";
+import {Drawer, Typography, Stack, Button} from "@mui/material";
 import { styled } from "@mui/material/styles";
 
-import {getLibraryStructure} from "@/app/calls";
+import {getAncestors, getPartialStructure} from "@/app/calls";
 import NotebookAccordion from "@/app/components/ExplorerDrawerComponents/NotebookAccordion";
 import { EntitiesRefContext } from "@/app/contexts/entitiesRefContext";
 
@@ -44,10 +44,41 @@ export default function ExplorerDrawer({library, open, onClose, drawerWidth, upd
     const [libraryStructure, setLibraryStructure] = useState([]);
 
     const selectedEntityRef = useRef("");
+    // IDs of the notebook holding the selected entity and of every entity down to it, the notebooks load them before
+    // selecting it.
+    const [selectedBranch, setSelectedBranch] = useState(null);
+    const loadingMore = useRef(false);
     const { entitiesRef } = useContext(EntitiesRefContext);
 
 
+    // Returns the IDs from the notebook holding the entity down to the entity, null if it is not in the library.
+    const findBranch = async (entityId) => {
+        const ancestors = await getAncestors(entityId);
+        if (!ancestors) {
+            return null;
+        }
+        const ids = [...ancestors.map(ancestor => ancestor.id), entityId];
+        const libraryIndex = ids.indexOf(library.ID);
+        return libraryIndex === -1 ? null : ids.slice(libraryIndex + 1);
+    }
+
+    const selectBranch = (entityId) => {
+        if (!entityId) {
+            setSelectedBranch(null);
+            return;
+        }
+        findBranch(entityId).then(branch => {
+            if (selectedEntityRef.current === entityId) {
+                setSelectedBranch(branch);
+            }
+        });
+    }
+
     const handleEntitySelect = (event, entityId) => {
+        // Selecting the branch selects the entity in its notebook again, which lands here with the same entity.
+        if (entityId !== selectedEntityRef.current) {
+            selectBranch(entityId);
+        }
         if (entityId) {
             selectedEntityRef.current = entityId; // Immediately update the state
             router.push(`${window.location.pathname}#${entityId}`, { scroll: false });
@@ -62,9 +93,9 @@ export default function ExplorerDrawer({library, open, onClose, drawerWidth, upd
 
 
 
-    // Loads the initial library structure
+    // Loads the notebooks of the library and their projects, deeper levels are loaded when expanded.
     useEffect(() => {
-        getLibraryStructure(library.ID).then(data => {
+        getPartialStructure(library.ID, 2).then(data => {
             if (data) {
                 setLibraryStructure(data);
             } else {
@@ -73,6 +104,34 @@ export default function ExplorerDrawer({library, open, onClose, drawerWidth, upd
         });
     }, [library, updateTrees]);
 
+    // Requests the notebooks after the ones already loaded.
+    const loadMoreNotebooks = () => {
+        if (!libraryStructure || !libraryStructure.has_more || loadingMore.current) {
+            return;
+        }
+        loadingMore.current = true;
+        getPartialStructure(library.ID, 2, libraryStructure.cursor).then(data => {
+            loadingMore.current = false;
+            if (data) {
+                setLibraryStructure(prev => ({
+                    ...prev,
+                    children: [...prev.children, ...data.children],
+                    num_children: data.num_children,
+                    has_more: data.has_more,
+                    cursor: data.cursor
+                }));
+            }
+        });
+    }
+
+    // The notebook holding the selected entity might not be loaded yet.
+    useEffect(() => {
+        if (selectedBranch && libraryStructure && libraryStructure.children &&
+            !libraryStructure.children.some(child => child.id === selectedBranch[0])) {
+            loadMoreNotebooks();
+        }
+    }, [selectedBranch, libraryStructure]);
+
     useEffect(() => {
         // Function to parse hash from URL
         const getHashFromUrl = () => {
@@ -83,6 +142,7 @@ export default function ExplorerDrawer({library, open, onClose, drawerWidth, upd
         // Handle hash changes
         const handleHashChange = () => {
             selectedEntityRef.current = getHashFromUrl();
+            selectBranch(selectedEntityRef.current);
         };
 
         // Set initial value
@@ -110,8 +170,13 @@ export default function ExplorerDrawer({library, open, onClose, drawerWidth, upd
             ) : (
                 <Stack flexGrow={2} spacing={1}>
                     {libraryStructure.children && libraryStructure.children.map(child => (
-                        <NotebookAccordion key={child.id + "-NotebookAccordion"} notebookStructure={child} onSelectedItemsChange={handleEntitySelect} selectedEntity={selectedEntityRef.current} />
+                        <NotebookAccordion key={child.id + "-NotebookAccordion"} notebookStructure={child} onSelectedItemsChange={handleEntitySelect} selectedEntity={selectedEntityRef.current} selectedBranch={selectedBranch} />
                     ))}
+                    {libraryStructure.has_more && (
+                        <Button onClick={loadMoreNotebooks}>
+                            Load more ({libraryStructure.num_children - libraryStructure.children.length})
+                        </Button>
+                    )}
                 </Stack>
             )}
         </StyledDrawer>
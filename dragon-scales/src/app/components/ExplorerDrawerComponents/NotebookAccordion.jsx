@@ -1,4 +1,4 @@
-import { useRef, useEffect } from "react";
+import { useRef, useEffect, useState } from "react";
 import {Accordion, AccordionDetails, AccordionSummary, Typography, IconButton, Box} from "@mui/material";
 import ExpandMoreIcon from "@mui/icons-material/ExpandMore";
 import {styled} from "@mui/material/styles";
@@ -8,6 +8,7 @@ import { TreeItem2 } from "@mui/x-tree-view";
 import MoreVertIcon from '@mui/icons-material/MoreVert';
 
 import {EntityIcon} from "@/app/components/icons/EntityIcons";
+import {getPartialStructure} from "@/app/calls";
 
 
 const EntIcon = styled(EntityIcon)(({theme}) => ({
@@ -30,6 +31,9 @@ const NotebookTree = styled(RichTreeView)(({ theme }) => ({
 
 }));
 
+// Suffix of the IDs of the items standing for the children that have not been loaded yet.
+const MORE_SUFFIX = "-more";
+
 
 const CustomTreeItem = (props) => {
     const { label, type, selected, itemId } = props;
@@ -47,7 +51,7 @@ const CustomTreeItem = (props) => {
                         py: 0.5
                     }}>
                         <Box sx={{ display: 'flex', alignItems: 'center' }}>
-                            <EntIcon type={type} />
+                            {type && <EntIcon type={type} />}
                             <Typography variant="body1">{label}</Typography>
                         </Box>
                         {selected !== null && selected === itemId && (
@@ -63,12 +67,21 @@ const CustomTreeItem = (props) => {
 };
 
 
-export default function NotebookAccordion({ notebookStructure, onSelectedItemsChange, selectedEntity }) {
+export default function NotebookAccordion({ notebookStructure, onSelectedItemsChange, selectedEntity, selectedBranch }) {
 
     // Holds the ID of items as keys and all of the values needed for that item as values
     const itemsIndex = useRef({});
+    // Holds the IDs of the items whose children are being requested.
+    const loading = useRef({});
     const treeApiRef = useTreeViewApiRef();
 
+    // The structure only goes a few levels deep, children are added to it as their parents are expanded.
+    const [structure, setStructure] = useState(notebookStructure);
+
+    useEffect(() => {
+        setStructure(notebookStructure);
+    }, [notebookStructure]);
+
     function createTreeStructure(item) {
         // The first item sent to this function will not be included in the return
         let ret = [];
@@ -82,32 +95,115 @@ export default function NotebookAccordion({ notebookStructure, onSelectedItemsCh
             }));
             
         }
+        // Placeholder for the children that are not loaded yet, it also makes the item expandable.
+        if (item.has_more) {
+            const placeholderId = item.id + MORE_SUFFIX;
+            itemsIndex.current[placeholderId] = {id: placeholderId, parentId: item.id, type: null};
+            ret.push({
+                id: placeholderId,
+                label: item.children.length > 0 ? `Load more (${item.num_children - item.children.length})` : "Loading...",
+                type: null,
+                children: []
+            });
+        }
         return ret;
     }
 
-    useEffect(() => {
-        if (selectedEntity && treeApiRef.current) {
-            const ret_from_get_item = treeApiRef.current.getItem(selectedEntity);
-            if (!ret_from_get_item) {
-                treeApiRef.current.selectItem({ itemId: selectedEntity});
+    function addChildren(item, itemId, data) {
+        if (item.id === itemId) {
+            return {
+                ...item,
+                children: [...item.children, ...data.children],
+                num_children: data.num_children,
+                has_more: data.has_more,
+                cursor: data.cursor
+            };
+        }
+        return {...item, children: item.children.map(child => addChildren(child, itemId, data))};
+    }
+
+    // Requests the next children of the item and adds them to the structure. Resolves to the response, or null if
+    // nothing was requested.
+    const loadChildren = async (itemId) => {
+        const item = itemsIndex.current[itemId];
+        if (!item || !item.has_more || loading.current[itemId]) {
+            return null;
+        }
+        loading.current[itemId] = true;
+        const data = await getPartialStructure(itemId, 1, item.cursor);
+        loading.current[itemId] = false;
+        if (data) {
+            // Indexed right away so the next page and the children can be requested before the tree renders again.
+            itemsIndex.current[itemId] = {...item, children: [...item.children, ...data.children],
+                num_children: data.num_children, has_more: data.has_more, cursor: data.cursor};
+            data.children.forEach(child => { itemsIndex.current[child.id] = child; });
+            setStructure(prev => addChildren(prev, itemId, data));
+        }
+        return data;
+    }
+
+    // Loads every entity of the branch, from the notebook down, requesting the pages of children until each one is
+    // found. Resolves to false if one of them cannot be found.
+    const loadBranch = async (branch) => {
+        for (let i = 1; i < branch.length; i++) {
+            while (!itemsIndex.current[branch[i]]) {
+                if (!await loadChildren(branch[i - 1])) {
+                    return false;
+                }
             }
         }
-    }, [selectedEntity]);
+        return true;
+    }
+
+    const handleExpansionToggle = (event, itemId, isExpanded) => {
+        const item = itemsIndex.current[itemId];
+        if (isExpanded && item && item.children && item.children.length === 0) {
+            loadChildren(itemId);
+        }
+    }
+
+    const handleSelect = (event, itemId) => {
+        if (itemId && itemId.endsWith(MORE_SUFFIX)) {
+            loadChildren(itemsIndex.current[itemId].parentId);
+            return;
+        }
+        onSelectedItemsChange(event, itemId);
+    }
+
+    // The tree view only knows the items that are loaded, the branch of the selected entity is loaded and expanded
+    // before selecting it.
+    useEffect(() => {
+        if (!selectedBranch || selectedBranch[0] !== structure.id) {
+            return;
+        }
+        const entityId = selectedBranch[selectedBranch.length - 1];
+        loadBranch(selectedBranch).then(loaded => {
+            // The tree renders the loaded items before they can be selected.
+            setTimeout(() => {
+                if (!loaded || !treeApiRef.current || !treeApiRef.current.getItem(entityId)) {
+                    return;
+                }
+                selectedBranch.slice(1, -1).forEach(itemId => treeApiRef.current.setItemExpansion(null, itemId, true));
+                treeApiRef.current.selectItem({ event: null, itemId: entityId, shouldBeSelected: true });
+            });
+        });
+    }, [selectedBranch]);
 
     return (
-        <NotebookAccordions key={notebookStructure.id}>
+        <NotebookAccordions key={structure.id}>
             <NotebookHeader expandIcon={<ExpandMoreIcon/>}>
-                <EntIcon type={notebookStructure.type} />
-                <Typography variant="h5">{notebookStructure.name}</Typography>
+                <EntIcon type={structure.type} />
+                <Typography variant="h5">{structure.name}</Typography>
             </NotebookHeader>
             <AccordionDetails>
-                {Object.keys(notebookStructure.children).length === 0 ? (
+                {Object.keys(structure.children).length === 0 ? (
                     <Typography variant="h6"> Notebook is empty, please create a project</Typography>
                 ) : (
                     <NotebookTree
                         expansionTrigger="iconContainer"
-                        items={createTreeStructure(notebookStructure)}
-                        onSelectedItemsChange={onSelectedItemsChange}
+                        items={createTreeStructure(structure)}
+                        onSelectedItemsChange={handleSelect}
+                        onItemExpansionToggle={handleExpansionToggle}
                         apiRef={treeApiRef}
                         slots={{
                             item: CustomTreeItem,
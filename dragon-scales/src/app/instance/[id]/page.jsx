@@ -1,10 +1,11 @@
 "use client"
 
-import {Box, Button, IconButton, Typography, Snackbar, Tooltip, ImageList, ImageListItem} from "@mui/material";
+import {Box, Button, IconButton, Typography, Snackbar, Tooltip, ImageList, ImageListItem, Accordion, AccordionSummary, AccordionDetails} from "@mui/material";
 import {use, useEffect, useState} from "react";
-import {getEntity} from "@/app/calls";
+import {getEntity, getAnalysisNotebook} from "@/app/calls";
 import {styled} from "@mui/material/styles";
 import ContentCopyIcon from '@mui/icons-material/ContentCopy';
+import ExpandMoreIcon from '@mui/icons-material/ExpandMore';
 import {keyframes} from "@mui/system";
 import {alpha} from "@mui/material/styles";
 
@@ -49,6 +50,46 @@ const ImageBox = styled(Box)(({theme}) => ({
     marginBottom: theme.spacing(2),
 }));
 
+const AnalysisBox = styled(Box)(({theme}) => ({
+    padding: theme.spacing(2),
+    marginBottom: theme.spacing(2),
+}));
+
+function AnalysisNotebook({ notebook }) {
+    const [html, setHtml] = useState(null);
+    const [failed, setFailed] = useState(false);
+
+    // The notebook is only requested the first time it is opened.
+    const handleChange = (event, expanded) => {
+        if (expanded && html === null) {
+            getAnalysisNotebook(notebook.url).then(data => {
+                if (data !== null) {
+                    setHtml(data);
+                } else {
+                    setFailed(true);
+                }
+            });
+        }
+    };
+
+    return (
+        <Accordion onChange={handleChange} slotProps={{ transition: { unmountOnExit: true } }}>
+            <AccordionSummary expandIcon={<ExpandMoreIcon />}>
+                <Typography variant="body1">{notebook.name}</Typography>
+            </AccordionSummary>
+            <AccordionDetails>
+                {failed ? (
+                    <Typography variant="body1">Could not load notebook</Typography>
+                ) : html === null ? (
+                    <Typography variant="body1">Loading...</Typography>
+                ) : (
+                    <iframe srcDoc={html} title={notebook.name} style={{ width: '100%', height: '80vh', border: 'none' }} />
+                )}
+            </AccordionDetails>
+        </Accordion>
+    );
+}
+
 export default function Instance({ params }) {
 
     const unwrappedParams = use(params);
@@ -146,6 +187,17 @@ export default function Instance({ params }) {
                     <Typography variant="body1">No images available</Typography>
                 )}
             </ImageBox>
+
+            <AnalysisBox>
+                <Typography variant="h6">Analysis</Typography>
+                {instance.analysis && instance.analysis.length > 0 ? (
+                    instance.analysis.map((notebook) => (
+                        <AnalysisNotebook key={notebook.url} notebook={notebook} />
+                    ))
+                ) : (
+                    <Typography variant="body1">No analysis available</Typography>
+                )}
+            </AnalysisBox>
         </Box>
     )
 